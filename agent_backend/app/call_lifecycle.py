@@ -0,0 +1,85 @@
+# app/call_lifecycle.py
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Ordered call phases; a call never moves backwards (webhooks may arrive out of order).
+PHASES = ["queued", "ringing", "in-progress", "forwarding", "ended"]
+_RANK = {p: i for i, p in enumerate(PHASES)}
+
+
+@dataclass
+class CallLifecycle:
+    call_id: str
+    session_id: Optional[str] = None
+    status: str = "queued"
+    timestamps: Dict[str, float] = field(default_factory=dict)
+    ended_reason: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = asdict(self)
+        start = self.timestamps.get("in-progress")
+        end = self.timestamps.get("ended")
+        d["duration_s"] = round(end - start, 3) if start and end else None
+        return d
+
+
+class LifecycleTracker:
+    """Per-call phase/timestamp tracker fed by Vapi status-update and end-of-call events."""
+
+    def __init__(self, max_ended: int = 1000):
+        self._calls: Dict[str, CallLifecycle] = {}
+        self._lock = threading.Lock()
+        self._max_ended = max_ended
+
+    def start(self, call_id: str, session_id: Optional[str] = None, ts: Optional[float] = None) -> CallLifecycle:
+        """Record a call we just created (phase 'queued')."""
+        return self.observe(call_id, "queued", session_id=session_id, ts=ts)[0]
+
+    def observe(
+        self,
+        call_id: str,
+        status: str,
+        session_id: Optional[str] = None,
+        ts: Optional[float] = None,
+        ended_reason: Optional[str] = None,
+    ) -> Tuple[CallLifecycle, bool]:
+        """Apply a phase update. Returns (lifecycle, changed)."""
+        ts = ts or time.time()
+        with self._lock:
+            lc = self._calls.get(call_id)
+            if lc is None:
+                lc = CallLifecycle(call_id=call_id, session_id=session_id)
+                self._calls[call_id] = lc
+            if session_id and not lc.session_id:
+                lc.session_id = session_id
+            if ended_reason:
+                lc.ended_reason = ended_reason
+            if status not in _RANK:
+                return lc, False
+            first_seen = status not in lc.timestamps
+            # late/out-of-order updates still backfill their timestamp
+            lc.timestamps.setdefault(status, ts)
+            if _RANK[status] <= _RANK[lc.status]:
+                return lc, first_seen and status == lc.status
+            lc.status = status
+            if status == "ended":
+                self._evict_locked()
+            return lc, True
+
+    def get(self, call_id: str) -> Optional[CallLifecycle]:
+        with self._lock:
+            return self._calls.get(call_id)
+
+    def for_session(self, session_id: str) -> List[CallLifecycle]:
+        with self._lock:
+            return [lc for lc in self._calls.values() if lc.session_id == session_id]
+
+    def _evict_locked(self):
+        ended = [cid for cid, lc in self._calls.items() if lc.status == "ended"]
+        for cid in ended[: max(0, len(ended) - self._max_ended)]:
+            self._calls.pop(cid, None)
+
+
+TRACKER = LifecycleTracker()
@@ -0,0 +1,326 @@
+# app/campaign.py
+import asyncio
+import csv
+import json
+import os
+import tempfile
+import time
+import uuid
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+from pydantic import ValidationError
+from .models import StartBody
+from .wizard import missing_fields, resolve_target_number, build_call_vars, apply_goal_intent
+from .llm import extract_fields
+from .vapi_client import start_vendor_call
+from .vapi_events import on, event_summary, VapiEvent, END_OF_CALL_REPORT
+from .ratelimit import RateLimiter
+from .config import (
+    DEFAULT_USER_PHONE,
+    DEFAULT_TARGET_NUMBER,
+    CAMPAIGN_CONCURRENCY,
+    CAMPAIGN_CPS,
+    CAMPAIGN_EVENT_LOG,
+    CAMPAIGN_TTL_S,
+)
+
+# Row outcomes. 'invalid', 'failed', 'cancelled' and 'completed' are terminal.
+TERMINAL = ("invalid", "failed", "cancelled", "completed")
+
+# ----------------- streaming parse -----------------
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split an async byte stream into text lines without buffering the whole body."""
+    buf = b""
+    async for chunk in chunks:
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r")
+    if buf:
+        yield buf.decode("utf-8-sig").rstrip("\r")
+
+async def _records(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[Tuple[Dict[str, Any], Optional[str]]]:
+    """Yield (row, parse_error) from NDJSON or CSV lines (quoted CSV fields may span lines)."""
+    header: Optional[List[str]] = None
+    pending = ""
+    async for line in lines:
+        if fmt != "csv":
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+                yield (row, None) if isinstance(row, dict) else ({}, "row is not a JSON object")
+            except ValueError as e:
+                yield {}, f"bad JSON: {e}"
+            continue
+        pending = f"{pending}\n{line}" if pending else line
+        if pending.count('"') % 2:
+            continue  # inside a quoted field
+        record, pending = pending, ""
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        yield {k: v for k, v in zip(header, values) if v != ""}, None
+
+async def spool(chunks: AsyncIterator[bytes]) -> str:
+    """Copy the upload to a temp file so the request returns once the body is in."""
+    fd, path = tempfile.mkstemp(prefix="campaign-", suffix=".upload")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in chunks:
+                await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+async def _file_chunks(path: str, size: int = 1 << 16) -> AsyncIterator[bytes]:
+    """Read a spooled upload back in chunks, deleting it when done."""
+    try:
+        with open(path, "rb") as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, size)
+                if not chunk:
+                    return
+                yield chunk
+    finally:
+        os.unlink(path)
+
+def _to_brief(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Accept StartBody-shaped rows and TaskCreate-shaped rows (brand/goal/identifiers)."""
+    row = dict(raw)
+    if "brand" in row:
+        row.setdefault("vendor_name", row.pop("brand"))
+    ids = row.pop("identifiers", None)
+    if isinstance(ids, str):
+        ids = json.loads(ids) if ids.strip() else {}
+    for k, v in (ids or {}).items():
+        row.setdefault(k, v)
+    return StartBody(**{k: v for k, v in row.items() if k in StartBody.model_fields}).model_dump(exclude_none=True)
+
+def prepare_row(raw: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """Same slot-filling as /intake/start, without asking follow-up questions."""
+    d = _to_brief(raw)
+    if d.get("utterance"):
+        for k, v in extract_fields(d["utterance"]).items():
+            d.setdefault(k, v)
+    apply_goal_intent(d)
+    d.setdefault("user_phone", DEFAULT_USER_PHONE)
+    return d, missing_fields(d, d.get("intent"))
+
+def _dial_vars(data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """Target number and call variables (directory and sqlite lookups: run in a thread)."""
+    return resolve_target_number(data) or DEFAULT_TARGET_NUMBER, build_call_vars(data)
+
+# ----------------- campaign -----------------
+
+class Campaign:
+    def __init__(self, name: Optional[str] = None, concurrency: int = CAMPAIGN_CONCURRENCY, cps: float = CAMPAIGN_CPS):
+        self.id = str(uuid.uuid4())
+        self.name = name
+        self.created_at = time.time()
+        self.uploaded = False
+        self.cancelled = False
+        self.rows = 0
+        self.counts: Dict[str, int] = {}
+        self.status: Dict[int, str] = {}
+        self.finished_at: Optional[float] = None
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=max(1, CAMPAIGN_EVENT_LOG))  # newest events only
+        self.seq = 0                         # seq of the last event emitted
+        self.calls: Dict[str, int] = {}      # call_id -> row
+        # bounded: the upload is parsed only as fast as the workers dial
+        self._ready: asyncio.Queue = asyncio.Queue(maxsize=max(1, concurrency) * 2)
+        self._changed = asyncio.Event()
+        self._ingest: Optional[asyncio.Task] = None
+        self._limiter = RateLimiter(cps)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(max(1, concurrency))]
+
+    # ---- progress ----
+
+    def _emit(self, row: int, status: str, **info):
+        prev = self.status.get(row)
+        if prev:
+            self.counts[prev] -= 1
+        self.status[row] = status
+        self.counts[status] = self.counts.get(status, 0) + 1
+        self.seq += 1
+        self.events.append({"seq": self.seq, "row": row, "status": status, **info})
+        self._mark_finished()
+        self._changed.set()
+
+    def _mark_finished(self):
+        if self.finished_at is None and self.done:
+            self.finished_at = time.time()
+
+    @property
+    def done(self) -> bool:
+        return self.uploaded and sum(self.counts.get(s, 0) for s in TERMINAL) == self.rows
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "campaign_id": self.id,
+            "name": self.name,
+            "rows": self.rows,
+            "uploaded": self.uploaded,
+            "done": self.done,
+            "cancelled": self.cancelled,
+            "counts": {k: v for k, v in self.counts.items() if v},
+        }
+
+    async def follow(self, after: int = 0, heartbeat_s: float = 15.0) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield events with seq > after, then keep following until the campaign is done.
+        Only the last CAMPAIGN_EVENT_LOG events are kept; older ones are reported as a gap.
+        """
+        while True:
+            self._changed.clear()
+            while after < self.seq:
+                first = self.seq - len(self.events) + 1
+                if after + 1 < first:
+                    yield {"type": "gap", "after": after, "skipped": first - after - 1}
+                    after = first - 1
+                    continue
+                after += 1
+                yield self.events[after - first]
+            if self.done:
+                yield {"type": "done", **self.summary()}
+                return
+            try:
+                await asyncio.wait_for(self._changed.wait(), heartbeat_s)
+            except asyncio.TimeoutError:
+                yield {"type": "heartbeat", **self.summary()}
+
+    # ---- pipeline ----
+
+    def start(self, path: str, fmt: str):
+        """Ingest a spooled upload in the background (see spool())."""
+        self._ingest = asyncio.create_task(self.ingest(_file_chunks(path), fmt))
+
+    async def ingest(self, chunks: AsyncIterator[bytes], fmt: str):
+        """Parse the upload as it streams in; ready rows go straight to the dial workers."""
+        try:
+            async for raw, err in _records(_lines(chunks), fmt):
+                if self.cancelled:
+                    break
+                self.rows += 1
+                row = self.rows
+                if err:
+                    self._emit(row, "invalid", error=err)
+                    continue
+                try:
+                    data, missing = await asyncio.to_thread(prepare_row, raw)
+                except (ValidationError, ValueError) as e:
+                    self._emit(row, "invalid", error=str(e).splitlines()[0])
+                    continue
+                if missing:
+                    self._emit(row, "invalid", missing=missing)
+                    continue
+                self._emit(row, "queued")
+                await self._ready.put((row, data))
+        finally:
+            self.uploaded = True
+            if self.cancelled:
+                self._drain()
+            else:
+                for _ in self._workers:
+                    await self._ready.put(None)
+            self._mark_finished()
+            self._changed.set()
+
+    def _drain(self):
+        """Drop rows still waiting for a worker, marking them cancelled (stop markers stay)."""
+        items = []
+        while not self._ready.empty():
+            items.append(self._ready.get_nowait())
+        for item in items:
+            if item is None:
+                self._ready.put_nowait(None)
+            else:
+                self._emit(item[0], "cancelled")
+
+    async def cancel(self):
+        """Stop dialing: queued rows are cancelled, in-flight dials finish, workers exit."""
+        self.cancelled = True
+        self._drain()
+        for _ in self._workers:
+            self._ready.put_nowait(None)
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    async def _worker(self):
+        while True:
+            item = await self._ready.get()
+            if item is None:
+                return
+            row, data = item
+            await self._limiter.acquire()
+            if self.cancelled:
+                self._emit(row, "cancelled")
+                continue
+            to_number, call_vars = await asyncio.to_thread(_dial_vars, data)
+            self._emit(row, "dialing", target_number=to_number)
+            try:
+                call_id = await asyncio.to_thread(
+                    start_vendor_call,
+                    to_number,
+                    {
+                        **call_vars,
+                        "metadata": {
+                            "campaign_id": self.id,
+                            "row": row,
+                            "vendor_name": data.get("vendor_name"),
+                            "intent": data.get("intent"),
+                        },
+                    },
+                )
+            except Exception as e:
+                self._emit(row, "failed", error=str(e))
+                continue
+            self.calls[call_id] = row
+            self._emit(row, "calling", call_id=call_id)
+
+    def record_outcome(self, call_id: str, summary: str, ended_reason: Optional[str] = None):
+        row = self.calls.pop(call_id, None)
+        if row is not None:
+            self._emit(row, "completed", call_id=call_id, summary=summary, ended_reason=ended_reason)
+
+
+class CampaignRegistry:
+    def __init__(self, ttl_s: float = CAMPAIGN_TTL_S):
+        self.ttl_s = ttl_s
+        self._campaigns: Dict[str, Campaign] = {}
+
+    def _expire(self):
+        """Forget campaigns that finished more than ttl_s ago."""
+        cutoff = time.time() - self.ttl_s
+        for cid in [cid for cid, c in self._campaigns.items() if c.finished_at and c.finished_at < cutoff]:
+            del self._campaigns[cid]
+
+    def create(self, name: Optional[str] = None) -> Campaign:
+        self._expire()
+        camp = Campaign(name)
+        self._campaigns[camp.id] = camp
+        return camp
+
+    def get(self, campaign_id: str) -> Optional[Campaign]:
+        self._expire()
+        return self._campaigns.get(campaign_id)
+
+    def for_call(self, call_id: Optional[str]) -> Optional[Campaign]:
+        if not call_id:
+            return None
+        return next((c for c in self._campaigns.values() if call_id in c.calls), None)
+
+
+CAMPAIGNS = CampaignRegistry()
+
+
+@on(END_OF_CALL_REPORT)
+def _on_campaign_call_ended(ev: VapiEvent):
+    camp = CAMPAIGNS.get(ev.metadata.get("campaign_id") or "") or CAMPAIGNS.for_call(ev.call_id)
+    if camp and ev.call_id:
+        camp.record_outcome(ev.call_id, event_summary(ev), ev.message.get("endedReason"))
+    return None
@@ -0,0 +1,212 @@
+# app/capture.py
+"""
+Traffic capture for bench/replay.py.
+
+With CAPTURE_FILE set, the app appends one compact JSON record per line to a
+gzip file (concatenated gzip members, so restarts just keep appending):
+
+    {"kind": "http", "ts": ..., "method", "path", "query", "body", "status", "ms", "resp": {...}}
+    {"kind": "llm", "ts": ..., "pass", "key", "content", "ms"}
+    {"kind": "vapi.create", "ts": ..., "session_id", "call_id", "monitor", "ms"}
+
+"http" covers the intake endpoints and the Vapi webhook (CAPTURE_PATHS);
+"llm" and "vapi.create" are what the external services answered, so a replay
+can serve them without the network. Phone numbers, e-mail addresses, card /
+account numbers and labeled ids (order, agreement, case, ticket, reference...
+numbers; only tokens with a digit) are replaced before anything is written, with
+stable tokens (HMAC of the value with CAPTURE_SALT), so the same number maps to
+the same token in a request body, an LLM answer and a webhook. Redaction is
+idempotent: tokens pass through unchanged, which lets the replayer key
+recorded LLM answers by the (already redacted) prompt it sees.
+
+Off by default; with CAPTURE_FILE empty nothing is installed.
+"""
+import atexit
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+from .config import CAPTURE_FILE, CAPTURE_SALT
+
+CAPTURE_PATHS = ("/intake/start", "/intake/reply", "/intake/reset", "/vapi/webhook", "/vapi/server")
+
+# ----------------- redaction -----------------
+
+_SALT = (CAPTURE_SALT or os.urandom(16).hex()).encode()
+
+PHONE_KEYS = {"user_phone", "target_number", "number", "phone", "phoneNumber", "customer_number", "from", "to"}
+ID_KEYS = {"order_id", "rental_agreement_number", "confirmation_number", "ticket_id", "case_number",
+           "reference", "account_number", "card_number", "email"}
+# ids the replay needs to line records up (and URLs), never rewritten
+KEEP_KEYS = {"id", "call_id", "session_id", "fanout_id", "campaign_id", "trace_id", "traceparent",
+             "assistantId", "phoneNumberId", "orgId", "controlUrl", "listenUrl"}
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+# "+1 202 555 0143", "(415) 555-1234", "1-800-555-1234", "415.555.1234"
+_PHONE = re.compile(
+    r"\+\d[\d\s\-().]{7,18}\d"
+    r"|(?<![\w+])(?:1[\s\-.]?)?\(?\d{3}\)?[\s\-.]?\d{3}[\s\-.]?\d{4}\b"
+)
+# card / account numbers: 12-19 digits, optionally grouped ("4111 1111 1111 1111")
+_LONG_DIGITS = re.compile(r"\b\d(?:[ \-]?\d){11,18}\b")
+# "order id WM-55821", "case # 88123", "ticket number is AB12CD"; the id must contain a
+# digit, so "my order from Walmart" keeps its words
+_LABELED_ID = re.compile(
+    r"(\b(?:order|agreement|contract|confirmation|case|ticket|reference|ref|claim|account|rma)"
+    r"\s*(?:(?:id|no\.?|number)(?=[\s:#])|#)?\s*(?:is|:)?\s*[:#\-]?\s*)((?=[A-Za-z\-]*\d)[A-Za-z0-9][A-Za-z0-9\-]{3,})\b",
+    re.I,
+)
+
+
+def _digest(value: str) -> str:
+    return hmac.new(_SALT, value.encode(), hashlib.sha256).hexdigest()
+
+
+def fake_phone(value: str) -> str:
+    digits = re.sub(r"\D", "", value)
+    if digits.startswith("1555") and len(digits) == 11:
+        return value  # already a token
+    if len(digits) == 11 and digits.startswith("1"):
+        digits = digits[1:]  # "+1 415 ..." and "(415) ..." are the same number
+    return "+1555" + str(int(_digest(digits), 16))[:7]
+
+
+def fake_id(value: str) -> str:
+    if value.startswith("ID-"):
+        return value
+    return "ID-" + _digest(value)[:8].upper()
+
+
+def fake_digits(value: str) -> str:
+    """Same length, leading 0000 (no real card/account number starts like that)."""
+    digits = re.sub(r"\D", "", value)
+    if digits.startswith("0000"):
+        return value  # already a token
+    return ("0000" + str(int(_digest(digits), 16)))[:len(digits)]
+
+
+def fake_email(value: str) -> str:
+    if value.endswith("@example.com"):
+        return value
+    return f"user-{_digest(value.lower())[:8]}@example.com"
+
+
+def redact_text(s: str) -> str:
+    s = _EMAIL.sub(lambda m: fake_email(m.group(0)), s)
+    s = _LONG_DIGITS.sub(lambda m: fake_digits(m.group(0)), s)
+    s = _LABELED_ID.sub(lambda m: m.group(1) + fake_id(m.group(2)), s)
+    return _PHONE.sub(lambda m: fake_phone(m.group(0)), s)
+
+
+def redact(obj: Any, key: Optional[str] = None) -> Any:
+    """Structural redaction of a JSON-like value (keys decide what a scalar is)."""
+    if isinstance(obj, dict):
+        return {k: redact(v, k) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [redact(v, key) for v in obj]
+    if isinstance(obj, str):
+        if key in KEEP_KEYS:
+            return obj
+        if key in PHONE_KEYS and re.search(r"\d{7}", re.sub(r"\D", "", obj)):
+            return fake_phone(obj)
+        if key in ID_KEYS and "@" in obj:
+            return fake_email(obj)
+        if key in ID_KEYS and re.search(r"\d", obj):  # same rule as in text: ids carry a digit
+            return fake_id(obj)
+        return redact_text(obj)
+    if isinstance(obj, (int, float)) and key in ID_KEYS:
+        return fake_id(str(obj))
+    return obj
+
+
+def redact_llm_content(content: Optional[str]) -> Optional[str]:
+    """LLM answers are usually JSON: redact them by key, else as text."""
+    if not content:
+        return content
+    try:
+        return json.dumps(redact(json.loads(content)))
+    except ValueError:
+        return redact_text(content)
+
+
+def prompt_key(messages) -> str:
+    """Key for a recorded LLM answer: digest of the redacted last message (the user's text)."""
+    last = (messages or [{}])[-1].get("content") or ""
+    return hashlib.sha1(redact_text(last).encode()).hexdigest()[:16]
+
+# ----------------- recorder -----------------
+
+
+class Recorder:
+    def __init__(self, path: str, flush_s: float = 1.0):
+        self.path, self.flush_s = path, flush_s
+        self._f = None
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self.records = 0
+
+    def record(self, kind: str, **fields):
+        line = json.dumps({"kind": kind, "ts": round(time.time(), 4), **fields}, separators=(",", ":"), default=str)
+        with self._lock:
+            try:
+                if self._f is None:
+                    self._f = gzip.open(self.path, "at", encoding="utf-8")
+                self._f.write(line + "\n")
+                self.records += 1
+                now = time.monotonic()
+                if now - self._last_flush >= self.flush_s:
+                    self._f.flush()
+                    self._last_flush = now
+            except OSError as e:
+                print(f"[capture] write to {self.path} failed: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+
+
+RECORDER: Optional[Recorder] = Recorder(CAPTURE_FILE) if CAPTURE_FILE else None
+if RECORDER:
+    atexit.register(RECORDER.close)
+
+
+async def http_middleware(request, call_next):
+    """Record captured paths (request body, status, latency, ids from the response)."""
+    if request.url.path not in CAPTURE_PATHS:
+        return await call_next(request)
+    from starlette.responses import Response
+    raw = await request.body()
+    t0 = time.perf_counter()
+    resp = await call_next(request)
+    body = b"".join([chunk async for chunk in resp.body_iterator])
+    ms = round((time.perf_counter() - t0) * 1000, 2)
+    try:
+        req_json = json.loads(raw) if raw else None
+    except ValueError:
+        req_json = None
+    try:
+        out = json.loads(body) if body else {}
+    except ValueError:
+        out = {}
+    ids = {k: out[k] for k in ("session_id", "call_id", "call_ids") if isinstance(out, dict) and out.get(k)}
+    RECORDER.record("http", method=request.method, path=request.url.path, query=request.url.query,
+                    body=redact(req_json), status=resp.status_code, ms=ms, resp=ids)
+    return Response(content=body, status_code=resp.status_code, headers=dict(resp.headers), media_type=resp.media_type)
+
+
+def record_llm(pass_name: str, messages, content: Optional[str], ms: float, error: Optional[str] = None):
+    extra = {"error": redact_text(error)} if error else {}
+    RECORDER.record("llm", **{"pass": pass_name}, key=prompt_key(messages),
+                    content=redact_llm_content(content), ms=round(ms, 2), **extra)
+
+
+def record_vapi_create(variable_values: Dict[str, Any], call_id: Optional[str], monitor: Optional[dict], ms: float):
+    RECORDER.record("vapi.create", session_id=((variable_values or {}).get("metadata") or {}).get("session_id"),
+                    call_id=call_id, monitor=monitor, ms=round(ms, 2))
@@ -0,0 +1,117 @@
+# app/clients.py
+"""
+Lazily constructed third-party clients.
+
+Nothing here imports an SDK or reads credentials until the first get(name), so
+importing the app (workers, scripts, test collection) doesn't pay for openai,
+vapi or twilio, and a missing key only fails the code path that needs it.
+register() swaps a factory, e.g. to put a recorded/fake client in place.
+"""
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+
+class ClientUnavailable(RuntimeError):
+    """The client can't be built here (missing credentials)."""
+
+
+def _require(name: str) -> str:
+    v = os.getenv(name)
+    if not v:
+        raise ClientUnavailable(f"Missing env var: {name}")
+    return v
+
+
+# ----------------- factories -----------------
+
+def _vapi():
+    from vapi import Vapi
+    from .config import VAPI_API_KEY
+    if not VAPI_API_KEY:
+        raise ClientUnavailable("Missing env var: VAPI_API_KEY")
+    return Vapi(token=VAPI_API_KEY)
+
+
+def _openai():
+    from openai import OpenAI
+    from .config import OPENAI_API_KEY
+    if not OPENAI_API_KEY:
+        raise ClientUnavailable("Missing env var: OPENAI_API_KEY")
+    return OpenAI(api_key=OPENAI_API_KEY)
+
+
+def _twilio():
+    from twilio.rest import Client
+    return Client(_require("TWILIO_ACCOUNT_SID"), _require("TWILIO_AUTH_TOKEN"))
+
+
+def _http():
+    # shared connection pool for plain HTTPS calls (Vapi control URLs, webhooks)
+    import httpx
+    return httpx.Client(timeout=10.0)
+
+
+def _ahttp():
+    # same, for coroutines (webhook delivery); connections are reused across requests
+    import httpx
+    return httpx.AsyncClient(timeout=10.0, limits=httpx.Limits(max_connections=50, max_keepalive_connections=20))
+
+
+_FACTORIES: Dict[str, Callable[[], Any]] = {
+    "vapi": _vapi,
+    "openai": _openai,
+    "twilio": _twilio,
+    "http": _http,
+    "ahttp": _ahttp,
+}
+_INSTANCES: Dict[str, Any] = {}
+_LOCK = threading.Lock()
+
+
+def register(name: str, factory: Callable[[], Any]):
+    """Install (or replace) the factory for `name`; an already built instance is dropped."""
+    with _LOCK:
+        _FACTORIES[name] = factory
+        _INSTANCES.pop(name, None)
+
+
+def get(name: str) -> Any:
+    inst = _INSTANCES.get(name)
+    if inst is not None:
+        return inst
+    with _LOCK:
+        inst = _INSTANCES.get(name)
+        if inst is None:
+            factory = _FACTORIES.get(name)
+            if factory is None:
+                raise KeyError(f"no client registered as {name!r}")
+            inst = _INSTANCES[name] = factory()
+        return inst
+
+
+def available(name: str) -> bool:
+    """True if get(name) would succeed (builds the client if needed)."""
+    try:
+        get(name)
+        return True
+    except ClientUnavailable:
+        return False
+
+
+def reset(name: Optional[str] = None):
+    """Forget built clients (all, or one) so the next get() rebuilds them."""
+    with _LOCK:
+        names = [name] if name else list(_INSTANCES)
+        for n in names:
+            inst = _INSTANCES.pop(n, None)
+            close = getattr(inst, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception:
+                    pass
+
+
+def loaded() -> List[str]:
+    return sorted(_INSTANCES)
@@ -7,6 +7,62 @@ VAPI_API_KEY       = os.getenv("VAPI_API_KEY", "")
 VAPI_ASSISTANT_ID  = os.getenv("VAPI_ASSISTANT_ID", "")
 VAPI_PHONE_NUMBER_ID = os.getenv("VAPI_PHONE_NUMBER_ID", "")  
 VAPI_FROM_NUMBER   = os.getenv("VAPI_FROM_NUMBER", "")
+# Caller-ID pool: "phoneNumberId[:max_concurrent[:calls_per_minute]],..." (falls back to VAPI_PHONE_NUMBER_ID)
+VAPI_NUMBER_POOL   = os.getenv("VAPI_NUMBER_POOL", "")
+NUMBER_POOL_WAIT_S = float(os.getenv("NUMBER_POOL_WAIT_S", "20"))
+
+# Bulk campaigns: parallel dial workers and overall calls/sec per campaign
+CAMPAIGN_CONCURRENCY = int(os.getenv("CAMPAIGN_CONCURRENCY", "4"))
+CAMPAIGN_CPS       = float(os.getenv("CAMPAIGN_CPS", "1"))
+# Events kept per campaign for /events replay; finished campaigns are dropped after N seconds
+CAMPAIGN_EVENT_LOG = int(os.getenv("CAMPAIGN_EVENT_LOG", "1000"))
+CAMPAIGN_TTL_S     = float(os.getenv("CAMPAIGN_TTL_S", "3600"))
+
+# Multi-vendor fan-out (hotel/service quotes)
+FANOUT_MAX_VENDORS = int(os.getenv("FANOUT_MAX_VENDORS", "5"))
+FANOUT_DEADLINE_S  = float(os.getenv("FANOUT_DEADLINE_S", "600"))
+# Settled fan-outs (decided, every leg ended) are dropped after N seconds
+FANOUT_TTL_S       = float(os.getenv("FANOUT_TTL_S", "3600"))
+
+# Learned IVR paths: outcomes lose half their weight every N days
+IVR_HALF_LIFE_DAYS = float(os.getenv("IVR_HALF_LIFE_DAYS", "14"))
+# Best-path lookups are cached in memory this long (local writes invalidate at once)
+IVR_CACHE_S        = float(os.getenv("IVR_CACHE_S", "300"))
+
+# Transcript ingestion: rows per multi-row INSERT batch, max seconds a line waits in memory
+TRANSCRIPT_BATCH_SIZE = int(os.getenv("TRANSCRIPT_BATCH_SIZE", "200"))
+TRANSCRIPT_FLUSH_S = float(os.getenv("TRANSCRIPT_FLUSH_S", "1.0"))
+
+# Duplicate dial protection: identical call requests within this window reuse the call;
+# Idempotency-Key responses are replayed for IDEMPOTENCY_TTL_S
+INFLIGHT_WINDOW_S  = float(os.getenv("INFLIGHT_WINDOW_S", "300"))
+IDEMPOTENCY_TTL_S  = float(os.getenv("IDEMPOTENCY_TTL_S", "86400"))
+
+# Session store: number of striped locks guarding per-session read-modify-write
+SESSION_LOCK_STRIPES = int(os.getenv("SESSION_LOCK_STRIPES", "64"))
+# Unacknowledged events kept per session before the oldest are evicted (reported as overflow)
+OUTBOX_CAPACITY    = int(os.getenv("OUTBOX_CAPACITY", "500"))
+
+# Tracing: OTel-shaped spans appended to TRACE_FILE (off unless set; rotated at TRACE_FILE_MAX_MB);
+# share of traces kept
+TRACE_FILE         = os.getenv("TRACE_FILE", "")
+TRACE_FILE_MAX_MB  = float(os.getenv("TRACE_FILE_MAX_MB", "100"))
+TRACE_SAMPLE_RATE  = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "autocaller")
+
+# Traffic capture for bench/replay.py: gzip NDJSON of intake/webhook requests and
+# external answers ("" = off); HMAC key for the redaction tokens (random per process if unset)
+CAPTURE_FILE       = os.getenv("CAPTURE_FILE", "")
+CAPTURE_SALT       = os.getenv("CAPTURE_SALT", "")
+
+# /debug/profile: disabled unless PROFILE_TOKEN is set (sent as X-Debug-Token);
+# longest run, and the share of one core the sampler may use
+PROFILE_TOKEN      = os.getenv("PROFILE_TOKEN", "")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+PROFILE_MAX_OVERHEAD = float(os.getenv("PROFILE_MAX_OVERHEAD", "0.05"))
+
+# Live call monitor: frames buffered between the socket reader and the outbox
+MONITOR_BUFFER     = int(os.getenv("MONITOR_BUFFER", "256"))
 USER_NAME          = os.getenv("USER_NAME", "Customer")
 DEFAULT_USER_PHONE = os.getenv("DEFAULT_USER_PHONE", "+16674190027")
 DEFAULT_TARGET_NUMBER = os.getenv("DEFAULT_TARGET_NUMBER", "+16674190027")
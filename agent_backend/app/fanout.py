@@ -0,0 +1,250 @@
+# app/fanout.py
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional
+from .wizard import build_call_vars, resolve_target_number
+from .vapi_client import start_vendor_call, hangup_many
+from .vapi_events import on, event_summary, VapiEvent, END_OF_CALL_REPORT
+from .config import DEFAULT_TARGET_NUMBER, FANOUT_DEADLINE_S, FANOUT_MAX_VENDORS, FANOUT_TTL_S
+
+# Intents where "call several vendors and compare" makes sense
+FANOUT_INTENTS = ("hotel_booking", "service_booking")
+
+_PRICE_RE = re.compile(r"\$\s?(\d{1,3}(?:,\d{3})*(?:\.\d{1,2})?|\d+(?:\.\d{1,2})?)")
+
+_POOL = ThreadPoolExecutor(max_workers=FANOUT_MAX_VENDORS, thread_name_prefix="fanout")
+
+
+def is_fanout(d: Dict[str, Any]) -> bool:
+    return d.get("intent") in FANOUT_INTENTS and len(d.get("vendors") or []) > 1
+
+
+def fanout_missing(d: Dict[str, Any], missing: List[str]) -> List[str]:
+    """With a vendor list, the single vendor/hotel name slots are filled per leg."""
+    if not is_fanout(d):
+        return missing
+    return [f for f in missing if f not in ("vendor_name", "hotel_name")]
+
+
+def _vendor_entries(d: Dict[str, Any]) -> List[Dict[str, Any]]:
+    out = []
+    for v in (d.get("vendors") or [])[:FANOUT_MAX_VENDORS]:
+        v = {"vendor_name": v} if isinstance(v, str) else dict(v)
+        v.setdefault("vendor_name", v.pop("name", None))
+        if v.get("vendor_name"):
+            out.append(v)
+    return out
+
+
+def extract_price(ev: VapiEvent, summary: str) -> Optional[float]:
+    structured = (ev.message.get("analysis") or {}).get("structuredData") or {}
+    for k in ("price", "total_price", "quote"):
+        try:
+            if structured.get(k) is not None:
+                return float(str(structured[k]).replace(",", "").lstrip("$"))
+        except ValueError:
+            pass
+    m = _PRICE_RE.search(summary or "")
+    return float(m.group(1).replace(",", "")) if m else None
+
+
+@dataclass
+class FanoutLeg:
+    vendor_name: str
+    target_number: str
+    call_id: Optional[str] = None
+    status: str = "dialing"   # dialing | calling | ended | failed | cancelled
+    summary: Optional[str] = None
+    price: Optional[float] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class FanoutGroup:
+    session_id: str
+    outbox: Any                       # the session outbox (anything with .append)
+    legs: List[FanoutLeg] = field(default_factory=list)
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    deadline: float = 0.0
+    reported: bool = False
+    picked: Optional[str] = None
+    settled_at: Optional[float] = None  # decided and every leg ended
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def leg(self, call_id: Optional[str]) -> Optional[FanoutLeg]:
+        return next((l for l in self.legs if call_id and l.call_id == call_id), None)
+
+    def active(self) -> List[FanoutLeg]:
+        return [l for l in self.legs if l.status in ("dialing", "calling")]
+
+    def settle(self):
+        if self.settled_at is None and self.reported and not self.active():
+            self.settled_at = time.time()
+
+    def comparison(self) -> List[Dict[str, Any]]:
+        quotes = [asdict(l) for l in self.legs]
+        # priced quotes first, cheapest first; unpriced keep dial order
+        return sorted(quotes, key=lambda q: (q["price"] is None, q["price"] or 0))
+
+    def finish(self, reason: str):
+        """Post the aggregated comparison once (all legs done, or deadline passed)."""
+        with self._lock:
+            if self.reported:
+                return
+            self.reported = True
+        quotes = self.comparison()
+        best = next((q for q in quotes if q["price"] is not None), None)
+        self.outbox.append({
+            "type": "quote_comparison",
+            "fanout_id": self.id,
+            "reason": reason,
+            "quotes": quotes,
+            "best": best,
+            "pending": [l.call_id for l in self.active()],
+        })
+        self.settle()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "fanout_id": self.id,
+            "session_id": self.session_id,
+            "deadline": self.deadline,
+            "reported": self.reported,
+            "picked": self.picked,
+            "legs": [asdict(l) for l in self.legs],
+        }
+
+
+class FanoutRegistry:
+    def __init__(self, ttl_s: float = FANOUT_TTL_S):
+        self.ttl_s = ttl_s
+        self._groups: Dict[str, FanoutGroup] = {}
+        self._by_call: Dict[str, str] = {}
+        self._by_session: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        """Forget groups that settled more than ttl_s ago."""
+        cutoff = time.time() - self.ttl_s
+        with self._lock:
+            for gid in [gid for gid, g in self._groups.items() if g.settled_at and g.settled_at < cutoff]:
+                group = self._groups.pop(gid)
+                for leg in group.legs:
+                    if leg.call_id and self._by_call.get(leg.call_id) == gid:
+                        del self._by_call[leg.call_id]
+                if self._by_session.get(group.session_id) == gid:
+                    del self._by_session[group.session_id]
+
+    def __len__(self):
+        return len(self._groups)
+
+    def get(self, fanout_id: str) -> Optional[FanoutGroup]:
+        self._expire()
+        return self._groups.get(fanout_id)
+
+    def for_session(self, session_id: str) -> Optional[FanoutGroup]:
+        self._expire()
+        return self._groups.get(self._by_session.get(session_id, ""))
+
+    def for_call(self, call_id: Optional[str]) -> Optional[FanoutGroup]:
+        self._expire()
+        return self._groups.get(self._by_call.get(call_id or "", ""))
+
+    def start(self, session_id: str, outbox: Any, d: Dict[str, Any], deadline_s: float = FANOUT_DEADLINE_S) -> FanoutGroup:
+        """Dial every vendor concurrently with the same call vars; one leg per vendor."""
+        self._expire()
+        group = FanoutGroup(session_id=session_id, outbox=outbox, deadline=time.time() + deadline_s)
+        leg_vars: List[Dict[str, Any]] = []
+        for v in _vendor_entries(d):
+            leg_data = {k: val for k, val in d.items() if k not in ("vendors", "target_number")}
+            leg_data.update(v)
+            if d.get("intent") == "hotel_booking":
+                leg_data["hotel_name"] = v["vendor_name"]
+            to_number = resolve_target_number(leg_data) or DEFAULT_TARGET_NUMBER
+            group.legs.append(FanoutLeg(vendor_name=v["vendor_name"], target_number=to_number))
+            leg_vars.append(leg_data)
+        with self._lock:
+            self._groups[group.id] = group
+            self._by_session[session_id] = group.id
+
+        def dial(leg: FanoutLeg, leg_data: Dict[str, Any]):
+            try:
+                leg.call_id = start_vendor_call(
+                    leg.target_number,
+                    {
+                        **build_call_vars(leg_data),
+                        "metadata": {
+                            "session_id": session_id,
+                            "fanout_id": group.id,
+                            "vendor_name": leg.vendor_name,
+                            "intent": leg_data.get("intent"),
+                        },
+                    },
+                )
+                leg.status = "calling"
+                with self._lock:
+                    self._by_call[leg.call_id] = group.id
+            except Exception as e:
+                leg.status, leg.error = "failed", str(e)
+
+        list(_POOL.map(dial, group.legs, leg_vars))
+        if not group.active():
+            group.finish("complete")
+        else:
+            t = threading.Timer(deadline_s, group.finish, args=("deadline",))
+            t.daemon = True
+            t.start()
+        return group
+
+    def record_result(self, ev: VapiEvent) -> Optional[FanoutGroup]:
+        group = self.for_call(ev.call_id)
+        leg = group.leg(ev.call_id) if group else None
+        if not leg:
+            return None
+        if leg.status != "cancelled":
+            leg.status = "ended"
+        leg.summary = event_summary(ev)
+        leg.price = extract_price(ev, leg.summary)
+        group.outbox.append({
+            "type": "fanout_result",
+            "fanout_id": group.id,
+            "call_id": leg.call_id,
+            "vendor_name": leg.vendor_name,
+            "summary": leg.summary,
+            "price": leg.price,
+        })
+        if not group.active():
+            group.finish("complete")
+        group.settle()
+        return group
+
+    async def pick(self, group: FanoutGroup, call_id: str) -> List[str]:
+        """User chose one vendor: hang up every other outstanding leg in parallel."""
+        if not group.leg(call_id):
+            raise KeyError(call_id)
+        group.picked = call_id
+        others = [l for l in group.active() if l.call_id and l.call_id != call_id]
+        results = await hangup_many(l.call_id for l in others)
+        cancelled = [l.call_id for l in others if results.get(l.call_id)]
+        for leg in others:
+            if leg.call_id in cancelled:
+                leg.status = "cancelled"
+        group.outbox.append({"type": "fanout_picked", "fanout_id": group.id, "call_id": call_id,
+                             "cancelled": cancelled})
+        if not group.active():
+            group.finish("picked")
+        group.settle()
+        return cancelled
+
+
+FANOUTS = FanoutRegistry()
+
+
+@on(END_OF_CALL_REPORT)
+def _on_fanout_call_ended(ev: VapiEvent):
+    FANOUTS.record_result(ev)
+    return None
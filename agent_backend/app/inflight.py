@@ -0,0 +1,150 @@
+# app/inflight.py
+"""
+Single-flight registries for the intake endpoints.
+
+CALLS dedupes dialing: the key is a canonical fingerprint of what the call is
+for (intent, vendor, order/agreement id, user_phone). The first request runs
+start_vendor_call; concurrent requests with the same key block on its result
+and later ones within INFLIGHT_WINDOW_S attach to the same call_id instead of
+dialing again. The entry is dropped when the call ends (see main._track), so
+calling back about the same order afterwards dials normally.
+
+IDEMPOTENT replays whole responses for an Idempotency-Key header: a retried
+/intake/start or /intake/reply gets the first response back instead of being
+processed twice. Reusing a key with a different body is a 422.
+
+Failures are not cached: the leader's exception is raised to the requests
+waiting on it and the next request tries again.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from .config import INFLIGHT_WINDOW_S, IDEMPOTENCY_TTL_S
+from .vendor_directory import vendor_key
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error", "at")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        self.at = time.monotonic()
+
+
+class SingleFlight:
+    """key → result of the first fn() for that key, shared for `ttl` seconds."""
+
+    def __init__(self, ttl: float, max_entries: int = 10000, wait_s: float = 60.0):
+        self.ttl, self.max_entries, self.wait_s = ttl, max_entries, wait_s
+        self._flights: "OrderedDict[Hashable, _Flight]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"leaders": 0, "shared": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Returns (value, shared); shared=True when another request's result was reused."""
+        now = time.monotonic()
+        with self._lock:
+            f = self._flights.get(key)
+            if f is not None and f.done.is_set() and (f.error is not None or now - f.at > self.ttl):
+                self._flights.pop(key, None)
+                f = None
+            leader = f is None
+            if leader:
+                f = self._flights[key] = _Flight()
+                self.stats["leaders"] += 1
+                self._evict_locked(now)
+            else:
+                self.stats["shared"] += 1
+        if not leader:
+            if not f.done.wait(self.wait_s):
+                raise TimeoutError("timed out waiting for the identical in-flight request")
+            if f.error is not None:
+                raise f.error
+            return f.value, True
+        try:
+            f.value = fn()
+        except BaseException as e:
+            f.error = e
+            with self._lock:
+                if self._flights.get(key) is f:
+                    self._flights.pop(key)
+            raise
+        finally:
+            f.at = time.monotonic()  # the window runs from when the result exists
+            f.done.set()
+        return f.value, False
+
+    def forget(self, key: Hashable):
+        with self._lock:
+            self._flights.pop(key, None)
+
+    def forget_value(self, value: Any) -> int:
+        """Drop every finished entry whose result is `value` (e.g. a call that ended)."""
+        with self._lock:
+            keys = [k for k, f in self._flights.items() if f.done.is_set() and f.value == value]
+            for k in keys:
+                self._flights.pop(k)
+            return len(keys)
+
+    def _evict_locked(self, now: float):
+        for k in [k for k, f in self._flights.items() if f.done.is_set() and now - f.at > self.ttl]:
+            self._flights.pop(k)
+        while len(self._flights) > self.max_entries:
+            k, f = next(iter(self._flights.items()))
+            if not f.done.is_set():
+                break  # never evict a flight others may be waiting on
+            self._flights.pop(k)
+
+    def __len__(self):
+        return len(self._flights)
+
+
+# ----------------- fingerprints -----------------
+
+def _norm(v: Any) -> str:
+    return re.sub(r"[^a-z0-9+]", "", str(v or "").lower())
+
+
+# what the call is about, per intent (a different question/stay/service is a different call)
+_SUBJECT_FIELDS = ("order_id", "rental_agreement_number", "item", "question", "hotel_name", "city",
+                   "stay_start", "stay_end", "service_type", "preferred_time")
+
+
+def call_fingerprint(d: Dict[str, Any]) -> str:
+    """What makes two requests "the same call": intent, vendor, user_phone and the intent's subject fields."""
+    vendor = d.get("vendor_name")
+    parts = [
+        _norm(d.get("intent") or d.get("goal")),
+        vendor_key(vendor) if vendor else _norm(d.get("target_number")),
+        _norm(d.get("user_phone")),
+        *(_norm(d.get(k)) for k in _SUBJECT_FIELDS),
+    ]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def body_fingerprint(body: Any) -> str:
+    data = body.model_dump(exclude_none=True) if hasattr(body, "model_dump") else body
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class IdempotencyMismatch(ValueError):
+    """Idempotency-Key reused with a different request body."""
+
+
+def idempotent(endpoint: str, key: str, body: Any, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+    """Run fn once per (endpoint, Idempotency-Key); repeats get the stored response."""
+    fp = body_fingerprint(body)
+    (stored_fp, resp), replayed = IDEMPOTENT.do((endpoint, key), lambda: (fp, fn()))
+    if replayed and stored_fp != fp:
+        raise IdempotencyMismatch(f"Idempotency-Key {key!r} was used with a different request")
+    return resp, replayed
+
+
+CALLS = SingleFlight(INFLIGHT_WINDOW_S)
+IDEMPOTENT = SingleFlight(IDEMPOTENCY_TTL_S)
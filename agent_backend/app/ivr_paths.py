@@ -0,0 +1,217 @@
+# app/ivr_paths.py
+"""
+Learned IVR paths: which DTMF/speech sequence got us from the vendor's phone
+tree to a live agent, per vendor and department. Outcomes are kept as
+exponentially decayed counters, so recent calls outweigh old ones and a menu
+change stops being recommended after a few failures.
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from server.storage import DB_FILE
+from .vendor_directory import vendor_key, INTENT_DEPARTMENT
+from .vapi_events import on, VapiEvent, END_OF_CALL_REPORT
+from .config import IVR_HALF_LIFE_DAYS, IVR_CACHE_S
+
+_HALF_LIFE_S = IVR_HALF_LIFE_DAYS * 86400
+
+DEFAULT_KEYWORDS = {
+    "returns": ["return", "refund", "replacement"],
+    "agent": ["representative", "agent", "operator"],
+}
+DEFAULT_FALLBACK = {"dtmf": "0", "speak": "representative"}
+
+# The remote side sounds like a person rather than a menu
+_HUMAN_RE = re.compile(
+    r"\b(my name is|this is \w+( \w+)? speaking|\w+ speaking|how (can|may) i (help|assist)"
+    r"|thank you for holding|who am i speaking with)\b",
+    re.I,
+)
+_MENU_RE = re.compile(r"\b(press|option|menu|para espa|say or enter|dial)\b", re.I)
+
+
+# ----------------- transcript → path -----------------
+
+def _dtmf_digits(msg: Dict[str, Any]) -> str:
+    digits = ""
+    for tc in msg.get("toolCalls") or []:
+        fn = tc.get("function") or {}
+        if fn.get("name") != "dtmf":
+            continue
+        args = fn.get("arguments") or {}
+        if isinstance(args, str):
+            try:
+                args = json.loads(args)
+            except ValueError:
+                args = {}
+        digits += str(args.get("digits") or args.get("keys") or "")
+    return digits
+
+
+def extract_path(messages: List[Dict[str, Any]]) -> Tuple[str, str, Optional[float]]:
+    """
+    Walk Vapi artifact messages in order and return (dtmf, speak, time_to_agent).
+    dtmf joins key presses with 'w' (wait) between menu levels, e.g. "1w3#";
+    speak is the last thing we said to the menu. time_to_agent is None if no
+    human ever came on the line.
+    """
+    presses: List[str] = []
+    speak = ""
+    for m in messages:
+        role = m.get("role")
+        text = (m.get("message") or m.get("content") or "").strip()
+        if role == "user" and text and _HUMAN_RE.search(text) and not _MENU_RE.search(text):
+            return "w".join(presses), speak, m.get("secondsFromStart")
+        digits = _dtmf_digits(m)
+        if digits:
+            presses.append(digits)
+        elif role in ("bot", "assistant") and text and len(text) <= 40:
+            speak = text  # short utterances to a menu ("representative", "returns")
+    return "w".join(presses), speak, None
+
+
+# ----------------- store -----------------
+
+def _decayed(value: float, last: Optional[float], now: float) -> float:
+    if not last:
+        return value
+    return value * 0.5 ** ((now - last) / _HALF_LIFE_S)
+
+
+def record(vendor: str, department: str, dtmf: str, speak: str, reached: bool,
+           time_to_agent: Optional[float] = None, db_file: str = DB_FILE):
+    """Fold one outcome into the path's counters (read-modify-write in one immediate transaction)."""
+    conn = sqlite3.connect(db_file, isolation_level=None, timeout=30)
+    try:
+        conn.execute("begin immediate")
+        now = time.time()
+        row = conn.execute(
+            "select attempts, successes, avg_time_to_agent, last_used_at, last_success_at from ivr_paths "
+            "where vendor=? and department=? and dtmf=? and speak=?",
+            (vendor, department, dtmf, speak),
+        ).fetchone()
+        attempts, successes, avg_tta, last, last_success = row or (0.0, 0.0, None, None, None)
+        attempts = _decayed(attempts, last, now) + 1
+        successes = _decayed(successes, last, now) + (1 if reached else 0)
+        if reached:
+            last_success = now
+            if time_to_agent is not None:
+                avg_tta = time_to_agent if avg_tta is None else 0.7 * avg_tta + 0.3 * time_to_agent
+        conn.execute(
+            "insert or replace into ivr_paths(vendor,department,dtmf,speak,attempts,successes,"
+            "avg_time_to_agent,last_used_at,last_success_at) values(?,?,?,?,?,?,?,?,?)",
+            (vendor, department, dtmf, speak, attempts, successes, avg_tta, now, last_success),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    _invalidate(vendor, department)
+
+
+# webhook handlers run on the event loop; outcomes are written from one background thread
+_WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ivr-paths")
+
+
+def _record_logged(*args):
+    try:
+        record(*args)
+    except sqlite3.Error as e:
+        print(f"[ivr_paths] not recorded: {e}")
+
+
+def ranked_paths(vendor: str, department: str, db_file: str = DB_FILE) -> List[Dict[str, Any]]:
+    """Known paths, best first: decayed success rate (Laplace-smoothed), then time-to-agent."""
+    now = time.time()
+    try:
+        conn = sqlite3.connect(db_file)
+        try:
+            rows = conn.execute(
+                "select dtmf, speak, attempts, successes, avg_time_to_agent, last_used_at "
+                "from ivr_paths where vendor=? and department=?",
+                (vendor, department),
+            ).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.OperationalError:
+        return []  # migrations not applied yet
+    out = []
+    for dtmf, speak, attempts, successes, tta, last in rows:
+        a, s = _decayed(attempts, last, now), _decayed(successes, last, now)
+        out.append({
+            "dtmf": dtmf,
+            "speak": speak,
+            "attempts": round(a, 3),
+            "successes": round(s, 3),
+            "success_rate": round((s + 1) / (a + 2), 4),
+            "avg_time_to_agent": tta,
+        })
+    out.sort(key=lambda p: (-p["success_rate"], p["avg_time_to_agent"] or float("inf")))
+    return out
+
+
+# (vendor, department) → (monotonic time, ranked paths). Every dial reads these, often on
+# the event loop, so sqlite is read at most once per IVR_CACHE_S; record() (the writer
+# thread) drops the entry, and the version check keeps a read that raced it from caching.
+_RANKED: Dict[Tuple[str, str], Tuple[float, List[Dict[str, Any]]]] = {}
+_VERSION = 0
+_CACHE_LOCK = threading.Lock()
+
+
+def _invalidate(vendor: str, department: str):
+    global _VERSION
+    with _CACHE_LOCK:
+        _VERSION += 1
+        _RANKED.pop((vendor, department), None)
+
+
+def _cached_ranked(vendor: str, department: str) -> List[Dict[str, Any]]:
+    key = (vendor, department)
+    with _CACHE_LOCK:
+        hit, version = _RANKED.get(key), _VERSION
+    if hit and time.monotonic() - hit[0] < IVR_CACHE_S:
+        return hit[1]
+    paths = ranked_paths(vendor, department)
+    with _CACHE_LOCK:
+        if version == _VERSION:
+            _RANKED[key] = (time.monotonic(), paths)
+    return paths
+
+
+def best_path(vendor: str, department: str, min_successes: float = 0.5) -> Optional[Dict[str, str]]:
+    for p in _cached_ranked(vendor, department):
+        if p["successes"] >= min_successes and p["success_rate"] > 0.5 and (p["dtmf"] or p["speak"]):
+            return {k: p[k] for k in ("dtmf", "speak") if p[k]}
+    return None
+
+
+def vendor_profile(vendor_name: Optional[str], intent: Optional[str]) -> Dict[str, Any]:
+    """The `vendor_profile` call variable, seeded with the best learned path (if any)."""
+    department = INTENT_DEPARTMENT.get(intent or "", "customer_care")
+    profile: Dict[str, Any] = {"keywords": DEFAULT_KEYWORDS, "paths": {}, "fallback": DEFAULT_FALLBACK}
+    if vendor_name:
+        path = best_path(vendor_key(vendor_name), department)
+        if path:
+            profile["paths"][department] = path
+    return profile
+
+
+@on(END_OF_CALL_REPORT)
+def _learn_from_call(ev: VapiEvent):
+    meta = ev.metadata
+    vendor = meta.get("vendor_name")
+    messages = (ev.message.get("artifact") or {}).get("messages") or ev.message.get("messages") or []
+    if not vendor or not messages:
+        return None
+    dtmf, speak, tta = extract_path(messages)
+    if not dtmf and not speak:
+        return None  # no menu on this call; nothing to learn
+    department = INTENT_DEPARTMENT.get(meta.get("intent") or "", "customer_care")
+    _WRITER.submit(_record_logged, vendor_key(vendor), department, dtmf, speak, tta is not None, tta)
+    return None
@@ -1,13 +1,29 @@
 # app/llm.py
-import json, re
+import json, re, time
 from typing import Dict, Any, List, Optional
 from .config import USE_LLM, OPENAI_API_KEY
 from .wizard import friendly_prompt
-
-_oai = None
-if USE_LLM and OPENAI_API_KEY:
-    from openai import OpenAI
-    _oai = OpenAI(api_key=OPENAI_API_KEY)
+from . import clients
+from .tracing import span, KIND_CLIENT
+from .capture import RECORDER, record_llm
+
+def _oai():
+    """OpenAI client when the LLM is enabled (built on first use), else None."""
+    return clients.get("openai") if USE_LLM and OPENAI_API_KEY else None
+
+def _chat(oai, pass_name: str, **kw):
+    """One chat completion, timed as an llm.chat span."""
+    with span("llm.chat", KIND_CLIENT, model=kw.get("model"), **{"llm.pass": pass_name}):
+        t0 = time.perf_counter()
+        try:
+            r = oai.chat.completions.create(**kw)
+        except Exception as e:
+            if RECORDER:
+                record_llm(pass_name, kw.get("messages"), None, (time.perf_counter() - t0) * 1000, error=str(e))
+            raise
+    if RECORDER:
+        record_llm(pass_name, kw.get("messages"), r.choices[0].message.content, (time.perf_counter() - t0) * 1000)
+    return r
 
 SCHEMA_KEYS = [
     # intent
@@ -176,6 +192,12 @@ def _post_enrich_question(u: str, data: Dict[str, Any], intent: Optional[str] =
     return out
 
 def extract_fields_with_debug(utterance: str) -> Dict[str, Any]:
+    with span("llm.extract", chars=len(utterance or "")) as sp:
+        dbg = _extract_fields_with_debug(utterance)
+        sp.set(fields=len(dbg.get("fields") or {}), **{"llm.pass": dbg.get("pass")})
+        return dbg
+
+def _extract_fields_with_debug(utterance: str) -> Dict[str, Any]:
     """
     1) Chat Completions with JSON response_format (primary)
     2) Plain chat JSON parsing (fallback)
@@ -187,10 +209,11 @@ def extract_fields_with_debug(utterance: str) -> Dict[str, Any]:
         dbg["pass"] = "empty"
         return dbg
 
-    if _oai:
+    oai = _oai()
+    if oai:
         # 1) JSON-formatted response
         try:
-            r = _oai.chat.completions.create(
+            r = _chat(oai, "chat_json_object",
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": SYSTEM_INSTRUCTIONS},
@@ -212,7 +235,7 @@ def extract_fields_with_debug(utterance: str) -> Dict[str, Any]:
 
         # 2) Plain chat JSON parsing
         try:
-            r2 = _oai.chat.completions.create(
+            r2 = _chat(oai, "chat_plain",
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": SYSTEM_INSTRUCTIONS},
@@ -1,25 +1,65 @@
 # app/main.py
-import uuid
-from typing import Dict, Any, Optional, List
-from fastapi import FastAPI, HTTPException, Body, Request
-from .models import StartBody, ReplyBody, SessionState
+import asyncio
+import hmac
+import json
+import math
+from typing import Dict, Any, Optional, List, Tuple
+from fastapi import FastAPI, HTTPException, Body, Request, Header, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from .models import StartBody, ReplyBody, PickBody, SessionState
 from .wizard import (
     missing_fields,
     resolve_target_number,
     build_call_vars,
     should_suppress,
+    apply_goal_intent,
 )
 from .llm import extract_fields, extract_fields_with_debug, compose_multi_question
-from .vapi_client import start_vendor_call, hangup_call
+from .vapi_client import (
+    start_vendor_call, hangup_many, get_listen_url, release_number,
+    remember_monitor, forget_call, NUMBER_POOL,
+)
+from .number_pool import PoolExhausted
+from .vapi_events import (
+    VapiEvent,
+    on,
+    parse_event,
+    dispatch,
+    event_summary,
+    STATUS_UPDATE,
+    TRANSCRIPT,
+    END_OF_CALL_REPORT,
+)
+from .call_lifecycle import TRACKER
+from .campaign import CAMPAIGNS, spool
+from server.storage import init_db
+from server.summarize import SUMMARIES
+from server.maintenance import maintenance_loop
+from .transcripts import search as search_transcripts
+from .fanout import FANOUTS, is_fanout, fanout_missing
+from .monitor import MONITORS
+from .sessions import SessionStore
+from .profiler import PROFILER, ProfilerBusy
+from .tracing import start_trace, continue_trace, span, trace_metadata
+from .capture import RECORDER, http_middleware as capture_middleware
+from .inflight import CALLS, IDEMPOTENT, call_fingerprint, idempotent, IdempotencyMismatch
 from .config import (
     DEFAULT_USER_PHONE,
     USE_LLM,
     OPENAI_API_KEY,
     DEFAULT_TARGET_NUMBER,
+    PROFILE_TOKEN,
 )
 
 app = FastAPI()
-SESS: Dict[str, SessionState] = {}
+SESS = SessionStore()
+if RECORDER:
+    app.middleware("http")(capture_middleware)  # CAPTURE_FILE: record traffic for bench/replay.py
+
+@app.on_event("startup")
+async def _startup():
+    await init_db()
+    asyncio.create_task(maintenance_loop())  # retention/compaction; opt-in via MAINTENANCE_INTERVAL_S
 
 # ----------------- helpers -----------------
 
@@ -32,24 +72,45 @@ def _merge(d: Dict[str, Any], add: Dict[str, Any], overwrite: bool = False):
 
 def _apply_intent(sess: SessionState):
     """Freeze a specific intent once chosen; do not downgrade to generic_query later."""
-    cur = sess.data.get("intent")
-    if cur in ("retail_return", "hotel_booking", "rental_issue", "service_booking"):
-        return
-    g = (sess.data.get("goal") or "").lower()
-    if g in ("refund", "replacement", "return", "exchange"):
-        sess.data["intent"] = "retail_return"
+    apply_goal_intent(sess.data)
+
+def _fanout_brief(group) -> Dict[str, Any]:
+    return {
+        "fanout_id": group.id,
+        "call_ids": [l.call_id for l in group.legs if l.call_id],
+        "failed": [{"vendor_name": l.vendor_name, "error": l.error} for l in group.legs if l.status == "failed"],
+    }
 
 def _find_session_by_call_id(call_id: str) -> Optional[str]:
     if not call_id:
         return None
-    for sid, sess in SESS.items():
-        if sess.call_id == call_id:
-            return sid
-    return None
+    return SESS.find_by_call(call_id)[0]
+
+def _dial_once(sid: str, sess: SessionState, d: Dict[str, Any], to_number: str, call_vars: Dict[str, Any]) -> Tuple[str, bool]:
+    """Start the call unless an identical one is already in flight; returns (call_id, attached)."""
+    call_vars["metadata"].update(trace_metadata())  # webhook continues this trace
+    with span("intake.dial", intent=d.get("intent"), vendor=d.get("vendor_name")) as sp:
+        call_id, attached = CALLS.do(call_fingerprint(d), lambda: start_vendor_call(to_number, call_vars))
+        sp.set(call_id=call_id, deduplicated=attached)
+    sess.call_id = call_id
+    if not attached:
+        TRACKER.start(call_id, session_id=sid)
+    return call_id, attached
+
+def _with_idempotency(endpoint: str, key: Optional[str], body: Any, response: Response, fn):
+    if not key:
+        return fn()
+    try:
+        resp, replayed = idempotent(endpoint, key, body, fn)
+    except IdempotencyMismatch as e:
+        raise HTTPException(422, str(e))
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return resp
 
 def _find_recent_session() -> Optional[str]:
     # last inserted key (ok for dev)
-    return next(reversed(SESS)) if SESS else None
+    return SESS.latest()
 
 # ----------------- health -----------------
 
@@ -57,58 +118,77 @@ def _find_recent_session() -> Optional[str]:
 def health():
     return {"ok": True}
 
+@app.exception_handler(PoolExhausted)
+def _pool_exhausted(req: Request, exc: PoolExhausted):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "10"})
+
 # ----------------- intake/start -----------------
 
 @app.post("/intake/start")
-def intake_start(body: StartBody):
-    sid = str(uuid.uuid4())
-    sess = SessionState(data={}, ask_counts={})
-    SESS[sid] = sess
-    d = sess.data
-
-    # explicit prefills
-    _merge(d, body.model_dump(exclude_none=True))
-
-    # LLM extraction (one pass)
-    if body.utterance:
-        _merge(d, extract_fields(body.utterance), overwrite=True)
-
-    _apply_intent(sess)
-    d.setdefault("user_phone", DEFAULT_USER_PHONE)
-
-    missing = missing_fields(d, d.get("intent"))
-
-    if not missing:
-        to_number = resolve_target_number(d) or DEFAULT_TARGET_NUMBER
-        d.setdefault("target_number", to_number)
-
-        # INCLUDE METADATA → so webhook can map back to the session
-        call_id = start_vendor_call(
-            to_number,
-            {
-                **build_call_vars(d),
-                "metadata": {
-                    "session_id": sid,
-                    "vendor_name": d.get("vendor_name"),
-                    "goal": d.get("goal"),
-                    "intent": d.get("intent"),
-                },
-            },
-        )
-        sess.call_id = call_id
+def intake_start(body: StartBody, response: Response, idempotency_key: Optional[str] = Header(None)):
+    return _with_idempotency("start", idempotency_key, body, response, lambda: _intake_start(body))
+
+def _intake_start(body: StartBody):
+    sid, sess = SESS.create(lambda: SessionState(data={}, ask_counts={}))
+    with start_trace("POST /intake/start", session_id=sid) as root:
+        sess.trace = root.traceparent()
+        return _fill_new_session(sid, sess, body)
+
+def _fill_new_session(sid: str, sess: SessionState, body: StartBody):
+    # LLM extraction (one pass); slow, so done before taking the session lock
+    extracted = extract_fields(body.utterance) if body.utterance else {}
+
+    # the lock covers only the read-modify-write of sess.data, never the dial
+    with SESS.lock(sid):
+        d = sess.data
+
+        # explicit prefills
+        _merge(d, body.model_dump(exclude_none=True))
+        _merge(d, extracted, overwrite=True)
+
+        _apply_intent(sess)
+        d.setdefault("user_phone", DEFAULT_USER_PHONE)
+
+        missing = fanout_missing(d, missing_fields(d, d.get("intent")))
+
+        if missing:
+            # record ask counts for suppression
+            for f in missing:
+                sess.ask_counts[f] = sess.ask_counts.get(f, 0) + 1
+            q = compose_multi_question(missing, d)
+            return {"session_id": sid, "next_fields": missing, "question": q}
+
+        fanout = is_fanout(d)
+        if not fanout:
+            d.setdefault("target_number", resolve_target_number(d) or DEFAULT_TARGET_NUMBER)
+        brief = dict(d)
+
+    if fanout:
+        group = FANOUTS.start(sid, sess.outbox, brief)
         return {
             "session_id": sid,
             "next_fields": [],
-            "question": "Calling the company now.",
-            "call_id": call_id,
+            "question": f"Calling {len(group.legs)} companies now.",
+            **_fanout_brief(group),
         }
 
-    # record ask counts for suppression
-    for f in missing:
-        sess.ask_counts[f] = sess.ask_counts.get(f, 0) + 1
-
-    q = compose_multi_question(missing, d)
-    return {"session_id": sid, "next_fields": missing, "question": q}
+    # INCLUDE METADATA → so webhook can map back to the session
+    call_id, attached = _dial_once(sid, sess, brief, brief["target_number"], {
+        **build_call_vars(brief),
+        "metadata": {
+            "session_id": sid,
+            "vendor_name": brief.get("vendor_name"),
+            "goal": brief.get("goal"),
+            "intent": brief.get("intent"),
+        },
+    })
+    return {
+        "session_id": sid,
+        "next_fields": [],
+        "question": "Already calling the company about this." if attached else "Calling the company now.",
+        "call_id": call_id,
+        "deduplicated": attached,
+    }
 
 # ----------------- intent-scoped pruning (avoid cross-talk) -----------------
 
@@ -119,7 +199,7 @@ INTENT_FIELD_WHITELIST = {
     },
     "hotel_booking": {
         "intent","vendor_name","hotel_name","city","stay_start","stay_end","nights",
-        "ask_price","ask_discounts","question","target_number","user_phone",
+        "ask_price","ask_discounts","question","target_number","user_phone","vendors",
     },
     "rental_issue": {
         "intent","vendor_name","target_number","user_phone",
@@ -127,7 +207,7 @@ INTENT_FIELD_WHITELIST = {
     },
     "service_booking": {
         "intent","vendor_name","service_type","preferred_time","ask_availability",
-        "question","target_number","user_phone",
+        "question","target_number","user_phone","vendors",
     },
     "generic_query": {
         "intent","vendor_name","question","target_number","user_phone",
@@ -147,152 +227,256 @@ def _prune_by_intent(d: Dict[str, Any], intent: Optional[str]) -> None:
 # ----------------- intake/reply -----------------
 
 @app.post("/intake/reply")
-def intake_reply(body: ReplyBody):
+def intake_reply(body: ReplyBody, response: Response, idempotency_key: Optional[str] = Header(None)):
+    def run():
+        sess = SESS.get(body.session_id)
+        with continue_trace(sess.trace if sess else None, "POST /intake/reply", session_id=body.session_id):
+            return _intake_reply(body)
+    return _with_idempotency("reply", idempotency_key, body, response, run)
+
+def _intake_reply(body: ReplyBody):
     sess = SESS.get(body.session_id)
     if not sess:
         raise HTTPException(404, "Unknown session_id")
-    d = sess.data
 
+    # LLM extraction reads only the answer: done before taking the session lock
     extracted = extract_fields(body.answer or "")
     print("=== EXTRACTED FROM ANSWER ===", extracted)
-
-    prev_intent = d.get("intent")
-    _merge(d, extracted, overwrite=True)
-
-    # prevent accidental downgrade to generic_query
-    if prev_intent in ("retail_return","hotel_booking","rental_issue","service_booking") and d.get("intent") == "generic_query":
-        d["intent"] = prev_intent
-
-    # prune if user truly switched intents
-    if d.get("intent") and prev_intent and d.get("intent") != prev_intent:
-        _prune_by_intent(d, d.get("intent"))
-
-    _apply_intent(sess)
-
-    # figure out what's missing and suppress over-asked fields
-    missing_all = missing_fields(d, d.get("intent"))
-    missing = [f for f in missing_all if not should_suppress(f, sess.ask_counts)]
-
-    if missing:
-        for f in missing:
-            sess.ask_counts[f] = sess.ask_counts.get(f, 0) + 1
-        q = compose_multi_question(missing, d)
-        return {"done": False, "next_fields": missing, "question": q}
+    if body.vendors:
+        extracted["vendors"] = body.vendors
+
+    # one read-modify-write of sess.data at a time; dialing happens after the lock
+    # is released (identical concurrent dials are joined by the CALLS single-flight)
+    with SESS.lock(body.session_id):
+        d = sess.data
+        prev_intent = d.get("intent")
+        _merge(d, extracted, overwrite=True)
+
+        # prevent accidental downgrade to generic_query
+        if prev_intent in ("retail_return","hotel_booking","rental_issue","service_booking") and d.get("intent") == "generic_query":
+            d["intent"] = prev_intent
+
+        # prune if user truly switched intents
+        if d.get("intent") and prev_intent and d.get("intent") != prev_intent:
+            _prune_by_intent(d, d.get("intent"))
+
+        _apply_intent(sess)
+
+        # figure out what's missing and suppress over-asked fields
+        missing_all = fanout_missing(d, missing_fields(d, d.get("intent")))
+        missing = [f for f in missing_all if not should_suppress(f, sess.ask_counts)]
+
+        if missing:
+            for f in missing:
+                sess.ask_counts[f] = sess.ask_counts.get(f, 0) + 1
+            q = compose_multi_question(missing, d)
+            return {"done": False, "next_fields": missing, "question": q}
+
+        fanout = is_fanout(d)
+        if not fanout:
+            d.setdefault("target_number", resolve_target_number(d) or DEFAULT_TARGET_NUMBER)
+        brief = dict(d)
+
+        if not fanout:
+            # clear memory before call: keep only essentials
+            minimal: Dict[str, Any] = {}
+            for k in (
+                "intent", "vendor_name", "hotel_name", "service_type",
+                "preferred_time", "ask_availability", "question",
+                "user_phone", "target_number", "order_id", "item",
+                "reason", "date_of_purchase", "bill_amount", "rental_agreement_number",
+                "city", "stay_start", "stay_end", "nights", "ask_price", "ask_discounts",
+            ):
+                if d.get(k) not in (None, "", []):
+                    minimal[k] = d[k]
+            sess.data = minimal
 
     # ===== READY TO DIAL =====
-    to_number = resolve_target_number(d) or DEFAULT_TARGET_NUMBER
-    d.setdefault("target_number", to_number)
-
-    call_vars = build_call_vars(d)
-
-    # clear memory before call: keep only essentials
-    minimal: Dict[str, Any] = {}
-    for k in (
-        "intent", "vendor_name", "hotel_name", "service_type",
-        "preferred_time", "ask_availability", "question",
-        "user_phone", "target_number", "order_id", "item",
-        "reason", "date_of_purchase", "bill_amount", "rental_agreement_number",
-        "city", "stay_start", "stay_end", "nights", "ask_price", "ask_discounts",
-    ):
-        if d.get(k) not in (None, "", []):
-            minimal[k] = d[k]
-    sess.data = minimal
-
-    call_id = start_vendor_call(
-        to_number,
-        {
-            **call_vars,
-            "metadata": {
-                "session_id": body.session_id,
-                "vendor_name": minimal.get("vendor_name"),
-                "goal": minimal.get("intent") or minimal.get("goal"),
-                "intent": minimal.get("intent"),
-            },
+    if fanout:
+        group = FANOUTS.start(body.session_id, sess.outbox, brief)
+        return {"done": True, "message": f"Calling {len(group.legs)} companies now.", **_fanout_brief(group)}
+
+    call_id, attached = _dial_once(body.session_id, sess, minimal, minimal["target_number"], {
+        **build_call_vars(brief),
+        "metadata": {
+            "session_id": body.session_id,
+            "vendor_name": minimal.get("vendor_name"),
+            "goal": minimal.get("intent") or minimal.get("goal"),
+            "intent": minimal.get("intent"),
         },
-    )
-    sess.call_id = call_id
-    return {"done": True, "message": "Calling the company now.", "call_id": call_id}
+    })
+    message = "Already calling the company about this." if attached else "Calling the company now."
+    return {"done": True, "message": message, "call_id": call_id, "deduplicated": attached}
 
 # ----------------- reset -----------------
 
 @app.post("/intake/reset")
 def intake_reset(session_id: str = Body(...)):
-    if session_id in SESS:
-        SESS[session_id].data.clear()
-        SESS[session_id].ask_counts.clear()
-        SESS[session_id].call_id = None
-        SESS[session_id].outbox.clear()
+    sess = SESS.get(session_id)
+    if sess:
+        with SESS.lock(session_id):
+            sess.data.clear()
+            sess.ask_counts.clear()
+            sess.call_id = None
+            sess.outbox.clear()
     return {"ok": True, "cleared": session_id}
 
-# ----------------- Vapi webhook → enqueue summary -----------------
-
-# app/main.py (replace your vapi_webhook body with this)
-@app.post("/vapi/webhook")
-async def vapi_webhook(req: Request):
-    payload = await req.json()
-
-    # 1) Extract call_id from any of the known places
-    call_id = (
-        payload.get("call_id")
-        or payload.get("id")
-        or (payload.get("call") or {}).get("id")
-        or (payload.get("message") or {}).get("callId")
+# ----------------- Vapi server messages -----------------
+
+def _sessions_for_event(ev: VapiEvent) -> List[SessionState]:
+    """
+    Sessions for a webhook event: every session on the call_id (deduplicated
+    requests share one call), else the metadata session_id.
+    """
+    found = [s for _, s in SESS.find_all_by_call(ev.call_id)]
+    if not found and ev.session_id and SESS.get(ev.session_id):
+        found = [SESS.get(ev.session_id)]
+    return found
+
+def _track(ev: VapiEvent, status: str, ended_reason: Optional[str] = None):
+    """Advance the call lifecycle and tell the client when the phase changed."""
+    if not ev.call_id:
+        return
+    lc, changed = TRACKER.observe(
+        ev.call_id, status, session_id=ev.session_id, ts=ev.ts, ended_reason=ended_reason,
     )
+    if lc.status == "ended":
+        release_number(ev.call_id)
+        MONITORS.detach(ev.call_id)
+        CALLS.forget_value(ev.call_id)  # a new request about the same order may dial again
+        forget_call(ev.call_id)
+    else:
+        remember_monitor(ev.call_id, ev.call.get("monitor"))  # controlUrl for a fast hangup
+    if changed:
+        for sess in _sessions_for_event(ev):
+            sess.outbox.append({"type": "call_status", "call_id": ev.call_id, "status": lc.status})
+
+@on(STATUS_UPDATE)
+def _on_status_update(ev: VapiEvent):
+    _track(ev, ev.message.get("status") or "", ev.message.get("endedReason"))
+    return None
 
-    # 2) Extract session_id from variables/assistantOverrides, if present
-    session_id = (
-        (((payload.get("variables") or {}).get("metadata")) or {}).get("session_id")
-        or ((((payload.get("assistant") or {}).get("assistantOverrides") or {}).get("variableValues") or {}).get("metadata") or {}).get("session_id")
-        or (payload.get("metadata") or {}).get("session_id")
-        or (payload.get("message") or {}).get("metadata", {}).get("session_id")
-    )
+@on(TRANSCRIPT)
+def _on_transcript(ev: VapiEvent):
+    # any transcript means the line is live, even if the status-update was lost
+    _track(ev, "in-progress")
+    if ev.message.get("transcriptType", "final") == "final":
+        SUMMARIES.feed(ev.call_id, ev.message.get("role") or "", ev.message.get("transcript") or "")
+    return None
 
-    # 3) Find session: prefer by call_id, else by session_id
-    sess = None
-    if call_id:
-        sess = next((s for s in SESS.values() if s.call_id == call_id), None)
-    if not sess and session_id:
-        sess = SESS.get(session_id)
+@on(END_OF_CALL_REPORT)
+def _on_end_of_call(ev: VapiEvent):
+    _track(ev, "ended", ev.message.get("endedReason"))
+    running = SUMMARIES.end(ev.call_id)
+
+    sessions = _sessions_for_event(ev)
+    if ev.metadata.get("fanout_id") or FANOUTS.for_call(ev.call_id):
+        return None  # fan-out legs report through the fan-out group
+    if not sessions:
+        if ev.metadata.get("campaign_id"):
+            return None  # campaign rows have no chat session
+        print(f"[/vapi/webhook] no session found (call_id={ev.call_id}, session_id={ev.session_id})")
+        return None
 
-    if not sess:
-        print(f"[/vapi/webhook] no session found (call_id={call_id}, session_id={session_id})")
-        return {"ok": True}
-
-    # 4) Extract a human summary from multiple possible shapes
-    summary = (
-        (payload.get("message") or {}).get("analysis", {}).get("summary")
-        or payload.get("summary")
-        or payload.get("report")
-        or (payload.get("metadata") or {}).get("summary")
-        or "Call completed."
-    )
+    summary = event_summary(ev)
 
-    # Optional confirmation/ticket
-    conf = (
-        (payload.get("message") or {}).get("analysis", {}).get("confirmation")
-        or (payload.get("metadata") or {}).get("confirmation")
-    )
-    if conf:
-        summary += f" Confirmation: {conf}."
+    outcome = running.outcome() if running else None
+    for sess in sessions:
+        # Enqueue to chat
+        sess.outbox.append({"type": "call_summary", "text": summary, "outcome": outcome})
+        sess.outbox.append({"type": "status", "text": "Call ended."})
 
-    # 5) Enqueue to chat
-    sess.outbox.append({"type": "call_summary", "text": summary})
-    sess.outbox.append({"type": "status", "text": "Call ended."})
+        # Clear active call (a late report for an older call must not clear a newer one)
+        if not ev.call_id or sess.call_id == ev.call_id:
+            sess.call_id = None
+    return {"ok": True, "queued": 2 * len(sessions)}
 
-    # 6) Clear active call
-    sess.call_id = None
-    return {"ok": True, "queued": 2}
+@app.post("/vapi/webhook")
+@app.post("/vapi/server")
+async def vapi_webhook(req: Request):
+    payload = await req.json()
+    ev = parse_event(payload)
+    with continue_trace(ev.metadata.get("traceparent"), f"POST /vapi/webhook {ev.type}",
+                        call_id=ev.call_id, session_id=ev.session_id):
+        return dispatch(ev)
+
+@app.get("/call/status")
+def call_status(session_id: Optional[str] = None, call_id: Optional[str] = None):
+    if call_id:
+        lc = TRACKER.get(call_id)
+        if not lc:
+            raise HTTPException(404, "Unknown call_id")
+        return lc.to_dict()
+    if not session_id:
+        raise HTTPException(400, "Provide session_id or call_id")
+    return {"session_id": session_id, "calls": [lc.to_dict() for lc in TRACKER.for_session(session_id)]}
+
+# ----------------- bulk campaigns -----------------
+
+@app.post("/campaigns", status_code=202)
+async def campaign_create(req: Request, format: Optional[str] = None, name: Optional[str] = None):
+    """
+    Upload briefs as NDJSON (default) or CSV (?format=csv or text/csv body).
+    Returns the campaign_id as soon as the body is in (spooled to a temp file);
+    rows are parsed in the background and dialed by throttled workers.
+    """
+    fmt = format or ("csv" if "csv" in req.headers.get("content-type", "") else "ndjson")
+    path = await spool(req.stream())
+    camp = CAMPAIGNS.create(name)
+    camp.start(path, fmt)
+    return camp.summary()
+
+@app.get("/campaigns/{campaign_id}")
+def campaign_status(campaign_id: str):
+    camp = CAMPAIGNS.get(campaign_id)
+    if not camp:
+        raise HTTPException(404, "Unknown campaign_id")
+    return camp.summary()
+
+@app.get("/campaigns/{campaign_id}/events")
+async def campaign_events(campaign_id: str, after: int = 0):
+    """NDJSON stream of per-row outcomes; reconnect with ?after=<last seq> to resume."""
+    camp = CAMPAIGNS.get(campaign_id)
+    if not camp:
+        raise HTTPException(404, "Unknown campaign_id")
+
+    async def gen():
+        async for ev in camp.follow(after):
+            yield json.dumps(ev) + "\n"
+
+    return StreamingResponse(gen(), media_type="application/x-ndjson")
+
+# ----------------- transcripts -----------------
+
+@app.get("/transcripts/search")
+def transcripts_search(
+    q: Optional[str] = None,
+    vendor: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    call_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+):
+    """Phrase search over call transcripts; since/until are 'YYYY-MM-DD[ HH:MM:SS]' UTC."""
+    try:
+        return search_transcripts(q, vendor, since, until, call_id, cursor, limit)
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Bad cursor")
 
 # ----------------- polling -----------------
 
 @app.get("/events/poll")
-def poll_events(session_id: str):
+def poll_events(session_id: str, after: Optional[int] = None, limit: Optional[int] = None):
+    """
+    Events for the session. Pass ?after=<seq of the last event you handled> (the
+    response's next_after) to ack up to there and resume; lost responses are
+    re-served. Without `after` every returned event is dropped (drain).
+    """
     sess = SESS.get(session_id)
     if not sess:
         raise HTTPException(404, "Unknown session_id")
-    items = list(sess.outbox)
-    sess.outbox.clear()
-    return {"events": items}
+    return sess.outbox.read(after, limit)
 
 # ----------------- debug -----------------
 
@@ -303,26 +487,167 @@ def debug_sessions():
             "call_id": sess.call_id,
             "expected_fields": getattr(sess, "expected_fields", []),
             "ask_counts": getattr(sess, "ask_counts", {}),
-            "outbox_len": len(getattr(sess, "outbox", [])),
+            "outbox": sess.outbox.stats(),
             "data_keys": list((sess.data or {}).keys()),
         }
     return {sid: brief(s) for sid, s in SESS.items()}
 
+@app.get("/debug/pool")
+def debug_pool():
+    return NUMBER_POOL.snapshot()
+
+@app.get("/debug/profile")
+async def debug_profile(
+    seconds: float = 10,
+    interval_ms: float = 5,
+    include_idle: bool = False,
+    format: str = "json",
+    x_debug_token: Optional[str] = Header(None),
+):
+    """
+    Sample every thread's stack for `seconds`; JSON with top functions and
+    collapsed stacks, or ?format=collapsed for flamegraph.pl/speedscope input.
+    """
+    if not PROFILE_TOKEN:
+        raise HTTPException(404, "Profiling is disabled (set PROFILE_TOKEN)")
+    if not hmac.compare_digest(x_debug_token or "", PROFILE_TOKEN):
+        raise HTTPException(403, "Bad X-Debug-Token")
+    if not (math.isfinite(seconds) and math.isfinite(interval_ms)):
+        raise HTTPException(422, "seconds and interval_ms must be finite numbers")
+    if PROFILER.running:
+        raise HTTPException(409, "A profile is already running")
+    try:
+        result = await asyncio.to_thread(PROFILER.run, seconds, interval_ms / 1000.0, include_idle)
+    except ProfilerBusy as e:
+        raise HTTPException(409, str(e))
+    if format == "collapsed":
+        return PlainTextResponse(result["collapsed"] + "\n")
+    return result
+
+@app.get("/debug/inflight")
+def debug_inflight():
+    return {"calls": {"entries": len(CALLS), **CALLS.stats},
+            "idempotency": {"entries": len(IDEMPOTENT), **IDEMPOTENT.stats}}
+
+# ----------------- fan-out -----------------
+
+@app.get("/fanout/{session_id}")
+def fanout_status(session_id: str):
+    group = FANOUTS.for_session(session_id)
+    if not group:
+        raise HTTPException(404, "No fan-out for that session_id")
+    return group.to_dict()
+
+@app.post("/fanout/pick")
+async def fanout_pick(body: PickBody):
+    group = FANOUTS.for_session(body.session_id)
+    if not group:
+        raise HTTPException(404, "No fan-out for that session_id")
+    try:
+        cancelled = await FANOUTS.pick(group, body.call_id)
+    except KeyError:
+        raise HTTPException(404, "call_id is not part of this fan-out")
+    return {"ok": True, "picked": body.call_id, "cancelled": cancelled}
+
+# ----------------- live monitor -----------------
+
+@app.post("/call/monitor")
+async def call_monitor(session_id: str = Body(None), call_id: str = Body(None)):
+    """Attach to the call's monitor socket; transcript lines arrive via /events/poll."""
+    sess = SESS.get(session_id) if session_id else None
+    if session_id and not sess:
+        raise HTTPException(404, "Unknown session_id")
+    call_id = call_id or (sess.call_id if sess else None)
+    if not call_id:
+        raise HTTPException(400, "Provide session_id or call_id (no active call)")
+    if not sess:
+        sess = SESS.find_by_call(call_id)[1]
+        if not sess:
+            raise HTTPException(404, "No session owns that call_id")
+    try:
+        url = await asyncio.to_thread(get_listen_url, call_id)
+    except Exception as e:
+        raise HTTPException(502, f"Could not fetch call: {e}")
+    if not url:
+        raise HTTPException(409, "Call has no monitor listenUrl (monitoring disabled or call ended)")
+    def sink(line: Dict[str, Any]):
+        # every session attached to the call (deduplicated requests) sees the live transcript
+        for s in [s for _, s in SESS.find_all_by_call(call_id)] or [sess]:
+            s.outbox.append(line)
+
+    mon = MONITORS.attach(call_id, url, sink)
+    return {"ok": True, "monitoring": True, **mon.stats()}
+
+@app.post("/call/monitor/stop")
+def call_monitor_stop(session_id: str = Body(None), call_id: str = Body(None)):
+    if session_id and not call_id:
+        sess = SESS.get(session_id)
+        call_id = sess.call_id if sess else None
+    if not call_id:
+        raise HTTPException(400, "Provide session_id or call_id")
+    return {"ok": True, "detached": MONITORS.detach(call_id), "call_id": call_id}
+
+@app.get("/debug/monitors")
+def debug_monitors():
+    return MONITORS.active()
+
 # ----------------- hangup -----------------
 
+def _session_active_calls(session_id: str, sess: SessionState) -> List[str]:
+    """The session's current call, fan-out legs still up, and any tracked call not yet ended."""
+    ids = [sess.call_id] if sess.call_id else []
+    group = FANOUTS.for_session(session_id)
+    if group:
+        ids += [l.call_id for l in group.active() if l.call_id]
+    ids += [lc.call_id for lc in TRACKER.for_session(session_id)]
+
+    def ended(cid: str) -> bool:
+        lc = TRACKER.get(cid)
+        return bool(lc and lc.status == "ended")
+
+    return [cid for cid in dict.fromkeys(ids) if not ended(cid)]
+
+async def _hangup(call_ids: List[str]) -> Dict[str, bool]:
+    results = await hangup_many(call_ids)
+    for cid, ok in results.items():
+        if ok:
+            MONITORS.detach(cid)
+            CALLS.forget_value(cid)
+    return results
+
 @app.post("/call/hangup")
-def call_hangup(session_id: str = Body(None), call_id: str = Body(None)):
-    if session_id and not call_id:
+async def call_hangup(session_id: str = Body(None), call_id: str = Body(None)):
+    """End one call (call_id) or every active call of a session, in parallel."""
+    if call_id:
+        call_ids = [call_id]
+    elif session_id:
         sess = SESS.get(session_id)
-        if not sess or not sess.call_id:
+        call_ids = _session_active_calls(session_id, sess) if sess else []
+        if not call_ids:
             raise HTTPException(404, "Unknown session or no active call for that session_id")
-        call_id = sess.call_id
-    if not call_id:
+    else:
         raise HTTPException(400, "Provide session_id or call_id")
-    ok = hangup_call(call_id)
-    if not ok:
+    results = await _hangup(call_ids)
+    if not any(results.values()):
         raise HTTPException(502, "Failed to end call (no controlUrl or POST failed)")
-    return {"ok": True, "ended": True, "call_id": call_id}
+    out: Dict[str, Any] = {"ok": all(results.values()), "ended": all(results.values()), "results": results}
+    if len(call_ids) == 1:
+        out["call_id"] = call_ids[0]
+    return out
+
+@app.post("/campaigns/{campaign_id}/hangup")
+async def campaign_hangup(campaign_id: str):
+    """
+    Stop the campaign and end every call of it that is still up: queued rows are
+    cancelled, in-flight dials finish first so their calls are ended too.
+    """
+    camp = CAMPAIGNS.get(campaign_id)
+    if not camp:
+        raise HTTPException(404, "Unknown campaign_id")
+    await camp.cancel()
+    results = await _hangup(list(camp.calls))
+    return {"ok": all(results.values()), "requested": len(results),
+            "ended": sum(results.values()), "results": results, "campaign": camp.summary()}
 
 # ----------------- debug extract -----------------
 @app.post("/debug/extract")
@@ -1,6 +1,7 @@
 # app/models.py
-from typing import Optional, Dict, Any, List
-from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List, Union
+from pydantic import BaseModel, ConfigDict, Field
+from .outbox import Outbox
 
 class StartBody(BaseModel):
     utterance: Optional[str] = None
@@ -8,6 +9,8 @@ class StartBody(BaseModel):
     vendor_name: Optional[str] = None
     target_number: Optional[str] = None
     user_phone: Optional[str] = None
+    # fan-out: several vendors to call in parallel (names or {vendor_name, target_number})
+    vendors: Optional[List[Union[str, Dict[str, Any]]]] = None
     # legacy goal (kept for backward compat; LLM will set intent)
     goal: Optional[str] = None
 
@@ -34,12 +37,20 @@ class StartBody(BaseModel):
 class ReplyBody(BaseModel):
     session_id: str
     answer: str
+    vendors: Optional[List[Union[str, Dict[str, Any]]]] = None
+
+class PickBody(BaseModel):
+    session_id: str
+    call_id: str
 
 class SessionState(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     data: Dict[str, Any] = Field(default_factory=dict)
     call_id: Optional[str] = None
     expected_fields: List[str] = []
     intent: Optional[str] = None
     ask_counts: Dict[str, int] = Field(default_factory=dict)  # track field prompts
     intent: Optional[str] = None
-    outbox: List[Dict[str, Any]] = Field(default_factory=list)
+    trace: Optional[str] = None  # traceparent of the intake trace (app/tracing.py)
+    outbox: Outbox = Field(default_factory=Outbox)  # seq-numbered ring buffer, read by /events/poll
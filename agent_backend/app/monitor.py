@@ -0,0 +1,146 @@
+# app/monitor.py
+"""
+Live call monitoring over the Vapi monitor socket (call.monitor.listenUrl).
+
+A reader task pulls frames off the socket into a bounded queue; a consumer
+forwards transcript lines to a sink (the session outbox). Transcript frames
+apply backpressure (the reader waits, so the socket stops being drained);
+audio frames are dropped when the queue is full, since stale audio is useless.
+"""
+import asyncio
+import json
+import threading
+from typing import Any, Callable, Dict, Optional
+from .config import MONITOR_BUFFER
+
+Sink = Callable[[Dict[str, Any]], None]
+
+
+class CallMonitor:
+    def __init__(self, call_id: str, url: str, sink: Sink, max_buffer: int = MONITOR_BUFFER):
+        self.call_id = call_id
+        self.url = url
+        self.sink = sink
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffer)
+        self.lines = 0
+        self.audio_frames = 0
+        self.audio_dropped = 0
+        self.error: Optional[str] = None
+        self._ws = None
+
+    async def _read(self):
+        import websockets  # deferred: only needed once a call is monitored
+        try:
+            async with websockets.connect(self.url, max_queue=16) as ws:
+                self._ws = ws
+                async for frame in ws:
+                    if isinstance(frame, bytes):
+                        self.audio_frames += 1
+                        try:
+                            self.queue.put_nowait(frame)
+                        except asyncio.QueueFull:
+                            self.audio_dropped += 1
+                        continue
+                    try:
+                        ev = json.loads(frame)
+                    except ValueError:
+                        continue
+                    await self.queue.put(ev)  # blocks → socket backpressure
+        except (OSError, websockets.WebSocketException) as e:
+            self.error = str(e)
+            print(f"[monitor] {self.call_id}: {e}")
+        await self.queue.put(None)
+
+    async def _consume(self):
+        while True:
+            ev = await self.queue.get()
+            if ev is None:
+                return
+            if isinstance(ev, bytes):
+                continue  # audio: counted, not forwarded (no STT here)
+            if not isinstance(ev, dict):
+                continue  # valid JSON but not an event object
+            if str(ev.get("type") or "").startswith("transcript") and ev.get("transcriptType", "final") == "final":
+                text = (ev.get("transcript") or "").strip()
+                if text:
+                    self.lines += 1
+                    self.sink({"type": "transcript", "call_id": self.call_id, "role": ev.get("role"), "text": text})
+            elif ev.get("type") == "status-update" and ev.get("status") == "ended":
+                return
+
+    async def run(self):
+        reader = asyncio.create_task(self._read())
+        try:
+            await self._consume()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            reader.cancel()
+            try:
+                await reader
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "call_id": self.call_id,
+            "lines": self.lines,
+            "buffered": self.queue.qsize(),
+            "audio_frames": self.audio_frames,
+            "audio_dropped": self.audio_dropped,
+            "error": self.error,
+        }
+
+
+class MonitorRegistry:
+    """One monitor per call; detach() is safe from any thread (sync endpoints, webhooks)."""
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._monitors: Dict[str, CallMonitor] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def attach(self, call_id: str, url: str, sink: Sink) -> CallMonitor:
+        """Start monitoring (must be called on the event loop)."""
+        with self._lock:
+            if call_id in self._monitors:
+                return self._monitors[call_id]
+            self._loop = asyncio.get_running_loop()
+            mon = CallMonitor(call_id, url, sink)
+            task = asyncio.create_task(mon.run())
+            self._monitors[call_id] = mon
+            self._tasks[call_id] = task
+        task.add_done_callback(lambda _t: self._forget(call_id))
+        return mon
+
+    def _forget(self, call_id: str):
+        with self._lock:
+            self._tasks.pop(call_id, None)
+            self._monitors.pop(call_id, None)
+
+    def detach(self, call_id: Optional[str]) -> bool:
+        with self._lock:
+            task = self._tasks.get(call_id or "")
+            loop = self._loop
+        if not task or not loop:
+            return False
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            task.cancel()
+        else:
+            loop.call_soon_threadsafe(task.cancel)
+        return True
+
+    def get(self, call_id: str) -> Optional[CallMonitor]:
+        return self._monitors.get(call_id)
+
+    def active(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {cid: m.stats() for cid, m in self._monitors.items()}
+
+
+MONITORS = MonitorRegistry()
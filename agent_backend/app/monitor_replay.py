@@ -0,0 +1,68 @@
+# app/monitor_replay.py
+"""
+Local stand-in for a Vapi monitor socket: replays a recorded call to every
+client that connects, then closes.
+
+Recording format (JSONL, one frame per line):
+  {"t": 1.25, "frame": {"type": "transcript", "role": "user", ...}}   → text frame
+  {"t": 1.30, "audio": 640}                                          → 640 bytes of silence
+`t` is seconds from the start of the call.
+
+    python -m app.monitor_replay data/recordings/sample_call.jsonl --port 8765 --speed 4
+    # then point a CallMonitor at ws://127.0.0.1:8765
+"""
+import argparse
+import asyncio
+import json
+from typing import Any, Dict, List
+import websockets
+
+
+def load_recording(path: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        frames = [json.loads(line) for line in f if line.strip()]
+    return sorted(frames, key=lambda fr: fr.get("t", 0))
+
+
+async def replay(ws, frames: List[Dict[str, Any]], speed: float = 1.0):
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for fr in frames:
+        delay = start + fr.get("t", 0) / speed - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if "audio" in fr:
+            await ws.send(bytes(int(fr["audio"])))
+        else:
+            await ws.send(json.dumps(fr.get("frame") or {}))
+
+
+async def serve(path: str, host: str = "127.0.0.1", port: int = 8765, speed: float = 1.0):
+    """Start the replay server; returns the websockets Server (close() it when done)."""
+    frames = load_recording(path)
+
+    async def handler(ws):
+        try:
+            await replay(ws, frames, speed)
+        except websockets.ConnectionClosed:
+            pass
+
+    return await websockets.serve(handler, host, port)
+
+
+async def _main(args):
+    server = await serve(args.recording, args.host, args.port, args.speed)
+    print(f"[monitor_replay] {args.recording} on ws://{args.host}:{args.port} (x{args.speed})")
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Replay a recorded call as a monitor WebSocket")
+    ap.add_argument("recording")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--speed", type=float, default=1.0, help="playback speed multiplier")
+    try:
+        asyncio.run(_main(ap.parse_args()))
+    except KeyboardInterrupt:
+        pass
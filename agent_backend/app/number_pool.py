@@ -0,0 +1,194 @@
+# app/number_pool.py
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
+
+
+class PoolExhausted(RuntimeError):
+    """No caller ID became free within the wait timeout."""
+
+
+@dataclass
+class PoolNumber:
+    id: str                      # Vapi phoneNumberId or E.164 caller ID (Twilio)
+    max_concurrent: int = 1
+    per_minute: int = 0          # 0 = no per-minute cap
+    active: int = 0
+    total: int = 0
+    recent: Deque[float] = field(default_factory=deque)  # call start times, last 60s
+
+    def free_at(self, now: float) -> float:
+        """Earliest time this number can take a new call (now if free, inf if busy)."""
+        while self.recent and now - self.recent[0] >= 60:
+            self.recent.popleft()
+        if self.active >= self.max_concurrent:
+            return float("inf")
+        if self.per_minute and len(self.recent) >= self.per_minute:
+            return self.recent[0] + 60
+        return now
+
+
+@dataclass
+class Lease:
+    number: str
+    lease_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    call_id: Optional[str] = None
+    ts: float = field(default_factory=time.time)
+
+
+def parse_pool_spec(spec: str) -> List[PoolNumber]:
+    """'id[:max_concurrent[:per_minute]],...' → PoolNumbers. Raises ValueError on a bad entry."""
+    out: List[PoolNumber] = []
+    for part in (spec or "").split(","):
+        bits = [b.strip() for b in part.strip().split(":")]
+        if not bits[0]:
+            continue
+        try:
+            max_concurrent = int(bits[1]) if len(bits) > 1 and bits[1] else 1
+            per_minute = int(bits[2]) if len(bits) > 2 and bits[2] else 0
+        except ValueError:
+            raise ValueError(f"number pool entry {part.strip()!r}: limits must be integers") from None
+        if max_concurrent < 1:
+            raise ValueError(f"number pool entry {part.strip()!r}: max_concurrent must be at least 1")
+        if per_minute < 0:
+            raise ValueError(f"number pool entry {part.strip()!r}: per_minute must be 0 (no cap) or more")
+        out.append(PoolNumber(id=bits[0], max_concurrent=max_concurrent, per_minute=per_minute))
+    return out
+
+
+class NumberPool:
+    """
+    Leases outbound caller IDs with per-number concurrency and calls-per-minute
+    limits. Callers that find every number busy queue FIFO until one frees up.
+    Leases are returned by call_id from the end-of-call webhook; leases that are
+    never returned are reclaimed after max_lease_s.
+    """
+
+    def __init__(self, numbers: List[PoolNumber], name: str = "pool", max_lease_s: float = 3600):
+        self.name = name
+        self.numbers = numbers
+        self.max_lease_s = max_lease_s
+        self._by_id = {n.id: n for n in numbers}
+        self._leases: Dict[str, Lease] = {}
+        self._by_call: Dict[str, str] = {}
+        self._waiters: Deque[object] = deque()
+        self._cond = threading.Condition()
+        self._queued_total = 0
+
+    @classmethod
+    def from_spec(cls, spec: str, default_id: str = "", name: str = "pool") -> "NumberPool":
+        numbers = parse_pool_spec(spec)
+        if not numbers and default_id:
+            # single configured number, unlimited concurrency (legacy behaviour)
+            numbers = [PoolNumber(id=default_id, max_concurrent=10**6)]
+        return cls(numbers, name=name)
+
+    # ---- leasing ----
+
+    def acquire(self, timeout: Optional[float] = None) -> Lease:
+        if not self.numbers:
+            raise PoolExhausted(f"{self.name}: no outbound numbers configured")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        ticket = object()
+        with self._cond:
+            self._waiters.append(ticket)
+            if len(self._waiters) > 1:
+                self._queued_total += 1
+            try:
+                while True:
+                    now = time.time()
+                    self._reclaim_locked(now)
+                    wake_at = float("inf")
+                    if self._waiters[0] is ticket:
+                        num, wake_at = self._pick_locked(now)
+                        if num:
+                            num.active += 1
+                            num.total += 1
+                            num.recent.append(now)
+                            lease = Lease(number=num.id)
+                            self._leases[lease.lease_id] = lease
+                            return lease
+                    wait = None if wake_at == float("inf") else max(wake_at - now, 0.01)
+                    if deadline is not None:
+                        left = deadline - time.monotonic()
+                        if left <= 0:
+                            raise PoolExhausted(f"{self.name}: all outbound numbers busy")
+                        wait = left if wait is None else min(wait, left)
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(ticket)
+                self._cond.notify_all()
+
+    def _pick_locked(self, now: float):
+        """Least-loaded number that is free right now, else (None, earliest free time)."""
+        free = [n for n in self.numbers if n.free_at(now) <= now]
+        if free:
+            return min(free, key=lambda n: n.active / n.max_concurrent), now
+        return None, min(n.free_at(now) for n in self.numbers)
+
+    def bind(self, lease: Lease, call_id: Optional[str]):
+        if not call_id:
+            return
+        with self._cond:
+            lease.call_id = call_id
+            self._by_call[call_id] = lease.lease_id
+
+    def release(self, lease: Lease) -> bool:
+        with self._cond:
+            return self._release_locked(lease.lease_id)
+
+    def release_call(self, call_id: Optional[str]) -> bool:
+        if not call_id:
+            return False
+        with self._cond:
+            lid = self._by_call.get(call_id)
+            return self._release_locked(lid) if lid else False
+
+    def _release_locked(self, lease_id: str) -> bool:
+        lease = self._leases.pop(lease_id, None)
+        if not lease:
+            return False
+        if lease.call_id:
+            self._by_call.pop(lease.call_id, None)
+        num = self._by_id.get(lease.number)
+        if num and num.active > 0:
+            num.active -= 1
+        self._cond.notify_all()
+        return True
+
+    def _reclaim_locked(self, now: float):
+        for lid, lease in list(self._leases.items()):
+            if now - lease.ts > self.max_lease_s:
+                print(f"[number_pool] {self.name}: reclaiming stale lease {lease.number} call={lease.call_id}")
+                self._release_locked(lid)
+
+    # ---- reporting ----
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._cond:
+            now = time.time()
+            rows = []
+            for n in self.numbers:
+                n.free_at(now)  # trims the per-minute window
+                rows.append({
+                    "id": n.id,
+                    "active": n.active,
+                    "max_concurrent": n.max_concurrent,
+                    "calls_last_minute": len(n.recent),
+                    "per_minute": n.per_minute,
+                    "total_calls": n.total,
+                })
+            capacity = sum(n.max_concurrent for n in self.numbers)
+            active = sum(n.active for n in self.numbers)
+            return {
+                "name": self.name,
+                "active": active,
+                "capacity": capacity,
+                "utilization": round(active / capacity, 4) if capacity else 0.0,
+                "queued": len(self._waiters),
+                "queued_total": self._queued_total,
+                "numbers": rows,
+            }
@@ -0,0 +1,88 @@
+# app/outbox.py
+"""
+Per-session event outbox: a bounded ring buffer of sequence-numbered events.
+
+Every appended event gets the next seq (1, 2, 3, ... per session, never reused,
+not even across /intake/reset). Clients poll with ?after=<last seq they
+processed>: that acknowledges (drops) everything up to `after` and returns what
+follows, so a response lost in transit is simply served again on the next poll
+with the same cursor. A poll without `after` keeps the old drain behaviour:
+return everything and drop it.
+
+The buffer holds at most `capacity` unacknowledged events. When a client falls
+behind, the oldest ones are evicted and the next read reports the gap
+({"overflow": {"from_seq", "to_seq", "count"}}) instead of silently skipping.
+"""
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional
+from .config import OUTBOX_CAPACITY
+
+
+class Outbox:
+    def __init__(self, capacity: int = OUTBOX_CAPACITY):
+        self.capacity = max(1, capacity)
+        self._buf: Deque[Dict[str, Any]] = deque()
+        self._lock = threading.Lock()
+        self.last_seq = 0        # seq of the newest event ever appended
+        self.acked_seq = 0       # everything <= this was acknowledged (or drained)
+        self.evicted_seq = 0     # everything <= this that wasn't acked was lost to overflow
+        self.evicted = 0
+
+    def append(self, ev: Dict[str, Any]) -> int:
+        with self._lock:
+            self.last_seq += 1
+            self._buf.append(dict(ev, seq=self.last_seq))
+            if len(self._buf) > self.capacity:
+                self.evicted_seq = self._buf.popleft()["seq"]
+                self.evicted += 1
+            return self.last_seq
+
+    def _ack_locked(self, seq: int):
+        while self._buf and self._buf[0]["seq"] <= seq:
+            self._buf.popleft()
+        self.acked_seq = max(self.acked_seq, min(seq, self.last_seq))
+
+    def read(self, after: Optional[int] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Events with seq > after (acking <= after); after=None drains everything."""
+        with self._lock:
+            cursor = self.acked_seq if after is None else max(0, after)
+            self._ack_locked(cursor)
+            overflow = None
+            if cursor < self.evicted_seq:
+                overflow = {"from_seq": cursor + 1, "to_seq": self.evicted_seq,
+                            "count": self.evicted_seq - cursor}
+            events = [e for e in self._buf if e["seq"] > cursor]
+            if limit is not None:
+                events = events[:max(0, limit)]
+            if after is None and events:
+                self._ack_locked(events[-1]["seq"])
+            return {
+                "events": events,
+                "last_seq": self.last_seq,
+                "next_after": events[-1]["seq"] if events else max(cursor, self.evicted_seq),
+                "overflow": overflow,
+            }
+
+    def drain(self) -> List[Dict[str, Any]]:
+        return self.read()["events"]
+
+    def ack(self, seq: int):
+        with self._lock:
+            self._ack_locked(seq)
+
+    def clear(self):
+        """Drop everything buffered; seq keeps counting so client cursors stay valid."""
+        self.ack(self.last_seq)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"buffered": len(self._buf), "last_seq": self.last_seq,
+                    "acked_seq": self.acked_seq, "evicted": self.evicted, "capacity": self.capacity}
+
+    def __len__(self):
+        return len(self._buf)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            return iter(list(self._buf))
@@ -0,0 +1,146 @@
+# app/profiler.py
+"""
+On-demand statistical stack sampler behind /debug/profile.
+
+A sampler thread reads sys._current_frames() every `interval` seconds and
+counts each thread's stack (event loop, AnyIO threadpool workers, fan-out and
+exporter threads alike). Results come back as collapsed stacks
+("thread;outer;...;leaf count" lines, ready for flamegraph.pl or speedscope)
+plus the top functions by self and inclusive samples.
+
+Safe to run under load:
+  - one profile at a time (a second request gets ProfilerBusy),
+  - duration capped at PROFILE_MAX_SECONDS,
+  - overhead capped: the sampler measures its own cost per sample and sleeps
+    long enough to stay under PROFILE_MAX_OVERHEAD of one core,
+  - nothing is installed in the profiled threads (no settrace/setprofile).
+"""
+import math
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from .config import PROFILE_MAX_SECONDS, PROFILE_MAX_OVERHEAD
+
+# Stacks of threads parked waiting for work (dropped unless include_idle), as (file, function)
+# frames from the leaf up: the event loop in select, idle executor and AnyIO threadpool workers.
+# Threads blocked in I/O, locks or queues inside a request are not idle: that is what you profile.
+IDLE_STACKS = [
+    (("selectors.py", "select"),),
+    (("thread.py", "_worker"),),
+    (("threading.py", "wait"), ("queue.py", "get"), ("_asyncio.py", "run")),
+]
+
+
+def _is_idle(frame) -> bool:
+    for pattern in IDLE_STACKS:
+        f = frame
+        for filename, name in pattern:
+            if f is None or f.f_code.co_name != name or not f.f_code.co_filename.endswith(filename):
+                break
+            f = f.f_back
+        else:
+            return True
+    return False
+
+
+class ProfilerBusy(RuntimeError):
+    """Another profile is already running."""
+
+
+_LABELS: Dict[Any, str] = {}  # code object → "qualname (file.py:line)"
+
+
+def _frame_label(code) -> str:
+    label = _LABELS.get(code)
+    if label is None:
+        name = getattr(code, "co_qualname", code.co_name)
+        label = _LABELS[code] = f"{name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})"
+    return label
+
+
+class Profiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.last: Optional[Dict[str, Any]] = None  # summary of the previous run (no stacks)
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def run(self, seconds: float, interval: float = 0.005, include_idle: bool = False,
+            top: int = 25) -> Dict[str, Any]:
+        if not (math.isfinite(seconds) and math.isfinite(interval)):
+            raise ValueError("seconds and interval must be finite numbers")
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("a profile is already running")
+        try:
+            return self._run(min(max(seconds, 0.1), PROFILE_MAX_SECONDS), max(interval, 0.001), include_idle, top)
+        finally:
+            self._lock.release()
+
+    def _run(self, seconds: float, interval: float, include_idle: bool, top: int) -> Dict[str, Any]:
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = idle = 0
+        busy_s = 0.0
+        t_start = time.perf_counter()
+        deadline = t_start + seconds
+        names: Dict[int, str] = {}
+        while True:
+            t0 = time.perf_counter()
+            if t0 >= deadline:
+                break
+            if not samples % 50:  # thread set changes rarely; refresh names now and then
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                if not include_idle and _is_idle(frame):
+                    idle += 1
+                    continue
+                labels: List[str] = []
+                f = frame
+                while f is not None:
+                    labels.append(_frame_label(f.f_code))
+                    f = f.f_back
+                labels.append(names.get(tid, f"thread-{tid}"))
+                stacks[";".join(reversed(labels))] += 1
+            samples += 1
+            cost = time.perf_counter() - t0
+            busy_s += cost
+            # overhead cap: cost / (cost + sleep) <= PROFILE_MAX_OVERHEAD
+            time.sleep(max(interval, cost * (1 / PROFILE_MAX_OVERHEAD - 1)))
+        wall = time.perf_counter() - t_start
+        result = {
+            "seconds": round(wall, 3),
+            "samples": samples,
+            "stacks": sum(stacks.values()),
+            "idle_dropped": idle,
+            "effective_hz": round(samples / wall, 1) if wall else 0,
+            "overhead": round(busy_s / wall, 4) if wall else 0,
+            "top_self": _top(stacks, top, inclusive=False),
+            "top_inclusive": _top(stacks, top, inclusive=True),
+        }
+        self.last = {k: v for k, v in result.items() if not k.startswith("top_")}
+        result["collapsed"] = "\n".join(f"{s} {n}" for s, n in stacks.most_common())
+        return result
+
+
+def _top(stacks: Counter, n: int, inclusive: bool) -> List[Dict[str, Any]]:
+    counts: Counter = Counter()
+    total = sum(stacks.values()) or 1
+    for stack, c in stacks.items():
+        frames = stack.split(";")[1:]  # drop the thread name
+        if not frames:
+            continue
+        if inclusive:
+            for fn in set(frames):
+                counts[fn] += c
+        else:
+            counts[frames[-1]] += c
+    return [{"function": fn, "samples": c, "pct": round(100.0 * c / total, 1)} for fn, c in counts.most_common(n)]
+
+
+PROFILER = Profiler()
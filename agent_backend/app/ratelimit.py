@@ -0,0 +1,25 @@
+# app/ratelimit.py
+import asyncio
+import time
+
+
+class RateLimiter:
+    """Async token bucket: at most `rate` acquisitions per second, bursting up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = max(rate, 0.01)
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
@@ -0,0 +1,82 @@
+# app/sessions.py
+"""
+Chat session store shared by the intake endpoints, the Vapi webhook and the
+poller.
+
+The sync endpoints run concurrently in FastAPI's threadpool, so:
+  - SessionStore.lock(sid) is a striped lock (SESSION_LOCK_STRIPES RLocks,
+    picked by hash of the session id). intake_start/reply/reset hold it only
+    for the read-modify-write of sess.data, so two replies to one session are
+    applied one after the other. LLM extraction and dialing run outside it
+    (duplicate dials are joined by the CALLS single-flight in app/inflight.py),
+    so a slow call never stalls the other sessions on the same stripe.
+  - Each session's Outbox (app/outbox.py) has its own small lock. Producers
+    (webhook, fan-out, live monitor) only append; poll_events reads/acks under
+    that lock, so an event is delivered exactly once even while appends race
+    the poll.
+  - Iteration (find by call_id, debug listing) works on a snapshot, never on
+    the live dict another thread may be inserting into.
+"""
+import threading
+import uuid
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+from .config import SESSION_LOCK_STRIPES
+
+
+class SessionStore:
+    """sid → SessionState, with per-session lock striping (dict-like for the old SESS callers)."""
+
+    def __init__(self, stripes: int = SESSION_LOCK_STRIPES):
+        self._sessions: Dict[str, Any] = {}
+        self._stripes = [threading.RLock() for _ in range(max(1, stripes))]
+        self._lock = threading.Lock()  # structure only (insert/delete/snapshot)
+
+    def lock(self, sid: str) -> threading.RLock:
+        return self._stripes[zlib.crc32(sid.encode()) % len(self._stripes)]
+
+    def create(self, factory) -> Tuple[str, Any]:
+        sid = str(uuid.uuid4())
+        sess = factory()
+        with self._lock:
+            self._sessions[sid] = sess
+        return sid, sess
+
+    def get(self, sid: Optional[str]) -> Optional[Any]:
+        return self._sessions.get(sid) if sid else None
+
+    def pop(self, sid: str) -> Optional[Any]:
+        with self._lock:
+            return self._sessions.pop(sid, None)
+
+    def items(self) -> List[Tuple[str, Any]]:
+        with self._lock:
+            return list(self._sessions.items())
+
+    def values(self) -> List[Any]:
+        with self._lock:
+            return list(self._sessions.values())
+
+    def find_by_call(self, call_id: Optional[str]) -> Tuple[Optional[str], Optional[Any]]:
+        if not call_id:
+            return None, None
+        return next(((sid, s) for sid, s in self.items() if s.call_id == call_id), (None, None))
+
+    def find_all_by_call(self, call_id: Optional[str]) -> List[Tuple[str, Any]]:
+        """Every session on the call (a deduplicated request attaches a second session to it)."""
+        if not call_id:
+            return []
+        return [(sid, s) for sid, s in self.items() if s.call_id == call_id]
+
+    def latest(self) -> Optional[str]:
+        with self._lock:
+            return next(reversed(self._sessions), None)
+
+    def __contains__(self, sid: str) -> bool:
+        return sid in self._sessions
+
+    def __getitem__(self, sid: str) -> Any:
+        return self._sessions[sid]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
@@ -0,0 +1,225 @@
+# app/tracing.py
+"""
+Request tracing from intake to webhook, exported as OpenTelemetry-shaped JSONL.
+
+A trace starts at /intake/start (start_trace) and its W3C traceparent is kept
+on the session and put in the Vapi call metadata next to session_id. Later
+requests for the same conversation (/intake/reply, /vapi/webhook) continue it
+(continue_trace), so one trace id stitches intake, LLM passes, Vapi calls and
+the webhooks the call produces. Inside a trace, `with span("name", k=v):` or
+@traced("name") time a step; the current span lives in a contextvar, so it
+follows asyncio tasks and FastAPI's threadpool.
+
+Sampling is decided once per trace at the root (TRACE_SAMPLE_RATE) and carried
+in the traceparent flags. Unsampled traces still propagate ids but record
+nothing, and span() outside any trace is a no-op, so leaving this on is cheap.
+Finished spans are buffered and appended to TRACE_FILE by a background thread,
+one OTLP/JSON span per line (traceId, spanId, parentSpanId, name, kind,
+startTimeUnixNano, endTimeUnixNano, attributes, status, resource). Tracing is
+off unless TRACE_FILE is set; past TRACE_FILE_MAX_MB the file is rotated to
+TRACE_FILE.1 (one old generation kept).
+"""
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from .config import TRACE_FILE, TRACE_FILE_MAX_MB, TRACE_SAMPLE_RATE, TRACE_SERVICE_NAME
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# OTLP SpanKind / StatusCode numbers
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+STATUS_OK, STATUS_ERROR = 1, 2
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "sampled",
+                 "start_ns", "end_ns", "attributes", "status", "message", "_token")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool,
+                 kind: int = KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None):
+        self.name, self.trace_id, self.parent_id, self.sampled, self.kind = name, trace_id, parent_id, sampled, kind
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.attributes = attributes or {}
+        self.status, self.message = 0, None
+        self.start_ns = time.time_ns() if sampled else 0
+        self.end_ns = 0
+        self._token = None
+
+    def set(self, **attrs):
+        if self.sampled:
+            self.attributes.update(attrs)
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def __enter__(self) -> "Span":
+        self._token = _CURRENT.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _CURRENT.reset(self._token)
+        if not self.sampled:
+            return False
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.status, self.message = STATUS_ERROR, f"{exc_type.__name__}: {exc}"
+        EXPORTER.add(self)
+        return False
+
+    def to_otlp(self) -> Dict[str, Any]:
+        d = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items() if v is not None],
+            "status": {"code": self.status, **({"message": self.message} if self.message else {})},
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}}]},
+        }
+        if self.parent_id:
+            d["parentSpanId"] = self.parent_id
+        return d
+
+
+class _NoopSpan:
+    """span() outside a trace: costs one contextvar lookup."""
+    sampled = False
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOOP = _NoopSpan()
+_CURRENT: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("span", default=None)
+
+
+def _otlp_value(v: Any) -> Dict[str, Any]:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+# ----------------- API -----------------
+
+def current() -> Optional[Span]:
+    return _CURRENT.get()
+
+
+def start_trace(name: str, kind: int = KIND_SERVER, **attrs) -> Span:
+    """New trace (root span); sampled with probability TRACE_SAMPLE_RATE."""
+    sampled = bool(TRACE_FILE) and random.random() < TRACE_SAMPLE_RATE
+    return Span(name, "%032x" % random.getrandbits(128), None, sampled, kind, attrs)
+
+
+def continue_trace(traceparent: Optional[str], name: str, kind: int = KIND_SERVER, **attrs) -> Span:
+    """Child of a propagated traceparent (keeps its sampling decision); a new trace if absent/invalid."""
+    m = _TRACEPARENT.match(traceparent or "")
+    if not m:
+        return start_trace(name, kind, **attrs)
+    trace_id, parent_id, flags = m.groups()
+    return Span(name, trace_id, parent_id, bool(TRACE_FILE) and flags == "01", kind, attrs)
+
+
+def span(name: str, kind: int = KIND_INTERNAL, **attrs):
+    """Child of the current span (no-op outside a trace)."""
+    parent = _CURRENT.get()
+    if parent is None:
+        return NOOP
+    return Span(name, parent.trace_id, parent.span_id, parent.sampled, kind, attrs)
+
+
+def traceparent() -> Optional[str]:
+    cur = _CURRENT.get()
+    return cur.traceparent() if cur else None
+
+
+def trace_metadata() -> Dict[str, str]:
+    """What goes into call metadata so the webhook can continue the trace."""
+    cur = _CURRENT.get()
+    return {"trace_id": cur.trace_id, "traceparent": cur.traceparent()} if cur else {}
+
+
+def traced(name: str, kind: int = KIND_INTERNAL):
+    """Decorator: run the function (sync or async) inside span(name)."""
+    def deco(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def awrapper(*a, **kw):
+                with span(name, kind):
+                    return await fn(*a, **kw)
+            return awrapper
+
+        @functools.wraps(fn)
+        def wrapper(*a, **kw):
+            with span(name, kind):
+                return fn(*a, **kw)
+        return wrapper
+    return deco
+
+
+# ----------------- export -----------------
+
+class JsonlExporter:
+    """Buffers finished spans; a daemon thread appends them to the file every flush_s."""
+
+    def __init__(self, path: str, flush_s: float = 1.0, max_buffer: int = 10000,
+                 max_bytes: int = int(TRACE_FILE_MAX_MB * 1024 * 1024)):
+        self.path, self.flush_s, self.max_buffer, self.max_bytes = path, flush_s, max_buffer, max_bytes
+        self._buf: List[Span] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.dropped = 0
+
+    def add(self, s: Span):
+        with self._lock:
+            if len(self._buf) >= self.max_buffer:
+                self.dropped += 1
+                return
+            self._buf.append(s)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_s)
+            self.flush()
+
+    def flush(self) -> int:
+        with self._lock:
+            spans, self._buf = self._buf, []
+        if not spans or not self.path:
+            return 0
+        try:
+            if self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, "a") as f:
+                f.write("".join(json.dumps(s.to_otlp()) + "\n" for s in spans))
+        except OSError as e:
+            print(f"[tracing] export to {self.path} failed: {e}")
+            return 0
+        return len(spans)
+
+
+EXPORTER = JsonlExporter(TRACE_FILE)
+atexit.register(EXPORTER.flush)
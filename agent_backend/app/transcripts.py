@@ -0,0 +1,215 @@
+# app/transcripts.py
+"""
+Transcript ingestion and search.
+
+Final transcript lines from Vapi `transcript` events (and, for calls we never
+saw live, the end-of-call artifact) are buffered in memory and written to
+`messages` with multi-row INSERTs from a background flusher, so webhooks never
+wait on SQLite. `messages_fts` (migration 003) indexes the text.
+"""
+import atexit
+import base64
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from server.storage import DB_FILE
+from .vendor_directory import vendor_key
+from .vapi_events import on, VapiEvent, TRANSCRIPT, END_OF_CALL_REPORT
+from .config import TRANSCRIPT_BATCH_SIZE, TRANSCRIPT_FLUSH_S
+
+_COLS = ("call_id", "session_id", "vendor", "role", "text", "ts")
+_ROWS_PER_INSERT = 120  # 6 params/row, well under SQLite's 999-variable default
+
+
+def _ts(epoch: float) -> str:
+    """Same text format as the CURRENT_TIMESTAMP column defaults (UTC)."""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(epoch))
+
+
+class TranscriptWriter:
+    def __init__(self, db_file: str = DB_FILE, batch_size: int = TRANSCRIPT_BATCH_SIZE, flush_s: float = TRANSCRIPT_FLUSH_S):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.flush_s = flush_s
+        self._buf: List[Tuple[Any, ...]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.batches = 0
+
+    def add(self, call_id: Optional[str], session_id: Optional[str], vendor: Optional[str],
+            role: str, text: str, ts: Optional[float] = None):
+        row = (call_id, session_id, vendor, role, text, _ts(ts or time.time()))
+        with self._lock:
+            self._buf.append(row)
+            full = len(self._buf) >= self.batch_size
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="transcript-writer", daemon=True)
+                self._thread.start()
+        if full:
+            self.kick()
+
+    def kick(self):
+        """Flush soon (from the background thread) instead of waiting for the interval."""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_s)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"[transcripts] flush failed: {e}")
+
+    def flush(self) -> int:
+        with self._lock:
+            rows, self._buf = self._buf, []
+        if not rows:
+            return 0
+        with self._flush_lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+                self._conn.execute("pragma journal_mode=wal")
+            try:
+                with self._conn:  # one transaction per flush
+                    for i in range(0, len(rows), _ROWS_PER_INSERT):
+                        chunk = rows[i:i + _ROWS_PER_INSERT]
+                        placeholders = ",".join(["(?,?,?,?,?,?)"] * len(chunk))
+                        self._conn.execute(
+                            f"insert into messages({','.join(_COLS)}) values {placeholders}",
+                            [v for row in chunk for v in row],
+                        )
+                        self.batches += 1
+            except sqlite3.Error:
+                with self._lock:
+                    self._buf[:0] = rows  # keep them for the next attempt
+                raise
+            self.written += len(rows)
+        return len(rows)
+
+
+WRITER = TranscriptWriter()
+atexit.register(WRITER.flush)
+
+# calls whose lines arrived live (so the end-of-call artifact would duplicate them)
+_LIVE: "OrderedDict[str, bool]" = OrderedDict()
+_LIVE_MAX = 10000
+
+
+def _vendor(ev: VapiEvent) -> Optional[str]:
+    name = ev.metadata.get("vendor_name")
+    return vendor_key(name) if name else None
+
+
+@on(TRANSCRIPT)
+def _ingest_transcript(ev: VapiEvent):
+    msg = ev.message
+    if msg.get("transcriptType", "final") != "final" or not msg.get("transcript"):
+        return None
+    if ev.call_id:
+        _LIVE[ev.call_id] = True
+        _LIVE.move_to_end(ev.call_id)
+        while len(_LIVE) > _LIVE_MAX:
+            _LIVE.popitem(last=False)
+    WRITER.add(ev.call_id, ev.session_id, _vendor(ev), msg.get("role") or "", msg["transcript"], ev.ts)
+    return None
+
+
+@on(END_OF_CALL_REPORT)
+def _ingest_artifact(ev: VapiEvent):
+    if ev.call_id and _LIVE.pop(ev.call_id, None):
+        WRITER.kick()  # lines are already buffered; just get them on disk
+        return None
+    messages = (ev.message.get("artifact") or {}).get("messages") or ev.message.get("messages") or []
+    vendor = _vendor(ev)
+    for m in messages:
+        text = (m.get("message") or "").strip()
+        if m.get("role") not in ("user", "bot", "assistant") or not text:
+            continue
+        ts = m.get("time")  # epoch ms
+        ts = ts / 1000.0 if isinstance(ts, (int, float)) else ev.ts
+        WRITER.add(ev.call_id, ev.session_id, vendor, m["role"], text, ts)
+    WRITER.kick()
+    return None
+
+
+# ----------------- search -----------------
+
+def _encode_cursor(ts: str, rid: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([ts, rid]).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, int]:
+    ts, rid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return str(ts), int(rid)
+
+
+def search(
+    phrase: Optional[str] = None,
+    vendor: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    call_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    db_file: str = DB_FILE,
+) -> Dict[str, Any]:
+    """
+    Newest-first transcript lines. `phrase` is matched as an FTS5 phrase; other
+    filters are index range conditions. Pages continue from `cursor` (keyset on
+    (ts, id)), so deep pages cost the same as the first.
+    """
+    limit = max(1, min(limit, 500))
+    where, params = [], []
+    if phrase:
+        src = "messages_fts join messages m on m.id = messages_fts.rowid"
+        cols = "m.id, m.call_id, m.session_id, m.vendor, m.role, m.text, m.ts, snippet(messages_fts, 0, '[', ']', '…', 12)"
+        where.append("messages_fts match ?")
+        params.append('"' + phrase.replace('"', '""') + '"')
+    else:
+        src = "messages m"
+        cols = "m.id, m.call_id, m.session_id, m.vendor, m.role, m.text, m.ts, null"
+    if vendor:
+        where.append("m.vendor = ?")
+        params.append(vendor_key(vendor))
+    if call_id:
+        where.append("m.call_id = ?")
+        params.append(call_id)
+    if since:
+        where.append("m.ts >= ?")
+        params.append(since)
+    if until:
+        where.append("m.ts < ?")
+        params.append(until)
+    if cursor:
+        where.append("(m.ts, m.id) < (?, ?)")
+        params.extend(_decode_cursor(cursor))
+    sql = f"select {cols} from {src}"
+    if where:
+        sql += " where " + " and ".join(where)
+    sql += " order by m.ts desc, m.id desc limit ?"
+    params.append(limit + 1)
+
+    conn = sqlite3.connect(db_file)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    items = [
+        {"id": r[0], "call_id": r[1], "session_id": r[2], "vendor": r[3], "role": r[4],
+         "text": r[5], "ts": r[6], **({"snippet": r[7]} if r[7] is not None else {})}
+        for r in rows
+    ]
+    return {
+        "items": items,
+        "next_cursor": _encode_cursor(rows[-1][6], rows[-1][0]) if more else None,
+    }
@@ -1,13 +1,27 @@
 # app/vapi_client.py
-import requests
-from vapi import Vapi
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from . import clients
+from .tracing import span, KIND_CLIENT
+from .capture import RECORDER, record_vapi_create
 from .config import (
-    VAPI_API_KEY,
     VAPI_ASSISTANT_ID,
     VAPI_PHONE_NUMBER_ID,
+    VAPI_NUMBER_POOL,
+    NUMBER_POOL_WAIT_S,
 )
+from .number_pool import NumberPool
 
-client = Vapi(token=VAPI_API_KEY)
+NUMBER_POOL = NumberPool.from_spec(VAPI_NUMBER_POOL, VAPI_PHONE_NUMBER_ID, name="vapi")
+
+# call_id -> (controlUrl, listenUrl), captured from the create response or the first
+# webhook that carries call.monitor, so hanging up is one POST instead of GET + POST
+_MONITOR_URLS: "OrderedDict[str, Tuple[Optional[str], Optional[str]]]" = OrderedDict()
+_MONITOR_LOCK = threading.Lock()
+_MONITOR_MAX = 5000
 
 def _to_dict(model):
     """Tolerant Pydantic->dict across SDK versions."""
@@ -23,29 +37,75 @@ def start_vendor_call(customer_number: str, variable_values: dict) -> str:
     """
     Start an outbound call from your Vapi number to the vendor (customer_number).
     Pass flat variables used by your assistant prompt ({{goal}}, {{vendor_name}}, ...).
+    The caller ID is leased from NUMBER_POOL (queueing while all numbers are busy)
+    and handed back by release_number() from the end-of-call webhook.
     """
-    resp = client.calls.create(
-        assistant_id=VAPI_ASSISTANT_ID,            # saved assistant ID
-        phone_number_id=VAPI_PHONE_NUMBER_ID,      # your Vapi phone number ID (NOT +1...)
-        customer={"number": customer_number},      # destination to dial
-        assistant_overrides={"variable_values": variable_values or {}},
-    )
+    with span("number_pool.acquire"):
+        lease = NUMBER_POOL.acquire(timeout=NUMBER_POOL_WAIT_S)
+    try:
+        with span("vapi.calls.create", KIND_CLIENT, phone_number_id=lease.number):
+            t0 = time.perf_counter()
+            resp = clients.get("vapi").calls.create(
+                assistant_id=VAPI_ASSISTANT_ID,            # saved assistant ID
+                phone_number_id=lease.number,              # your Vapi phone number ID (NOT +1...)
+                customer={"number": customer_number},      # destination to dial
+                assistant_overrides={"variable_values": variable_values or {}},
+            )
+    except Exception:
+        NUMBER_POOL.release(lease)
+        raise
     # SDK returns a Pydantic model
-    if hasattr(resp, "id"):
-        return resp.id
-    # fallback just in case
-    data = _to_dict(resp)
-    return data.get("id")
+    call_id = resp.id if hasattr(resp, "id") else _to_dict(resp).get("id")
+    NUMBER_POOL.bind(lease, call_id)
+    remember_monitor(call_id, _to_dict(resp).get("monitor"))
+    if RECORDER:
+        record_vapi_create(variable_values, call_id, _to_dict(resp).get("monitor"), (time.perf_counter() - t0) * 1000)
+    return call_id
+
+def release_number(call_id: str) -> bool:
+    """Return the caller ID leased for call_id to the pool."""
+    return NUMBER_POOL.release_call(call_id)
+
+def remember_monitor(call_id: Optional[str], monitor: Optional[dict]) -> bool:
+    """Cache a call's monitor URLs (from calls.create or a webhook's call.monitor)."""
+    if not call_id or not monitor:
+        return False
+    # handle both styles, just in case
+    ctrl = monitor.get("controlUrl") or monitor.get("control_url")
+    listen = monitor.get("listenUrl") or monitor.get("listen_url")
+    if not (ctrl or listen):
+        return False
+    with _MONITOR_LOCK:
+        _MONITOR_URLS[call_id] = (ctrl, listen)
+        _MONITOR_URLS.move_to_end(call_id)
+        while len(_MONITOR_URLS) > _MONITOR_MAX:
+            _MONITOR_URLS.popitem(last=False)
+    return True
+
+def forget_call(call_id: Optional[str]):
+    with _MONITOR_LOCK:
+        _MONITOR_URLS.pop(call_id or "", None)
+
+def _monitor_urls(call_id: str) -> Tuple[Optional[str], Optional[str]]:
+    cached = _MONITOR_URLS.get(call_id)
+    if cached:
+        return cached
+    with span("vapi.calls.get", KIND_CLIENT, call_id=call_id):
+        call_obj = clients.get("vapi").calls.get(id=call_id)
+    remember_monitor(call_id, _to_dict(call_obj).get("monitor"))
+    return _MONITOR_URLS.get(call_id) or (None, None)
 
 def get_control_url(call_id: str) -> str | None:
     """
-    Fetch the call object and return its control URL (used to end the call).
+    The call's control URL (used to end the call); fetched from Vapi only if not cached.
     """
-    call_obj = client.calls.get(id=call_id)
-    data = _to_dict(call_obj)
-    mon = data.get("monitor") or {}
-    # handle both styles, just in case
-    return mon.get("controlUrl") or mon.get("control_url")
+    return _monitor_urls(call_id)[0]
+
+def get_listen_url(call_id: str) -> str | None:
+    """
+    The call's monitor listen URL (live WebSocket feed); fetched only if not cached.
+    """
+    return _monitor_urls(call_id)[1]
 
 def hangup_call(call_id: str) -> bool:
     """
@@ -54,5 +114,28 @@ def hangup_call(call_id: str) -> bool:
     ctrl = get_control_url(call_id)
     if not ctrl:
         return False
-    r = requests.post(ctrl, json={"type": "end-call"}, timeout=10)
-    return r.ok
+    with span("vapi.control.end_call", KIND_CLIENT, call_id=call_id):
+        r = clients.get("http").post(ctrl, json={"type": "end-call"})
+    return r.is_success
+
+async def hangup_call_async(call_id: str) -> bool:
+    """hangup_call for coroutines: cached controlUrl + the pooled async client; never raises."""
+    try:
+        ctrl = (_MONITOR_URLS.get(call_id) or (None, None))[0]
+        if not ctrl:
+            ctrl = await asyncio.to_thread(get_control_url, call_id)
+        if not ctrl:
+            return False
+        with span("vapi.control.end_call", KIND_CLIENT, call_id=call_id) as sp:
+            r = await clients.get("ahttp").post(ctrl, json={"type": "end-call"})
+            sp.set(http_status=r.status_code)
+        return r.is_success
+    except Exception as e:
+        print(f"[hangup] {call_id}: {e}")
+        return False
+
+async def hangup_many(call_ids: Iterable[str]) -> Dict[str, bool]:
+    """End several calls in parallel; {call_id: ended}."""
+    ids = list(dict.fromkeys(c for c in call_ids if c))
+    results = await asyncio.gather(*(hangup_call_async(c) for c in ids))
+    return dict(zip(ids, results))
@@ -0,0 +1,142 @@
+# app/vapi_events.py
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+from .config import DEFAULT_USER_PHONE
+
+# Vapi "server message" types we act on. Anything else is acknowledged and ignored.
+STATUS_UPDATE = "status-update"
+TRANSCRIPT = "transcript"
+END_OF_CALL_REPORT = "end-of-call-report"
+TRANSFER_DESTINATION_REQUEST = "transfer-destination-request"
+
+
+@dataclass
+class VapiEvent:
+    type: str
+    call_id: Optional[str]
+    session_id: Optional[str]
+    message: Dict[str, Any] = field(default_factory=dict)
+    payload: Dict[str, Any] = field(default_factory=dict)
+    ts: float = field(default_factory=time.time)
+
+    @property
+    def call(self) -> Dict[str, Any]:
+        return self.message.get("call") or self.payload.get("call") or {}
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return _find_metadata(self.payload)
+
+
+Handler = Callable[[VapiEvent], Optional[Dict[str, Any]]]
+_HANDLERS: Dict[str, List[Handler]] = {}
+
+
+def on(event_type: str):
+    """Register a handler for one Vapi message type (decorator)."""
+    def deco(fn: Handler) -> Handler:
+        _HANDLERS.setdefault(event_type, []).append(fn)
+        return fn
+    return deco
+
+
+def _find_metadata(payload: Dict[str, Any]) -> Dict[str, Any]:
+    msg = payload.get("message") or {}
+    call = msg.get("call") or payload.get("call") or {}
+    overrides = (
+        (payload.get("assistant") or {}).get("assistantOverrides")
+        or call.get("assistantOverrides")
+        or {}
+    )
+    return (
+        ((payload.get("variables") or {}).get("metadata"))
+        or ((overrides.get("variableValues") or {}).get("metadata"))
+        or call.get("metadata")
+        or payload.get("metadata")
+        or msg.get("metadata")
+        or {}
+    )
+
+
+def _event_type(payload: Dict[str, Any]) -> str:
+    t = (payload.get("message") or {}).get("type") or payload.get("type") or ""
+    # newer Vapi versions send 'transcript[transcriptType="final"]'
+    if t.startswith(TRANSCRIPT):
+        return TRANSCRIPT
+    # legacy flat payloads (no message.type) were always end-of-call reports
+    return t or END_OF_CALL_REPORT
+
+
+def parse_event(payload: Dict[str, Any]) -> VapiEvent:
+    """Normalize any known Vapi webhook shape into a VapiEvent."""
+    msg = payload.get("message") or {}
+    call_id = (
+        payload.get("call_id")
+        or payload.get("id")
+        or (payload.get("call") or {}).get("id")
+        or (msg.get("call") or {}).get("id")
+        or msg.get("callId")
+    )
+    session_id = _find_metadata(payload).get("session_id")
+    ts = msg.get("timestamp")
+    # Vapi timestamps are epoch milliseconds
+    ts = ts / 1000.0 if isinstance(ts, (int, float)) and ts > 1e11 else time.time()
+    return VapiEvent(
+        type=_event_type(payload),
+        call_id=call_id,
+        session_id=session_id,
+        message=msg,
+        payload=payload,
+        ts=ts,
+    )
+
+
+def event_summary(ev: VapiEvent) -> str:
+    """Human summary (+ confirmation) from any known end-of-call report shape."""
+    payload, msg = ev.payload, ev.message
+    summary = (
+        (msg.get("analysis") or {}).get("summary")
+        or msg.get("summary")
+        or payload.get("summary")
+        or payload.get("report")
+        or (payload.get("metadata") or {}).get("summary")
+        or "Call completed."
+    )
+    conf = (
+        (msg.get("analysis") or {}).get("confirmation")
+        or (payload.get("metadata") or {}).get("confirmation")
+    )
+    if conf:
+        summary += f" Confirmation: {conf}."
+    return summary
+
+
+def dispatch(event: VapiEvent) -> Dict[str, Any]:
+    """
+    Run every handler registered for event.type in registration order.
+    The first non-empty handler result becomes the webhook response
+    (needed for transfer-destination-request); otherwise {"ok": True}.
+    """
+    resp: Optional[Dict[str, Any]] = None
+    for fn in _HANDLERS.get(event.type, []):
+        try:
+            out = fn(event)
+        except Exception as e:
+            print(f"[vapi_events] {event.type} handler {fn.__name__} failed: {e}")
+            continue
+        if out and resp is None:
+            resp = out
+    return resp or {"ok": True}
+
+
+@on(TRANSFER_DESTINATION_REQUEST)
+def _transfer_to_user(ev: VapiEvent):
+    """Dynamic transfer (only if rep insists): bridge in the user's phone."""
+    variables = (
+        ev.message.get("variables")
+        or ((ev.call.get("assistantOverrides") or {}).get("variableValues"))
+        or {}
+    )
+    number = variables.get("user_phone") or DEFAULT_USER_PHONE
+    return {"destination": {"type": "number", "number": number}}
@@ -0,0 +1,382 @@
+# app/vendor_directory.py
+"""
+Vendor directory: name/alias → phone numbers (optionally per department).
+
+Source of truth is a JSON list (data/vendors.json). It is compiled once into a
+compact binary index (vendors.idx) that is memory-mapped on load, so opening a
+directory with tens of thousands of vendors costs a header read, not a parse.
+The index is compiled on first use next to the JSON; on a read-only deploy it
+goes to the temp dir instead, or build it at deploy time:
+
+    python -m app.vendor_directory            # data/vendors.json → data/vendors.idx
+
+Index layout (little-endian):
+  header   "VDIR" u32 version, u32 n_vendors, u32 n_keys, u32 n_grams,
+           5 x u64 offsets (vendor table, vendor blob, key table, key blob, gram table)
+  vendors  (n_vendors+1) x u32 offsets into the vendor blob (one JSON record each)
+  keys     n_keys x <I H I H>  key blob offset, key length, vendor index, trigram count
+           sorted by key bytes → exact lookups and prefix scans are binary searches
+  grams    n_grams x <3s I I>  trigram, postings offset, postings count (sorted)
+  postings u32 key indices, right after the gram table
+"""
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+import unicodedata
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+VENDOR_DIRECTORY_FILE = os.getenv("VENDOR_DIRECTORY_FILE", os.path.join(_DATA_DIR, "vendors.json"))
+
+MAGIC = b"VDIR"
+VERSION = 1
+_HEADER = struct.Struct("<4sIIII5Q")
+_KEY = struct.Struct("<IHIH")
+_GRAM = struct.Struct("<3sII")
+_U32 = struct.Struct("<I")
+
+# Words that don't help tell vendors apart ("Walmart Supercenter" → "walmart")
+_NOISE = {"the", "inc", "llc", "co", "corp", "corporation", "company", "store", "stores", "supercenter", "com"}
+
+# Which department line to prefer for each intent
+INTENT_DEPARTMENT = {
+    "retail_return": "returns",
+    "hotel_booking": "reservations",
+    "rental_issue": "rentals",
+    "service_booking": "appointments",
+    "generic_query": "customer_care",
+}
+
+MIN_FUZZY_SCORE = 0.55
+# A typed-in prefix resolves on its own only if it's this long and only one vendor has it
+MIN_PREFIX_CHARS = 3
+PREFIX_SCAN = 50  # keys read to tell "one vendor" from "several" (aliases share prefixes)
+# resolve() takes a fuzzy best match only if it beats the runner-up by this much
+FUZZY_MARGIN = 0.1
+
+
+def normalize(name: str) -> str:
+    """Lowercase ASCII words: 'Wal-Mart, Inc.' → 'wal mart inc'."""
+    s = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode().lower()
+    s = s.replace("&", " and ").replace("'", "")
+    return re.sub(r"[^a-z0-9]+", " ", s).strip()
+
+
+def _variants(name: str) -> List[str]:
+    n = normalize(name)
+    core = " ".join(w for w in n.split() if w not in _NOISE) or n
+    out = []
+    for v in (n, core, n.replace(" ", ""), core.replace(" ", "")):
+        if v and v not in out:
+            out.append(v)
+    return out
+
+
+def _trigrams(key: str) -> List[bytes]:
+    padded = f"  {key} ".encode()
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+@dataclass
+class VendorMatch:
+    name: str
+    number: Optional[str]
+    score: float
+    matched: str
+    departments: Dict[str, str]
+
+    def number_for(self, department: Optional[str] = None) -> Optional[str]:
+        if department and self.departments.get(department):
+            return self.departments[department]
+        return self.number
+
+
+# ----------------- build -----------------
+
+def build_index(vendors: List[Dict[str, Any]], out_path: str) -> None:
+    blobs = [json.dumps(v, separators=(",", ":")).encode() for v in vendors]
+    keys: Dict[str, int] = {}
+    for vi, v in enumerate(vendors):
+        for name in [v.get("name", "")] + list(v.get("aliases") or []):
+            for k in _variants(name):
+                keys.setdefault(k, vi)  # first vendor wins on collisions
+    key_list = sorted(keys, key=lambda k: k.encode())
+    postings: Dict[bytes, List[int]] = {}
+    gram_counts = []
+    for ki, k in enumerate(key_list):
+        grams = _trigrams(k)
+        gram_counts.append(len(grams))
+        for g in grams:
+            postings.setdefault(g, []).append(ki)
+    gram_list = sorted(postings)
+
+    vend_table = bytearray()
+    off = 0
+    for b in blobs:
+        vend_table += _U32.pack(off)
+        off += len(b)
+    vend_table += _U32.pack(off)
+    vend_blob = b"".join(blobs)
+
+    key_table, key_blob = bytearray(), bytearray()
+    for ki, k in enumerate(key_list):
+        kb = k.encode()
+        key_table += _KEY.pack(len(key_blob), len(kb), keys[k], gram_counts[ki])
+        key_blob += kb
+
+    gram_table, post_blob = bytearray(), bytearray()
+    for g in gram_list:
+        ids = postings[g]
+        gram_table += _GRAM.pack(g, len(post_blob) // 4, len(ids))
+        post_blob += struct.pack(f"<{len(ids)}I", *ids)
+
+    o_vt = _HEADER.size
+    o_vb = o_vt + len(vend_table)
+    o_kt = o_vb + len(vend_blob)
+    o_kb = o_kt + len(key_table)
+    o_gt = o_kb + len(key_blob)
+    header = _HEADER.pack(MAGIC, VERSION, len(vendors), len(key_list), len(gram_list), o_vt, o_vb, o_kt, o_kb, o_gt)
+    tmp = out_path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(header + vend_table + vend_blob + key_table + key_blob + gram_table + post_blob)
+    os.replace(tmp, out_path)
+
+
+# ----------------- read -----------------
+
+class VendorDirectory:
+    """Read-only view over a memory-mapped vendor index."""
+
+    def __init__(self, index_path: str):
+        self._f = open(index_path, "rb")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.n_vendors, self.n_keys, self.n_grams,
+         self._o_vt, self._o_vb, self._o_kt, self._o_kb, self._o_gt) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{index_path}: not a vendor index (v{VERSION})")
+        self._o_post = self._o_gt + self.n_grams * _GRAM.size
+        self._cache: Dict[int, Dict[str, Any]] = {}
+
+    def close(self):
+        self._mm.close()
+        self._f.close()
+
+    # ---- raw accessors ----
+
+    def vendor(self, vi: int) -> Dict[str, Any]:
+        v = self._cache.get(vi)
+        if v is None:
+            start, end = struct.unpack_from("<II", self._mm, self._o_vt + vi * 4)
+            v = json.loads(self._mm[self._o_vb + start:self._o_vb + end])
+            self._cache[vi] = v
+        return v
+
+    def _key(self, ki: int) -> Tuple[bytes, int, int]:
+        off, ln, vi, ng = _KEY.unpack_from(self._mm, self._o_kt + ki * _KEY.size)
+        return self._mm[self._o_kb + off:self._o_kb + off + ln], vi, ng
+
+    def _key_bisect(self, needle: bytes) -> int:
+        lo, hi = 0, self.n_keys
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid)[0] < needle:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _postings(self, gram: bytes) -> List[int]:
+        lo, hi = 0, self.n_grams
+        while lo < hi:
+            mid = (lo + hi) // 2
+            g, _, _ = _GRAM.unpack_from(self._mm, self._o_gt + mid * _GRAM.size)
+            if g < gram:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.n_grams:
+            return []
+        g, off, cnt = _GRAM.unpack_from(self._mm, self._o_gt + lo * _GRAM.size)
+        if g != gram:
+            return []
+        start = self._o_post + off * 4
+        return list(struct.unpack_from(f"<{cnt}I", self._mm, start))
+
+    def _match(self, vi: int, key: str, score: float) -> VendorMatch:
+        v = self.vendor(vi)
+        return VendorMatch(
+            name=v.get("name", ""),
+            number=v.get("number"),
+            score=round(score, 3),
+            matched=key,
+            departments=v.get("departments") or {},
+        )
+
+    # ---- lookups ----
+
+    def exact(self, key: str) -> Optional[int]:
+        kb = key.encode()
+        i = self._key_bisect(kb)
+        if i < self.n_keys:
+            k, vi, _ = self._key(i)
+            if k == kb:
+                return vi
+        return None
+
+    def prefix(self, prefix: str, limit: int = 10) -> Iterator[Tuple[str, int]]:
+        pb = prefix.encode()
+        i = self._key_bisect(pb)
+        while i < self.n_keys and limit > 0:
+            k, vi, _ = self._key(i)
+            if not k.startswith(pb):
+                return
+            yield k.decode(), vi
+            i += 1
+            limit -= 1
+
+    def fuzzy(self, query: str, limit: int = 5) -> List[VendorMatch]:
+        """Trigram Dice similarity against every indexed name/alias."""
+        grams = _trigrams(query)
+        hits: Dict[int, int] = {}
+        for g in grams:
+            for ki in self._postings(g):
+                hits[ki] = hits.get(ki, 0) + 1
+        best: Dict[int, VendorMatch] = {}
+        for ki, h in sorted(hits.items(), key=lambda kv: -kv[1])[: limit * 10]:
+            k, vi, ng = self._key(ki)
+            score = 2.0 * h / (len(grams) + ng)
+            if vi not in best or best[vi].score < score:
+                best[vi] = self._match(vi, k.decode(), score)
+        return sorted(best.values(), key=lambda m: -m.score)[:limit]
+
+    def search(self, name: str, limit: int = 5) -> List[VendorMatch]:
+        """Best matches for a free-form vendor name, highest score first."""
+        variants = _variants(name)
+        if not variants:
+            return []
+        for v in variants:
+            vi = self.exact(v)
+            if vi is not None:
+                return [self._match(vi, v, 1.0)]
+        # leading words: "walmart supercenter on 5th" → "walmart supercenter" → "walmart"
+        words = variants[0].split()
+        for n in range(len(words) - 1, 0, -1):
+            head = " ".join(words[:n])
+            for cand in (head, head.replace(" ", "")):
+                vi = self.exact(cand)
+                if vi is not None:
+                    return [self._match(vi, cand, 0.9)]
+        # name typed partially: "best b" → "best buy" (scanned on its own limit: one row can't
+        # tell a unique prefix from an ambiguous one; "best" → Best Buy + Best Western)
+        pre_by_vendor: Dict[int, VendorMatch] = {}
+        for k, vi in self.prefix(variants[0], PREFIX_SCAN):
+            pre_by_vendor.setdefault(vi, self._match(vi, k, 0.8))
+        pre = list(pre_by_vendor.values())
+        if len(pre) == 1:
+            if len(variants[0]) >= MIN_PREFIX_CHARS:
+                return pre
+            pre = []  # "w" doesn't name anyone
+        if len(pre) > 1:
+            return pre[:max(limit, 2)]  # ambiguous: let the caller ask
+        best: Dict[str, VendorMatch] = {}
+        for v in variants[:2]:  # spaced and noise-stripped forms
+            for m in self.fuzzy(v, limit):
+                if m.score >= MIN_FUZZY_SCORE and (m.name not in best or best[m.name].score < m.score):
+                    best[m.name] = m
+        fuzzy = sorted(best.values(), key=lambda m: -m.score)[:limit]
+        return fuzzy or pre[:limit]
+
+    def best(self, name: str) -> Optional[VendorMatch]:
+        """The one vendor `name` means, or None if unknown or ambiguous (the wizard asks instead)."""
+        found = self.search(name, limit=2)
+        if not found:
+            return None
+        top = found[0]
+        if len(found) == 1 or top.score >= 0.9:
+            return top
+        if top.score < 0.8 and top.score - found[1].score >= FUZZY_MARGIN:
+            return top  # fuzzy: clearly the closest name
+        return None
+
+    def resolve(self, name: str, department: Optional[str] = None) -> Optional[Tuple[VendorMatch, Optional[str]]]:
+        top = self.best(name)
+        if top is None:
+            return None
+        return top, top.number_for(department)
+
+
+# ----------------- process-wide directory -----------------
+
+_DIR: Optional[VendorDirectory] = None
+_DIR_LOCK = threading.Lock()
+
+
+def _index_path(src: str) -> str:
+    return os.getenv("VENDOR_INDEX_FILE") or os.path.splitext(src)[0] + ".idx"
+
+
+def _stale(idx: str, src: str) -> bool:
+    return not os.path.exists(idx) or os.path.getmtime(idx) < os.path.getmtime(src)
+
+
+def compile_index(src: str = VENDOR_DIRECTORY_FILE) -> str:
+    """Build the index for src if it is missing or older than the JSON; returns its path."""
+    idx = _index_path(src)
+    if not os.path.exists(src) or not _stale(idx, src):
+        return idx
+    # read-only data dir: a private copy in the temp dir (rebuilt when the JSON changes)
+    fallback = os.path.join(tempfile.gettempdir(), f"vendors-{hashlib.sha1(os.path.abspath(src).encode()).hexdigest()[:12]}.idx")
+    if not _stale(fallback, src):
+        return fallback
+    with open(src) as f:
+        vendors = json.load(f)
+    try:
+        build_index(vendors, idx)
+        return idx
+    except OSError as e:
+        print(f"[vendor_directory] cannot write index next to {src} ({e}); using {fallback}")
+    build_index(vendors, fallback)
+    return fallback
+
+
+def directory(src: str = VENDOR_DIRECTORY_FILE) -> Optional[VendorDirectory]:
+    """Open (compiling first if the JSON is newer than the index) the shared directory."""
+    global _DIR
+    if _DIR is not None:
+        return _DIR
+    with _DIR_LOCK:
+        if _DIR is not None:
+            return _DIR
+        idx = compile_index(src)
+        if not os.path.exists(idx):
+            print(f"[vendor_directory] no directory at {src}")
+            return None
+        _DIR = VendorDirectory(idx)
+        return _DIR
+
+
+def lookup_number(name: Optional[str], intent: Optional[str] = None) -> str:
+    """Phone number for a vendor name ('' if unknown), preferring the intent's department."""
+    d = directory()
+    if not d or not name:
+        return ""
+    res = d.resolve(name, INTENT_DEPARTMENT.get(intent or ""))
+    return (res[1] or "") if res else ""
+
+
+def vendor_key(name: Optional[str]) -> str:
+    """Canonical vendor name (directory match if we know it) for storage keys."""
+    d = directory()
+    found = d.best(name) if d and name else None
+    return normalize(found.name if found else (name or ""))
+
+
+if __name__ == "__main__":
+    print(compile_index(sys.argv[1] if len(sys.argv) > 1 else VENDOR_DIRECTORY_FILE))
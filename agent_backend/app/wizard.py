@@ -2,13 +2,8 @@
 import re
 from typing import Dict, Any, List, Optional
 from .config import USER_NAME, DEFAULT_USER_PHONE
-
-# Simple vendor → phone mapping (extend as needed)
-VENDOR_MAP = {
-    "walmart": "+18009256278",
-    # "enterprise": "...",
-    # "marriott": "...",
-}
+from .vendor_directory import lookup_number
+from .ivr_paths import vendor_profile
 
 # INTENT → required slots (policy)
 INTENT_SLOTS = {
@@ -48,8 +43,19 @@ def _is_e164ish(s: Optional[str]) -> bool:
     return bool(re.fullmatch(r"\+\d{8,16}", clean))
 
 def resolve_target_number(data: Dict[str, Any]) -> str:
-    v = (data.get("vendor_name") or data.get("hotel_name") or "").lower()
-    return data.get("target_number") or VENDOR_MAP.get(v, "")
+    if data.get("target_number"):
+        return data["target_number"]
+    v = data.get("vendor_name") or data.get("hotel_name")
+    return lookup_number(v, data.get("intent"))
+
+def apply_goal_intent(data: Dict[str, Any]) -> None:
+    """Map a legacy 'goal' onto an intent, never overriding a specific intent already set."""
+    cur = data.get("intent")
+    if cur in ("retail_return", "hotel_booking", "rental_issue", "service_booking"):
+        return
+    g = (data.get("goal") or "").lower()
+    if g in ("refund", "replacement", "return", "exchange"):
+        data["intent"] = "retail_return"
 
 def missing_fields(data: Dict[str, Any], intent: Optional[str]) -> List[str]:
     if not intent:
@@ -93,6 +99,8 @@ def build_call_vars(data: Dict[str, Any]) -> Dict[str, Any]:
         "preferred_time": data.get("preferred_time"),
         "ask_availability": data.get("ask_availability"),
         "question": data.get("question"),
+        # IVR hints: best recently-successful menu path for this vendor/department
+        "vendor_profile": vendor_profile(data.get("vendor_name") or data.get("hotel_name"), data.get("intent")),
     }
 
 def friendly_prompt(fields: List[str]) -> str:
@@ -0,0 +1,273 @@
+# bench/extraction_bench.py
+"""
+Extraction quality + latency benchmark for llm.extract_fields_with_debug over a
+labeled corpus (bench/extraction_corpus.jsonl: 8 utterances per intent, each
+with the expected intent/fields and a stand-in LLM answer).
+
+    python bench/extraction_bench.py                              # heuristic + recorded
+    python bench/extraction_bench.py --modes recorded --llm-latency-ms 400 --repeat 5
+    python bench/extraction_bench.py --modes local --llm-url http://localhost:11434/v1 --llm-model llama3.1
+    python bench/extraction_bench.py --json after.json
+    python bench/extraction_bench.py --compare before.json after.json
+
+Modes:
+  heuristic  USE_LLM off: only the regex/keyword fallback runs.
+  recorded   the corpus answers stand in for OpenAI ("llm": the JSON answer for
+             both passes, "llm_raw": raw text per pass, "llm": null = no answer),
+             so chat_json_object → chat_plain → fallback are all exercised.
+  local      any OpenAI-compatible server (llama.cpp, Ollama, vLLM) via --llm-url.
+
+Per mode: intent accuracy (+ confusion), per-field precision/recall/F1 (each
+utterance scored on the fields labeled for its intent), share of requests
+served by each pass, latency percentiles (overall and per pass).
+Run from agent_backend/.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import clients, llm  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "extraction_corpus.jsonl")
+PASSES = ("chat_json_object", "chat_plain", "fallback")
+INTENTS = ("retail_return", "hotel_booking", "rental_issue", "service_booking", "generic_query")
+
+
+def load(path: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _pct(xs: List[float], p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))]
+
+
+# ----------------- matching -----------------
+
+def _tokens(s: str) -> set:
+    return set(re.findall(r"[a-z0-9]+", s.lower()))
+
+
+def match(field: str, expected: Any, got: Any) -> bool:
+    """Lenient per-type comparison: phones by digits, numbers by value, text by tokens."""
+    if got is None:
+        return False
+    if isinstance(expected, bool) or isinstance(got, bool):
+        return expected is got
+    if isinstance(expected, (int, float)):
+        try:
+            return abs(float(got) - float(expected)) < 0.01
+        except (TypeError, ValueError):
+            return False
+    if field in ("user_phone", "target_number"):
+        return re.sub(r"\D", "", str(got)) == re.sub(r"\D", "", str(expected))
+    if field in ("order_id", "rental_agreement_number"):
+        return str(got).strip().upper() == str(expected).strip().upper()
+    e, g = _tokens(str(expected)), _tokens(str(got))
+    if not e or not g:
+        return False
+    # "Sep 2" ≈ "Sep 2, 2025", "left bud is dead" ≈ "the left bud is dead"
+    return e <= g or len(e & g) / len(e | g) >= 0.5
+
+
+# ----------------- LLM stand-ins -----------------
+
+class RecordedLLM:
+    """Answers from the corpus, looked up by the utterance in the prompt."""
+
+    def __init__(self, rows: List[Dict[str, Any]], latency_ms: float):
+        self.latency_s = latency_ms / 1000
+        self.answers = {}
+        for r in rows:
+            raw = r.get("llm_raw")
+            if raw is None and r.get("llm") is not None:
+                raw = {p: json.dumps(r["llm"]) for p in ("chat_json_object", "chat_plain")}
+            self.answers[r["text"].strip()] = raw
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kw):
+        pass_name = "chat_json_object" if kw.get("response_format") else "chat_plain"
+        m = re.match(r"Text: (.*)\nJSON:$", kw["messages"][-1]["content"], re.S)
+        raw = self.answers.get(m.group(1).strip() if m else "")
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        if not raw or raw.get(pass_name) is None:
+            raise TimeoutError("no answer")  # as a timed-out / failed request would
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=raw[pass_name]))])
+
+
+class LocalLLM:
+    """OpenAI-compatible local server; the app's model name is swapped for --llm-model."""
+
+    def __init__(self, url: str, model: str):
+        from openai import OpenAI
+        self._client = OpenAI(base_url=url, api_key=os.getenv("OPENAI_API_KEY") or "local")
+        self.model = model
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kw):
+        return self._client.chat.completions.create(**dict(kw, model=self.model))
+
+
+def _use(client: Optional[Any]):
+    """Point llm._oai() at `client` (None: heuristic only)."""
+    llm.USE_LLM, llm.OPENAI_API_KEY = client is not None, "bench" if client is not None else ""
+    clients.register("openai", lambda: client)
+
+
+# ----------------- run -----------------
+
+def evaluate(rows: List[Dict[str, Any]], repeat: int) -> Dict[str, Any]:
+    tp, fp, fn = Counter(), Counter(), Counter()
+    confusion: Dict[str, Counter] = defaultdict(Counter)
+    passes: Counter = Counter()
+    lat: List[float] = []
+    lat_by_pass: Dict[str, List[float]] = defaultdict(list)
+    misses: List[Dict[str, Any]] = []
+    # a row is scored on the fields labeled anywhere for its intent (the app prunes the rest by intent)
+    scope: Dict[str, set] = defaultdict(set)
+    for r in rows:
+        scope[r["expected"]["intent"]].update(k for k in r["expected"] if k != "intent")
+    labeled = set().union(*scope.values())
+
+    for i in range(repeat):
+        for r in rows:
+            t0 = time.perf_counter()
+            dbg = llm.extract_fields_with_debug(r["text"])
+            ms = (time.perf_counter() - t0) * 1000
+            lat.append(ms)
+            lat_by_pass[dbg["pass"]].append(ms)
+            if i:
+                continue  # quality is deterministic; later rounds only add latency samples
+            passes[dbg["pass"]] += 1
+            got, exp = dbg.get("fields") or {}, r["expected"]
+            confusion[exp["intent"]][got.get("intent") or "none"] += 1
+            wrong = {}
+            for k in scope[exp["intent"]]:
+                if k in exp and match(k, exp[k], got.get(k)):
+                    tp[k] += 1
+                    continue
+                if k in exp:
+                    fn[k] += 1
+                if got.get(k) is not None:
+                    fp[k] += 1
+                if k in exp or got.get(k) is not None:
+                    wrong[k] = {"expected": exp.get(k), "got": got.get(k)}
+            if got.get("intent") != exp["intent"]:
+                wrong["intent"] = {"expected": exp["intent"], "got": got.get("intent")}
+            if wrong:
+                misses.append({"id": r["id"], "pass": dbg["pass"], "wrong": wrong})
+
+    n = len(rows)
+    fields = {}
+    for k in sorted(labeled):
+        p = tp[k] / (tp[k] + fp[k]) if tp[k] + fp[k] else 0.0
+        rc = tp[k] / (tp[k] + fn[k]) if tp[k] + fn[k] else 0.0
+        fields[k] = {"precision": round(p, 3), "recall": round(rc, 3),
+                     "f1": round(2 * p * rc / (p + rc), 3) if p + rc else 0.0,
+                     "support": tp[k] + fn[k]}
+    TP, FP, FN = sum(tp.values()), sum(fp.values()), sum(fn.values())
+    micro_p = TP / (TP + FP) if TP + FP else 0.0
+    micro_r = TP / (TP + FN) if TP + FN else 0.0
+    correct = sum(confusion[i][i] for i in confusion)
+    return {
+        "n": n,
+        "intent_accuracy": round(correct / n, 3),
+        "intent_accuracy_by_intent": {i: round(confusion[i][i] / sum(confusion[i].values()), 3) for i in INTENTS if confusion[i]},
+        "intent_confusion": {i: dict(c) for i, c in confusion.items()},
+        "fields_micro": {"precision": round(micro_p, 3), "recall": round(micro_r, 3),
+                         "f1": round(2 * micro_p * micro_r / (micro_p + micro_r), 3) if micro_p + micro_r else 0.0},
+        "fields": fields,
+        "pass_share": {p: round(passes[p] / n, 3) for p in sorted(set(PASSES) | set(passes))},
+        "latency_ms": _latency(lat),
+        "latency_ms_by_pass": {p: _latency(xs) for p, xs in sorted(lat_by_pass.items())},
+        "misses": misses,
+    }
+
+
+def _latency(xs: List[float]) -> Dict[str, float]:
+    return {"n": len(xs), "mean": round(statistics.fmean(xs), 3), "p50": round(_pct(xs, 50), 3),
+            "p90": round(_pct(xs, 90), 3), "p99": round(_pct(xs, 99), 3), "max": round(max(xs), 3)}
+
+
+def run(args) -> Dict[str, Any]:
+    rows = load(args.corpus)
+    report: Dict[str, Any] = {"corpus": os.path.basename(args.corpus), "python": sys.version.split()[0],
+                              "repeat": args.repeat, "modes": {}}
+    for mode in args.modes.split(","):
+        if mode == "heuristic":
+            _use(None)
+        elif mode == "recorded":
+            _use(RecordedLLM(rows, args.llm_latency_ms))
+        elif mode == "local":
+            if not args.llm_url:
+                raise SystemExit("--modes local needs --llm-url")
+            _use(LocalLLM(args.llm_url, args.llm_model))
+        else:
+            raise SystemExit(f"unknown mode: {mode}")
+        report["modes"][mode] = evaluate(rows, args.repeat)
+    return report
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any]):
+    for mode, b in before["modes"].items():
+        a = after["modes"].get(mode)
+        if not a:
+            continue
+        print(f"[{mode}]")
+        print(f"  intent accuracy  {b['intent_accuracy']:.3f} → {a['intent_accuracy']:.3f} ({a['intent_accuracy'] - b['intent_accuracy']:+.3f})")
+        bf, af = b["fields_micro"]["f1"], a["fields_micro"]["f1"]
+        print(f"  fields micro-F1  {bf:.3f} → {af:.3f} ({af - bf:+.3f})")
+        for k, bv in b["fields"].items():
+            av = a["fields"].get(k)
+            if av and av["f1"] != bv["f1"]:
+                print(f"    {k:24s} F1 {bv['f1']:.3f} → {av['f1']:.3f}  (P {bv['precision']:.2f} → {av['precision']:.2f}, R {bv['recall']:.2f} → {av['recall']:.2f})")
+        print("  pass share       " + "  ".join(f"{p} {b['pass_share'].get(p, 0):.2f} → {a['pass_share'].get(p, 0):.2f}" for p in PASSES))
+        bl, al = b["latency_ms"], a["latency_ms"]
+        print("  latency ms       " + "  ".join(f"{p} {bl[p]:.2f} → {al[p]:.2f} ({(al[p] - bl[p]) / bl[p] * 100 if bl[p] else 0:+.0f}%)" for p in ("p50", "p90", "p99")))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Extraction accuracy / latency benchmark")
+    ap.add_argument("--corpus", default=CORPUS)
+    ap.add_argument("--modes", default="heuristic,recorded", help="comma list of heuristic, recorded, local")
+    ap.add_argument("--repeat", type=int, default=3, help="passes over the corpus (latency samples)")
+    ap.add_argument("--llm-latency-ms", type=float, default=0.0, help="recorded mode: simulated LLM round trip")
+    ap.add_argument("--llm-url", help="local mode: OpenAI-compatible base URL")
+    ap.add_argument("--llm-model", default="llama3.1")
+    ap.add_argument("--misses", action="store_true", help="print the per-utterance mistakes")
+    ap.add_argument("--json", help="write the report here")
+    ap.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = ap.parse_args()
+    if args.compare:
+        with open(args.compare[0]) as f, open(args.compare[1]) as g:
+            compare(json.load(f), json.load(g))
+        return
+    report = run(args)
+    for mode, res in report["modes"].items():
+        lat = res["latency_ms"]
+        print(f"[{mode}] intent acc {res['intent_accuracy']:.3f}  fields P {res['fields_micro']['precision']:.3f} "
+              f"R {res['fields_micro']['recall']:.3f} F1 {res['fields_micro']['f1']:.3f}  "
+              f"passes {res['pass_share']}  latency p50 {lat['p50']:.2f} p90 {lat['p90']:.2f} p99 {lat['p99']:.2f} ms")
+        for k, v in res["fields"].items():
+            print(f"    {k:24s} P {v['precision']:.2f}  R {v['recall']:.2f}  F1 {v['f1']:.2f}  (n={v['support']})")
+        if args.misses:
+            for m in res["misses"]:
+                print(f"    miss {m['id']} [{m['pass']}] {m['wrong']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
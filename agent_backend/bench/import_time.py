@@ -0,0 +1,131 @@
+# bench/import_time.py
+"""
+Cold-start benchmark: import time of the app modules in fresh interpreters,
+plus time to the first served request, and which heavy SDKs got pulled in.
+
+    python bench/import_time.py                       # app.main, server.main
+    python bench/import_time.py --runs 10 --json out.json
+    python bench/import_time.py --compare before.json after.json
+
+Run from agent_backend/. Each sample is a new `python -X importtime` process,
+so nothing is cached between runs except the OS page cache.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+HEAVY = ("openai", "vapi", "twilio", "requests", "httpx", "websockets")
+
+# executed in the child: import, build a TestClient, serve one request
+_STARTUP = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import {module} as m
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(m.app) as c:
+    c.get("/docs")
+t2 = time.perf_counter()
+heavy = sorted({{k.split(".")[0] for k in sys.modules}} & set({heavy!r}))
+print(json.dumps({{"import_s": t1 - t0, "first_request_s": t2 - t1, "heavy": heavy}}))
+"""
+
+
+def _child_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("MAINTENANCE_INTERVAL_S", "0")
+    return env
+
+
+def _package_times(stderr: str) -> Dict[str, int]:
+    """-X importtime lines → {top-level package: cumulative µs of its outermost import}."""
+    out: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cum, name = line.split("|", 2)
+        if not cum.strip().isdigit():
+            continue  # header line
+        top = name.strip().split(".")[0]
+        out[top] = max(out.get(top, 0), int(cum))
+    return out
+
+
+def sample(module: str, cwd: str) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        # run against a throwaway DB so startup migrations never touch dev.db
+        env = _child_env()
+        env["PYTHONPATH"] = cwd + os.pathsep + env.get("PYTHONPATH", "")
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", _STARTUP.format(module=module, heavy=HEAVY)],
+            cwd=tmp, env=env, capture_output=True, text=True,
+        )
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+    res = json.loads(proc.stdout.strip().splitlines()[-1])
+    res["modules_us"] = _package_times(proc.stderr)
+    return res
+
+
+def _pct(xs: List[float], p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))]
+
+
+def run(modules: List[str], runs: int, cwd: str) -> Dict[str, Any]:
+    report: Dict[str, Any] = {"python": sys.version.split()[0], "runs": runs, "modules": {}}
+    for module in modules:
+        samples = [sample(module, cwd) for _ in range(runs)]
+        ok = [s for s in samples if "error" not in s]
+        if not ok:
+            report["modules"][module] = {"error": samples[0]["error"]}
+            continue
+        imp = [s["import_s"] for s in ok]
+        first = [s["first_request_s"] for s in ok]
+        own = module.split(".")[0]
+        slowest = sorted(((k, v) for k, v in ok[-1]["modules_us"].items() if k != own), key=lambda kv: -kv[1])[:10]
+        report["modules"][module] = {
+            "import_ms": {"median": round(statistics.median(imp) * 1000, 1), "p90": round(_pct(imp, 90) * 1000, 1)},
+            "first_request_ms": {"median": round(statistics.median(first) * 1000, 1)},
+            "heavy_imported": ok[-1]["heavy"],
+            "slowest_imports_ms": {k: round(v / 1000, 1) for k, v in slowest},
+        }
+    return report
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any]):
+    for module, b in before["modules"].items():
+        a = after["modules"].get(module)
+        if not a or "error" in a or "error" in b:
+            continue
+        bi, ai = b["import_ms"]["median"], a["import_ms"]["median"]
+        print(f"{module:12s} import {bi:8.1f} → {ai:8.1f} ms ({(ai - bi) / bi * 100:+.0f}%)  "
+              f"heavy {b['heavy_imported']} → {a['heavy_imported']}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Import-time / startup benchmark")
+    ap.add_argument("modules", nargs="*", default=["app.main", "server.main"])
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--json", help="write the report here")
+    ap.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = ap.parse_args()
+    if args.compare:
+        with open(args.compare[0]) as f, open(args.compare[1]) as g:
+            compare(json.load(f), json.load(g))
+        return
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    report = run(args.modules, args.runs, cwd)
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
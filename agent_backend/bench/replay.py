@@ -0,0 +1,409 @@
+# bench/replay.py
+"""
+Replay captured traffic (CAPTURE_FILE, see app/capture.py) against app.main:app
+in-process and report throughput and latency percentiles per endpoint, so two
+builds can be compared on the same real conversations.
+
+    CAPTURE_FILE=traffic.ndjson.gz uvicorn app.main:app ...    # record
+    python bench/replay.py traffic.ndjson.gz                   # 1x: the recorded pacing
+    python bench/replay.py traffic.ndjson.gz --speed 10        # 10x faster
+    python bench/replay.py traffic.ndjson.gz --speed 0 --repeat 5 --json after.json   # flat out
+    python bench/replay.py traffic.ndjson.gz --app-dir ../base/agent_backend --speed 0 --json before.json
+    python bench/replay.py --compare before.json after.json    # exit 1 on a regression
+
+Requests of one conversation (same session / call) are sent in recorded order;
+conversations overlap as they did when recorded (or all at once with --speed 0).
+Session and call ids are mapped to the ones the replayed app hands out.
+External services are served from the recording: LLM answers by prompt, Vapi
+calls.create in per-session order, control-URL POSTs always succeed. They
+answer instantly unless --external-latency recorded.
+
+Run from agent_backend/; the app runs in a temp directory so dev.db is never
+touched. --app-dir points the import at another checkout (e.g. a git worktree
+of the base branch).
+"""
+import argparse
+import asyncio
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LABELS = {
+    "/intake/start": "intake_start",
+    "/intake/reply": "intake_reply",
+    "/intake/reset": "intake_reset",
+    "/vapi/webhook": "vapi_webhook",
+    "/vapi/server": "vapi_webhook",
+}
+
+
+def load(path: str) -> List[Dict[str, Any]]:
+    with open(path, "rb") as f:
+        gz = f.read(2) == b"\x1f\x8b"
+    with (gzip.open(path, "rt", encoding="utf-8") if gz else open(path, encoding="utf-8")) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _pct(xs: List[float], p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))]
+
+
+def _find(obj: Any, key: str) -> Optional[Any]:
+    """First value under `key` anywhere in a JSON-like value."""
+    if isinstance(obj, dict):
+        if obj.get(key):
+            return obj[key]
+        for v in obj.values():
+            found = _find(v, key)
+            if found:
+                return found
+    elif isinstance(obj, list):
+        for v in obj:
+            found = _find(v, key)
+            if found:
+                return found
+    return None
+
+
+def _remap(obj: Any, ids: Dict[str, str]) -> Any:
+    if isinstance(obj, dict):
+        return {k: _remap(v, ids) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_remap(v, ids) for v in obj]
+    if isinstance(obj, str):
+        return ids.get(obj, obj)
+    return obj
+
+
+# ----------------- recording -----------------
+
+class Recording:
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.http = sorted((r for r in records if r["kind"] == "http"), key=lambda r: r["ts"])
+        self.llm: Dict[tuple, Dict[str, Any]] = {}
+        self.llm_by_pass: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for r in records:
+            if r["kind"] == "llm":
+                self.llm.setdefault((r["pass"], r["key"]), r)
+                self.llm_by_pass[r["pass"]].append(r)
+        self.creates = [r for r in records if r["kind"] == "vapi.create"]
+        self.call_session = {r["call_id"]: r.get("session_id") for r in self.creates if r.get("call_id")}
+        self.monitors = {r["call_id"]: r.get("monitor") for r in self.creates if r.get("call_id")}
+
+    def chains(self) -> List[List[Dict[str, Any]]]:
+        """http records grouped by conversation, each group in recorded order."""
+        groups: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for i, r in enumerate(self.http):
+            body = r.get("body")
+            sid = (r.get("resp") or {}).get("session_id") or _find(body, "session_id")
+            if not sid:
+                call = _find(body, "call")
+                call_id = _find(body, "call_id") or (call.get("id") if isinstance(call, dict) else None)
+                sid = self.call_session.get(call_id) or call_id
+            groups[sid or f"_{i}"].append(r)
+        return list(groups.values())
+
+
+# ----------------- recorded externals -----------------
+
+class Externals:
+    """Fake openai / vapi / http clients answering from the recording."""
+
+    def __init__(self, rec: Recording, latency: str):
+        self.rec, self.latency = rec, latency
+        self.lock = threading.Lock()
+        self.stats = {"llm_hits": 0, "llm_misses": 0, "vapi_creates": 0, "vapi_synthesized": 0, "hangups": 0}
+        self.round = 0
+        self.reset()
+        ext = self
+
+        class _Completions:
+            def create(self, **kw):
+                return ext._llm(kw)
+
+        class _Calls:
+            def create(self, **kw):
+                return ext._create(kw)
+
+            def get(self, id):
+                return {"id": id, "monitor": ext.rec.monitors.get(ext.original.get(id, id))}
+
+        class _HTTP:
+            def post(self, url, **kw):
+                return ext._hangup()
+
+        class _AHTTP:
+            async def post(self, url, **kw):
+                return ext._hangup()
+
+            async def aclose(self):
+                pass
+
+        self.openai = SimpleNamespace(chat=SimpleNamespace(completions=_Completions()))
+        self.vapi = SimpleNamespace(calls=_Calls())
+        self.http, self.ahttp = _HTTP(), _AHTTP()
+
+    def reset(self):
+        """Before each pass: fresh id maps and create queues."""
+        self.ids: Dict[str, str] = {}       # recorded session/call id → replayed one
+        self.original: Dict[str, str] = {}  # replayed → recorded
+        self.unclaimed = list(self.rec.creates)  # recorded calls.create answers, in recorded order
+        self.by_pass = {p: 0 for p in self.rec.llm_by_pass}
+
+    def map_id(self, recorded: str, replayed: str):
+        with self.lock:
+            self.ids[recorded], self.original[replayed] = replayed, recorded
+
+    def _sleep(self, r: Dict[str, Any]):
+        if self.latency == "recorded":
+            time.sleep((r.get("ms") or 0) / 1000)
+
+    def _llm(self, kw: Dict[str, Any]):
+        pass_name = "chat_json_object" if kw.get("response_format") else "chat_plain"
+        # same digest as capture.prompt_key; the replayed prompt is already redacted
+        key = hashlib.sha1(((kw.get("messages") or [{}])[-1].get("content") or "").encode()).hexdigest()[:16]
+        with self.lock:
+            r = self.rec.llm.get((pass_name, key))
+            if r is None and self.rec.llm_by_pass.get(pass_name):
+                seen = self.rec.llm_by_pass[pass_name]
+                r = seen[self.by_pass[pass_name] % len(seen)]
+                self.by_pass[pass_name] += 1
+                self.stats["llm_misses"] += 1
+            elif r is not None:
+                self.stats["llm_hits"] += 1
+        if r is None:
+            self.stats["llm_misses"] += 1
+            raise RuntimeError("no recorded LLM answer")
+        self._sleep(r)
+        if r.get("error"):
+            raise RuntimeError(r["error"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=r.get("content")))])
+
+    def _create(self, kw: Dict[str, Any]):
+        meta = ((kw.get("assistant_overrides") or {}).get("variable_values") or {}).get("metadata") or {}
+        sid = meta.get("session_id")
+        with self.lock:
+            recorded_sid = self.original.get(sid)
+            # this session's next recorded call; a dial from inside /intake/start comes before
+            # its session id is mapped, so then take the oldest call of a session not seen yet
+            r = next((c for c in self.unclaimed if recorded_sid and c.get("session_id") == recorded_sid), None) \
+                or next((c for c in self.unclaimed if c.get("session_id") not in self.ids), None)
+            if r is None:
+                self.stats["vapi_synthesized"] += 1
+                r = {"call_id": f"replay-call-{self.stats['vapi_synthesized']}", "monitor": None}
+            else:
+                self.unclaimed.remove(r)
+            self.stats["vapi_creates"] += 1
+        call_id = r["call_id"] if not self.round else f"{r['call_id']}~{self.round}"
+        self.map_id(r["call_id"], call_id)
+        if sid and r.get("session_id") and not recorded_sid:
+            self.map_id(r["session_id"], sid)
+        self._sleep(r)
+        return {"id": call_id, "monitor": r.get("monitor")}
+
+    def _hangup(self):
+        with self.lock:
+            self.stats["hangups"] += 1
+        return SimpleNamespace(is_success=True, status_code=200)
+
+
+# ----------------- replay -----------------
+
+def _label(r: Dict[str, Any]) -> List[str]:
+    label = LABELS.get(r["path"], r["path"])
+    if label != "vapi_webhook":
+        return [label]
+    kind = _find(r.get("body"), "type")
+    return [label, f"{label}[{kind}]"] if kind else [label]
+
+
+async def _pass(app, rec: Recording, ext: Externals, speed: float, max_gap: float,
+                lat: Dict[str, List[float]], counts: Dict[str, Dict[str, int]]):
+    import httpx
+    chains = rec.chains()
+    t_first = rec.http[0]["ts"] if rec.http else 0
+    # schedule: recorded offsets with idle gaps capped at max_gap, divided by speed
+    at: Dict[int, float] = {}
+    off, prev = 0.0, t_first
+    for r in rec.http:
+        off += min(r["ts"] - prev, max_gap)
+        prev = r["ts"]
+        at[id(r)] = off / speed if speed else 0.0
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=120) as client:
+        start = time.perf_counter()
+
+        async def run_chain(chain):
+            for r in chain:
+                delay = start + at[id(r)] - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                url = r["path"] + (f"?{r['query']}" if r.get("query") else "")
+                for rec_id, new_id in ext.ids.items():
+                    url = url.replace(rec_id, new_id)
+                body = _remap(r.get("body"), ext.ids)
+                t0 = time.perf_counter()
+                try:
+                    resp = await client.request(r["method"], url, json=body)
+                    status = resp.status_code
+                except Exception:
+                    resp, status = None, 599
+                ms = (time.perf_counter() - t0) * 1000
+                for label in _label(r):
+                    lat[label].append(ms)
+                    c = counts[label]
+                    c["errors"] += status >= 500
+                    c["status_mismatch"] += status != r.get("status")
+                recorded_sid = (r.get("resp") or {}).get("session_id")
+                if resp is not None and recorded_sid and status < 400:
+                    new_sid = resp.json().get("session_id")
+                    if new_sid:
+                        ext.map_id(recorded_sid, new_sid)
+
+        await asyncio.gather(*(run_chain(c) for c in chains))
+        return time.perf_counter() - start
+
+
+def _git_rev(app_dir: str) -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=app_dir,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(corpus: str, app_dir: str, speed: float, repeat: int, warmup: int, max_gap: float, latency: str,
+        verbose: bool = False) -> Dict[str, Any]:
+    rec = Recording(load(corpus))
+    if not rec.http:
+        raise SystemExit(f"{corpus}: no http records")
+    os.environ["CAPTURE_FILE"] = ""  # never record the replay
+    os.environ.setdefault("MAINTENANCE_INTERVAL_S", "0")
+    os.environ.setdefault("VAPI_NUMBER_POOL", "pn-replay:100000")  # don't let the pool queue replayed dials
+    if rec.llm_by_pass:
+        os.environ["USE_LLM"], os.environ["OPENAI_API_KEY"] = "true", os.environ.get("OPENAI_API_KEY") or "replay"
+    sys.path.insert(0, os.path.abspath(app_dir))
+    os.chdir(tempfile.mkdtemp(prefix="replay-"))  # app startup opens ./dev.db; keep it off the real one
+    from app import clients
+    ext = Externals(rec, latency)
+    for name in ("openai", "vapi", "http", "ahttp"):
+        clients.register(name, lambda name=name: getattr(ext, name))
+    from app.main import app
+
+    lat: Dict[str, List[float]] = defaultdict(list)
+    counts: Dict[str, Dict[str, int]] = defaultdict(lambda: {"errors": 0, "status_mismatch": 0})
+
+    async def go() -> float:
+        async with app.router.lifespan_context(app):
+            wall = 0.0
+            for i in range(warmup + repeat):
+                ext.round = i
+                ext.reset()
+                if i < warmup:
+                    await _pass(app, rec, ext, speed, max_gap, defaultdict(list), defaultdict(lambda: {"errors": 0, "status_mismatch": 0}))
+                else:
+                    wall += await _pass(app, rec, ext, speed, max_gap, lat, counts)
+            return wall
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(sys.stdout if verbose else devnull):
+        wall = asyncio.run(go())  # the app's debug prints would swamp the report
+    total = sum(len(v) for k, v in lat.items() if "[" not in k)
+    endpoints = {}
+    for label, xs in sorted(lat.items()):
+        endpoints[label] = {
+            "n": len(xs),
+            **counts[label],
+            "mean_ms": round(statistics.fmean(xs), 2),
+            "p50_ms": round(_pct(xs, 50), 2),
+            "p90_ms": round(_pct(xs, 90), 2),
+            "p99_ms": round(_pct(xs, 99), 2),
+            "max_ms": round(max(xs), 2),
+        }
+    return {
+        "corpus": os.path.basename(corpus),
+        "app_dir": os.path.abspath(app_dir),
+        "git": _git_rev(app_dir),
+        "python": sys.version.split()[0],
+        "speed": speed,
+        "repeat": repeat,
+        "requests": total,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(total / wall, 1) if wall else 0,
+        "errors": sum(c["errors"] for k, c in counts.items() if "[" not in k),
+        "endpoints": endpoints,
+        "externals": ext.stats,
+    }
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any], threshold: float) -> List[str]:
+    """Print the side-by-side table; return what got slower than threshold (%)."""
+    regressions = []
+    print(f"{'':34s} {before.get('git') or 'before':>10s} → {after.get('git') or 'after':<10s}")
+    bt, at = before["throughput_rps"], after["throughput_rps"]
+    d = (at - bt) / bt * 100 if bt else 0.0
+    print(f"{'throughput (req/s)':34s} {bt:10.1f} → {at:<10.1f} ({d:+.0f}%)")
+    if d < -threshold:
+        regressions.append(f"throughput {d:+.0f}%")
+    for label, b in before["endpoints"].items():
+        a = after["endpoints"].get(label)
+        if not a:
+            continue
+        cells = []
+        for p in ("p50_ms", "p90_ms", "p99_ms"):
+            d = (a[p] - b[p]) / b[p] * 100 if b[p] else 0.0
+            cells.append(f"{p[:3]} {b[p]:7.2f} → {a[p]:7.2f} ({d:+4.0f}%)")
+            if p != "p99_ms" and d > threshold and "[" not in label:  # p99 of a short run is noise
+                regressions.append(f"{label} {p[:3]} {d:+.0f}%")
+        print(f"{label:34s} " + "  ".join(cells) + (f"  errors {b['errors']} → {a['errors']}" if a["errors"] or b["errors"] else ""))
+        if a["errors"] > b["errors"] and "[" not in label:
+            regressions.append(f"{label} errors {b['errors']} → {a['errors']}")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay captured traffic and report latency/throughput")
+    ap.add_argument("corpus", nargs="?", help="CAPTURE_FILE output (.ndjson or .ndjson.gz)")
+    ap.add_argument("--app-dir", default=HERE, help="agent_backend/ of the build to replay against")
+    ap.add_argument("--speed", type=float, default=1.0, help="time factor; 0 = no pacing, as fast as possible")
+    ap.add_argument("--repeat", type=int, default=1, help="measured passes over the corpus")
+    ap.add_argument("--warmup", type=int, default=1, help="unmeasured passes first")
+    ap.add_argument("--max-gap", type=float, default=5.0, help="cap on idle time between recorded requests (s)")
+    ap.add_argument("--external-latency", choices=("zero", "recorded"), default="zero")
+    ap.add_argument("--verbose", action="store_true", help="keep the app's own output")
+    ap.add_argument("--json", help="write the report here")
+    ap.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    ap.add_argument("--threshold", type=float, default=10.0, help="regression threshold for --compare (%%)")
+    args = ap.parse_args()
+    if args.compare:
+        with open(args.compare[0]) as f, open(args.compare[1]) as g:
+            regressions = compare(json.load(f), json.load(g), args.threshold)
+        print("REGRESSION: " + "; ".join(regressions) if regressions else "OK")
+        sys.exit(1 if regressions else 0)
+    if not args.corpus:
+        ap.error("corpus is required (or --compare BEFORE AFTER)")
+    corpus = os.path.abspath(args.corpus)
+    out = os.path.abspath(args.json) if args.json else None
+    report = run(corpus, args.app_dir, args.speed, args.repeat, args.warmup, args.max_gap, args.external_latency, args.verbose)
+    print(json.dumps(report, indent=2))
+    if out:
+        with open(out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
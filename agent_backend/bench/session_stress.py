@@ -0,0 +1,156 @@
+# bench/session_stress.py
+"""
+Concurrency stress for the session outbox: producer threads append numbered
+events to random sessions (as webhooks, fan-out and monitors do) while poller
+threads drain them (as /events/poll does). Every event must come out exactly
+once.
+
+    python bench/session_stress.py                    # store (drain) + in-process API (?after= cursors)
+    python bench/session_stress.py --producers 32 --events 20000
+    python bench/session_stress.py --naive            # old copy-then-clear poll, for contrast
+
+Exit status is 1 if anything was lost or duplicated. Run from agent_backend/.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.outbox import Outbox  # noqa: E402
+from app.sessions import SessionStore  # noqa: E402
+
+
+def _naive_drain(sess) -> List[Dict[str, Any]]:
+    items = list(sess.outbox)  # what poll_events used to do with the plain list: copy, then clear
+    sess.outbox.clear()
+    return items
+
+
+def run(sessions: int, producers: int, pollers: int, events: int, drain: Callable, naive: bool = False) -> Dict[str, Any]:
+    class S:
+        def __init__(self):
+            self.outbox, self.call_id = ([] if naive else Outbox(capacity=producers * events)), None
+
+    store = SessionStore()
+    sids = [store.create(S)[0] for _ in range(sessions)]
+    got: List[Counter] = [Counter() for _ in range(pollers)]
+    done = threading.Event()
+
+    def produce(p: int):
+        rnd = random.Random(p)
+        for i in range(events):
+            store.get(rnd.choice(sids)).outbox.append({"type": "stress", "id": (p, i)})
+
+    def poll(k: int):
+        rnd = random.Random(1000 + k)
+        while True:
+            finished = done.is_set()
+            for ev in drain(store.get(rnd.choice(sids))):
+                got[k][ev["id"]] += 1
+            if finished:
+                for sid in sids:  # final sweep
+                    for ev in drain(store.get(sid)):
+                        got[k][ev["id"]] += 1
+                return
+
+    t0 = time.perf_counter()
+    ps = [threading.Thread(target=produce, args=(p,)) for p in range(producers)]
+    qs = [threading.Thread(target=poll, args=(k,)) for k in range(pollers)]
+    for t in ps + qs:
+        t.start()
+    for t in ps:
+        t.join()
+    done.set()
+    for t in qs:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    total = Counter()
+    for c in got:
+        total.update(c)
+    sent = producers * events
+    return {
+        "sent": sent,
+        "received": sum(total.values()),
+        "lost": sent - len(total),
+        "duplicated": sum(n - 1 for n in total.values() if n > 1),
+        "events_per_s": round(sent / elapsed),
+    }
+
+
+def run_api(sessions: int, producers: int, events: int) -> Dict[str, Any]:
+    """Same check through the real app, with clients resuming from ?after=<next_after>."""
+    os.environ.setdefault("MAINTENANCE_INTERVAL_S", "0")
+    os.chdir(tempfile.mkdtemp())  # app startup opens ./dev.db; keep it off the real one
+    from concurrent.futures import ThreadPoolExecutor
+    from fastapi.testclient import TestClient
+    from app import main
+
+    with TestClient(main.app) as c:
+        sids = [c.post("/intake/start", json={"vendor_name": "Stress"}).json()["session_id"] for _ in range(sessions)]
+        for sid in sids:
+            main.SESS.get(sid).outbox.capacity = producers * events  # measure races, not overflow
+        seen: Counter = Counter()
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def produce(p: int):
+            rnd = random.Random(p)
+            for i in range(events):
+                main.SESS.get(rnd.choice(sids)).outbox.append({"type": "stress", "id": f"{p}-{i}"})
+
+        def poll(sid: str):
+            after = 0
+            while True:
+                finished = done.is_set()
+                r = c.get("/events/poll", params={"session_id": sid, "after": after}).json()
+                after = r["next_after"]
+                with lock:
+                    seen.update(e["id"] for e in r["events"] if e["type"] == "stress")
+                if finished and not r["events"]:
+                    return
+
+        with ThreadPoolExecutor(producers + sessions) as ex:
+            polls = [ex.submit(poll, sid) for sid in sids]
+            for f in [ex.submit(produce, p) for p in range(producers)]:
+                f.result()
+            done.set()
+            for f in polls:
+                f.result()
+    sent = producers * events
+    return {"sent": sent, "received": sum(seen.values()), "lost": sent - len(seen),
+            "duplicated": sum(n - 1 for n in seen.values() if n > 1)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Session outbox concurrency stress")
+    ap.add_argument("--sessions", type=int, default=16)
+    ap.add_argument("--producers", type=int, default=16)
+    ap.add_argument("--pollers", type=int, default=8)
+    ap.add_argument("--events", type=int, default=10000, help="per producer")
+    ap.add_argument("--naive", action="store_true", help="poll with the old copy-then-clear")
+    ap.add_argument("--no-api", action="store_true", help="skip the in-process HTTP round")
+    args = ap.parse_args()
+    sys.setswitchinterval(1e-6)  # switch threads as often as possible to provoke races
+
+    store = run(args.sessions, args.producers, args.pollers, args.events,
+                _naive_drain if args.naive else (lambda s: s.outbox.drain()), naive=args.naive)
+    print("store:", store)
+    ok = store["lost"] == 0 and store["duplicated"] == 0
+    if not args.no_api and not args.naive:
+        api = run_api(min(args.sessions, 8), min(args.producers, 8), max(1, args.events // 10))
+        print("api:  ", api)
+        ok = ok and api["lost"] == 0 and api["duplicated"] == 0
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+-- Learned IVR navigation per vendor/department. attempts/successes are
+-- exponentially decayed counters (see app/ivr_paths.py), anchored at last_used_at.
+create table if not exists ivr_paths (
+  vendor text not null, department text not null,
+  dtmf text not null default '', speak text not null default '',
+  attempts real not null default 0, successes real not null default 0,
+  avg_time_to_agent real, last_used_at real, last_success_at real,
+  primary key (vendor, department, dtmf, speak)
+);
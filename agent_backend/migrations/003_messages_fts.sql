@@ -0,0 +1,21 @@
+-- Transcript lines from Vapi calls live in messages too; task_id stays null for them.
+alter table messages add column call_id text;
+alter table messages add column session_id text;
+alter table messages add column vendor text;
+create index if not exists idx_messages_call on messages(call_id, id);
+create index if not exists idx_messages_vendor_ts on messages(vendor, ts, id);
+create index if not exists idx_messages_ts on messages(ts, id);
+
+-- Full-text index over message text (external content: no second copy of the text)
+create virtual table if not exists messages_fts using fts5(text, content='messages', content_rowid='id');
+create trigger if not exists messages_fts_ai after insert on messages begin
+  insert into messages_fts(rowid, text) values (new.id, new.text);
+end;
+create trigger if not exists messages_fts_ad after delete on messages begin
+  insert into messages_fts(messages_fts, rowid, text) values ('delete', old.id, old.text);
+end;
+create trigger if not exists messages_fts_au after update of text on messages begin
+  insert into messages_fts(messages_fts, rowid, text) values ('delete', old.id, old.text);
+  insert into messages_fts(rowid, text) values (new.id, new.text);
+end;
+insert into messages_fts(messages_fts) values ('rebuild');
@@ -0,0 +1,7 @@
+-- Listing/dashboard queries (server/storage.list_tasks): every filter is an
+-- equality prefix followed by the (created_at, id) keyset order.
+create index if not exists idx_tasks_created on tasks(created_at, id);
+create index if not exists idx_tasks_user_created on tasks(user_id, created_at, id);
+create index if not exists idx_tasks_status_created on tasks(status, created_at, id);
+create index if not exists idx_tasks_brand_created on tasks(brand, created_at, id);
+create index if not exists idx_calls_task on calls(task_id);
@@ -0,0 +1,3 @@
+-- Incremental exports (server/export.py) walk tasks in (updated_at, id) order
+-- from the previous run's high-water mark.
+create index if not exists idx_tasks_updated on tasks(updated_at, id);
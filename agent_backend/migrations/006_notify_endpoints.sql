@@ -0,0 +1,9 @@
+-- Per-user callback URLs for task notifications (server/notify.py). secret,
+-- when set, signs each delivery (X-Notify-Signature: sha256=<hmac of body>).
+create table if not exists notify_endpoints (
+  user_id text primary key,
+  url text not null,
+  secret text,
+  created_at text default CURRENT_TIMESTAMP,
+  updated_at text default CURRENT_TIMESTAMP
+);
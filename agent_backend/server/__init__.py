@@ -1,6 +1,5 @@
 # app/rag_client.py
 import os
-import httpx
 
 BASE = os.getenv("RAG_SERVICE_URL", "http://localhost:8001")
 
@@ -8,6 +7,7 @@ async def _post(path: str, payload: dict) -> dict:
     """POST helper with graceful fallback if Person B's service is down."""
     url = f"{BASE}{path}"
     try:
+        import httpx  # deferred: only the FSM path talks to the RAG service
         async with httpx.AsyncClient(timeout=5.0) as c:
             r = await c.post(url, json=payload)
             r.raise_for_status()
@@ -0,0 +1,176 @@
+# server/export.py
+"""
+Streaming export of tasks + summaries + latest call, as NDJSON or CSV.
+
+Rows are read through one cursor in EXPORT_CHUNK-sized fetchmany() batches
+and written out as they come, so memory stays flat however big the table is.
+
+Incremental (nightly) exports pass the previous run's high-water mark and only
+get rows whose updated_at moved past it. The mark is "updated_at|id" (ties on
+updated_at are broken by id); the CLI keeps it in a --state file.
+
+    python -m server.export --format csv --out tasks.csv
+    python -m server.export --state .export_mark --out delta.ndjson   # only what changed
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from server.storage import DB_FILE
+
+EXPORT_CHUNK = int(os.getenv("EXPORT_CHUNK", "500"))
+
+FIELDS = (
+    "id", "user_id", "brand", "department_hint", "goal", "reason", "status",
+    "created_at", "updated_at", "identifiers",
+    "ticket_id", "resolution", "amount", "eta",
+    "call_count", "call_state", "rep_name", "rep_id", "call_started_at", "call_ended_at",
+)
+
+_SQL = """
+select t.id, t.user_id, t.brand, t.department_hint, t.goal, t.reason, t.status,
+       t.created_at, t.updated_at, t.identifiers,
+       s.ticket_id, s.resolution, s.amount, s.eta,
+       (select count(*) from calls where task_id = t.id),
+       c.state, c.rep_name, c.rep_id, c.started_at, c.ended_at
+from tasks t
+left join summaries s on s.task_id = t.id
+left join calls c on c.id = (select id from calls where task_id = t.id order by started_at desc limit 1)
+"""
+
+
+def parse_mark(mark: Optional[str]) -> Optional[Tuple[str, str]]:
+    """'2024-05-01 00:00:00' or '2024-05-01 00:00:00|<task id>' → (updated_at, id)."""
+    if not mark:
+        return None
+    ts, _, tid = mark.partition("|")
+    return ts.strip(), tid.strip()
+
+
+def format_mark(row: Dict[str, Any]) -> str:
+    return f"{row['updated_at']}|{row['id']}"
+
+
+def iter_rows(
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    since_updated: Optional[str] = None,
+    db_file: str = DB_FILE,
+    chunk: int = EXPORT_CHUNK,
+) -> Iterator[Dict[str, Any]]:
+    """Export rows in (updated_at, id) order; created_* bound the time window."""
+    where, params = [], []
+    if created_from:
+        where.append("t.created_at >= ?"); params.append(created_from)
+    if created_to:
+        where.append("t.created_at < ?"); params.append(created_to)
+    mark = parse_mark(since_updated)
+    if mark:
+        where.append("(t.updated_at, t.id) > (?, ?)"); params.extend(mark)
+    # rows stamped this second may still gain same-second siblings below the mark this
+    # run returns; leave the whole second for the next run (first run included)
+    where.append("t.updated_at < ?"); params.append(time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()))
+    sql = _SQL + (" where " + " and ".join(where) if where else "") + " order by t.updated_at, t.id"
+
+    # starlette may pull successive chunks on different worker threads
+    conn = sqlite3.connect(db_file, check_same_thread=False)
+    try:
+        cur = conn.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(chunk)
+            if not rows:
+                return
+            for r in rows:
+                d = dict(zip(FIELDS, r))
+                d["identifiers"] = json.loads(d["identifiers"]) if d["identifiers"] else {}
+                yield d
+    finally:
+        conn.close()
+
+
+def ndjson_chunks(rows: Iterator[Dict[str, Any]], chunk: int = EXPORT_CHUNK) -> Iterator[str]:
+    buf: List[str] = []
+    for d in rows:
+        buf.append(json.dumps(d, separators=(",", ":")))
+        if len(buf) >= chunk:
+            yield "\n".join(buf) + "\n"
+            buf = []
+    if buf:
+        yield "\n".join(buf) + "\n"
+
+
+def csv_chunks(rows: Iterator[Dict[str, Any]], chunk: int = EXPORT_CHUNK) -> Iterator[str]:
+    out = io.StringIO()
+    w = csv.writer(out)
+    w.writerow(FIELDS)
+    n = 0
+    for d in rows:
+        w.writerow([json.dumps(d[f]) if f == "identifiers" else d[f] for f in FIELDS])
+        n += 1
+        if n % chunk == 0:
+            yield out.getvalue()
+            out.seek(0); out.truncate()
+    yield out.getvalue()
+
+
+def export(fmt: str = "ndjson", **filters) -> Iterator[str]:
+    if fmt not in ("ndjson", "csv"):
+        raise ValueError(f"unknown export format: {fmt}")
+    rows = iter_rows(**filters)
+    return csv_chunks(rows) if fmt == "csv" else ndjson_chunks(rows)
+
+
+# ----------------- CLI -----------------
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Stream tasks/summaries/calls as NDJSON or CSV")
+    ap.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    ap.add_argument("--db", default=DB_FILE)
+    ap.add_argument("--created-from", help="created_at >= this (UTC, 'YYYY-MM-DD[ HH:MM:SS]')")
+    ap.add_argument("--created-to", help="created_at < this")
+    ap.add_argument("--since-updated", help="high-water mark 'updated_at[|id]' from a previous run")
+    ap.add_argument("--state", help="file holding the high-water mark; read before, updated after")
+    ap.add_argument("--out", default="-", help="output file (default stdout)")
+    args = ap.parse_args(argv)
+
+    since = args.since_updated
+    if not since and args.state and os.path.exists(args.state):
+        with open(args.state) as f:
+            since = f.read().strip() or None
+
+    last: Dict[str, Any] = {}
+    count = 0
+
+    def tracked():
+        nonlocal count
+        for d in iter_rows(args.created_from, args.created_to, since, db_file=args.db):
+            last.update(d)
+            count += 1
+            yield d
+
+    t0 = time.time()
+    out = sys.stdout if args.out == "-" else open(args.out, "w", newline="")
+    try:
+        chunks = csv_chunks(tracked()) if args.format == "csv" else ndjson_chunks(tracked())
+        for c in chunks:
+            out.write(c)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    mark = format_mark(last) if last else since
+    if args.state and mark:
+        tmp = args.state + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(mark + "\n")
+        os.replace(tmp, args.state)
+    print(f"[export] {count} rows in {time.time() - t0:.2f}s; high-water mark: {mark or '-'}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
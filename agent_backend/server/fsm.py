@@ -1,37 +1,81 @@
 import asyncio
+import os
+import time
 from server.state import S, Ctx
 from server.storage import load_task, set_task_status, save_summary
 from server.rag_client import check_missing, retrieve_context, make_plan
-from server.twilio_driver import dial_support, play_script
-from server.summarize import build_summary_object
+from server.twilio_driver import dial_support, play_script, release_number
+from server.summarize import build_summary_object, SUMMARIES
+from server.planner import local_plan, enrich
+from server.retrieval import local_retrieve, has_vendor_policy
+from server.notify import NOTIFIER
+from typing import Optional
+from app.tracing import continue_trace, current, span, KIND_INTERNAL
 
-async def run_fsm(task_id: str):
+# How long CONFIRM waits for the checklist to fill in before summarizing what we have
+CONFIRM_WAIT_S = float(os.getenv("CONFIRM_WAIT_S", "90"))
+# "enrich": also ask the RAG service's /plan and merge it into the local plan
+PLAN_REMOTE = os.getenv("PLAN_REMOTE", "off").lower()
+# remote /retrieve: "fallback" = only when the local index has nothing for this vendor, "always", "off"
+RETRIEVE_REMOTE = os.getenv("RETRIEVE_REMOTE", "fallback").lower()
+
+async def _set_status(ctx: Ctx, status: str):
+    """Persist the status and tell the task owner (delivery happens off the FSM's path)."""
+    await set_task_status(ctx.task_id, status)
+    NOTIFIER.publish(ctx.task_id, status, user_id=ctx.brief.get("user_id"))
+
+async def run_fsm(task_id: str, traceparent: Optional[str] = None):
+    """
+    Drive the task to HALT inside the caller's trace (asyncio.create_task copies the
+    current span), else the call's propagated `traceparent`; a new trace only when neither.
+    """
+    if current() is not None:
+        root = span("fsm.run", task_id=task_id)
+    else:
+        root = continue_trace(traceparent, "fsm.run", KIND_INTERNAL, task_id=task_id)
+    with root:
+        await _run_fsm(task_id)
+
+async def _run_fsm(task_id: str):
     ctx = Ctx(task_id=task_id, brief=await load_task(task_id))
     state = S.PARSE
     try:
         while state != S.HALT:
             if state==S.PARSE:
-                await set_task_status(task_id, "calling"); state = S.CHECK
+                await _set_status(ctx, "calling"); state = S.CHECK
 
             elif state==S.CHECK:
                 res = await check_missing(ctx.brief)
                 if res.get("status") == "needs_info":
-                    await set_task_status(task_id, "needs_info")  # app should prompt user
+                    await _set_status(ctx, "needs_info")  # app should prompt user
                     return
                 state = S.RETRIEVE
 
             elif state==S.RETRIEVE:
-                ctx.context = await retrieve_context(ctx.brief); state = S.PLAN
+                with span("retrieve.local"):
+                    ctx.context = local_retrieve(ctx.brief) or {}
+                if RETRIEVE_REMOTE == "always" or (RETRIEVE_REMOTE == "fallback" and not has_vendor_policy(ctx.context)):
+                    remote = await retrieve_context(ctx.brief)
+                    if remote.get("selected_chunks") or not ctx.context:
+                        ctx.context = remote
+                state = S.PLAN
 
             elif state==S.PLAN:
-                ctx.plan = await make_plan(ctx.brief, ctx.context); state = S.DIAL
+                with span("plan.local"):
+                    ctx.plan = local_plan(ctx.brief, ctx.context) or {}
+                if not ctx.plan:
+                    ctx.plan = await make_plan(ctx.brief, ctx.context)
+                elif PLAN_REMOTE == "enrich":
+                    ctx.plan = enrich(ctx.plan, await make_plan(ctx.brief, ctx.context, fallback=False))
+                state = S.DIAL
 
             elif state==S.DIAL:
                 ctx.call_sid = await dial_support(ctx.brief)
+                ctx.summary = SUMMARIES.open(ctx.call_sid, ctx.plan.get("confirmation_checklist"))
                 await asyncio.sleep(1); state = S.AUTH
 
             elif state==S.AUTH:
-                await play_script(ctx.call_sid, ctx.plan["opening"])
+                await play_script(ctx.call_sid, ctx.plan["opening"], transcribe=True)
                 state = S.NEGOTIATE
 
             elif state==S.NEGOTIATE:
@@ -40,14 +84,22 @@ async def run_fsm(task_id: str):
                 await asyncio.sleep(1); state = S.CONFIRM
 
             elif state==S.CONFIRM:
-                # MVP stub (replace later with parsed transcript or live webhook)
-                ctx.outcome = {"status":"resolved","ticket":"WM-CASE-55321","amount":89.99,"eta":"3-5 business days"}
+                # transcript turns land in ctx.summary as they arrive (see SUMMARIES.feed)
+                deadline = time.monotonic() + CONFIRM_WAIT_S
+                while not (ctx.summary.complete or ctx.summary.ended) and time.monotonic() < deadline:
+                    await asyncio.sleep(0.5)
+                ctx.outcome = ctx.summary.outcome()
                 state = S.SUMMARIZE
 
             elif state==S.SUMMARIZE:
                 summary = build_summary_object(ctx)
                 await save_summary(ctx.task_id, summary)
-                await set_task_status(ctx.task_id, "resolved")
+                status = ctx.outcome.get("status")
+                await _set_status(ctx, "unresolved" if status == "pending" else status)
                 state = S.HALT
     except Exception:
-        await set_task_status(task_id, "failed")
+        await _set_status(ctx, "failed")
+    finally:
+        if ctx.call_sid:
+            release_number(ctx.call_sid)
+            SUMMARIES.end(ctx.call_sid)
@@ -33,22 +33,31 @@
 #         citations=s.get("citations", []), notes=s.get("notes", [])
 #     )
 
-import os, re, uuid
+import os, re, uuid, json
+from urllib.parse import parse_qs
 from typing import Dict, Any, List, List, Optional
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
-from vapi import Vapi
+from app import clients
+from app.vapi_events import parse_event, dispatch
+from app.vendor_directory import lookup_number
+from server.summarize import SUMMARIES
+from server.storage import init_db, list_tasks, LIST_DEFAULT_FIELDS
+from server.export import export as export_rows
+from server.notify import NOTIFIER, set_endpoint, delete_endpoint, get_endpoint
 
 load_dotenv()
 app = FastAPI()
-client = Vapi(token=os.environ["VAPI_API_KEY"])
 
-# ---- Simple vendor directory (add more or skip to ask user for number) ----
-VENDOR_MAP = {
-    "walmart": "+16674190027",
-    # "amazon": "+1...", "best buy": "+1...", etc.
-}
+@app.on_event("startup")
+async def _startup():
+    await init_db()
+
+@app.on_event("shutdown")
+async def _shutdown():
+    await NOTIFIER.close()
 
 # ---- What we need for each goal ----
 GOAL_FIELDS: Dict[str, List[str]] = {
@@ -91,8 +100,8 @@ def next_missing(data: Dict[str, Any]) -> str:
         if not data.get(f):
             return f
     # If vendor has no known number, require target_number
-    v = (data.get("vendor_name") or "").lower()
-    if v and v not in VENDOR_MAP and not data.get("target_number"):
+    v = data.get("vendor_name")
+    if v and not lookup_number(v) and not data.get("target_number"):
         return "target_number"
     # Optional amount for refund
     if goal == "refund" and "amount" not in data:
@@ -134,8 +143,7 @@ def build_call_vars(data: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 def resolve_target_number(data: Dict[str, Any]) -> str:
-    v = (data.get("vendor_name") or "").lower()
-    return data.get("target_number") or VENDOR_MAP.get(v, "")
+    return data.get("target_number") or lookup_number(data.get("vendor_name"))
 
 # ---- API Models ----
 # add/replace your StartBody with:
@@ -198,7 +206,7 @@ def intake_reply(body: ReplyBody):
     if not to_number:
         return {"done": False, "next_field": "target_number", "question": PROMPT["target_number"]}
 
-    resp = client.calls.create({
+    resp = clients.get("vapi").calls.create({
         "assistantId": os.environ["VAPI_ASSISTANT_ID"],
         "phone": {
             "to":   {"number": to_number},
@@ -209,13 +217,92 @@ def intake_reply(body: ReplyBody):
     sess["call_id"] = resp.get("id")
     return {"done": True, "message": "Calling the company now.", "call_id": resp.get("id")}
 
-# ---- Vapi webhook for dynamic transfer (only if rep insists) ----
+# ---- Vapi server messages (transfer requests etc.) share app's dispatcher ----
 @app.post("/vapi/server")
 async def vapi_server(request: Request):
     payload = await request.json()
-    msg = payload.get("message", {})
-    if msg.get("type") == "transfer-destination-request":
-        vars = msg.get("variables") or {}
-        number = vars.get("user_phone") or os.getenv("DEFAULT_USER_PHONE")
-        return {"destination": {"type": "number", "number": number}}
+    return dispatch(parse_event(payload))
+
+# ---- Twilio real-time transcription → running summary (see fsm CONFIRM) ----
+@app.post("/twilio/transcription")
+async def twilio_transcription(request: Request):
+    form = {k: v[0] for k, v in parse_qs((await request.body()).decode()).items()}
+    sid, event = form.get("CallSid"), form.get("TranscriptionEvent")
+    if event == "transcription-content" and form.get("Final", "true") == "true":
+        try:
+            text = json.loads(form.get("TranscriptionData") or "{}").get("transcript", "")
+        except ValueError:
+            text = ""
+        SUMMARIES.feed(sid, form.get("Track", ""), text)
+    elif event in ("transcription-stopped", "transcription-error"):
+        rs = SUMMARIES.get(sid)
+        if rs:
+            rs.ended = True  # run_fsm's CONFIRM stops waiting; it calls SUMMARIES.end itself
+    return {"ok": True}
+
+# ---- Task listing for dashboards (keyset-paginated; pass next_cursor back as cursor) ----
+@app.get("/tasks")
+async def tasks_list(
+    user_id: Optional[str] = None,
+    status: Optional[List[str]] = Query(None),
+    brand: Optional[str] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    fields: Optional[str] = None,
+):
+    try:
+        return await list_tasks(
+            user_id=user_id, status=status, brand=brand,
+            created_from=created_from, created_to=created_to,
+            cursor=cursor, limit=limit,
+            fields=fields.split(",") if fields else list(LIST_DEFAULT_FIELDS),
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Bad cursor")
+
+# ---- Reporting export (streamed; for incremental pulls pass the last row's "updated_at|id") ----
+@app.get("/export/tasks")
+def export_tasks(
+    format: str = "ndjson",
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    since_updated: Optional[str] = None,
+):
+    try:
+        chunks = export_rows(format, created_from=created_from, created_to=created_to, since_updated=since_updated)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    media = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(chunks, media_type=media,
+                             headers={"Content-Disposition": f'attachment; filename="tasks.{format}"'})
+
+# ---- Task notifications: where to push status changes instead of polling /tasks/{id} ----
+class CallbackBody(BaseModel):
+    url: str
+    secret: Optional[str] = None
+
+@app.put("/users/{user_id}/callback")
+def put_callback(user_id: str, body: CallbackBody):
+    if not re.match(r"^https?://", body.url):
+        raise HTTPException(400, "url must be http(s)")
+    set_endpoint(user_id, body.url, body.secret)
+    return {"ok": True, "user_id": user_id, "url": body.url}
+
+@app.get("/users/{user_id}/callback")
+def show_callback(user_id: str):
+    ep = get_endpoint(user_id)
+    if not ep:
+        raise HTTPException(404, "No callback registered")
+    return {"user_id": user_id, "url": ep[0], "signed": bool(ep[1])}
+
+@app.delete("/users/{user_id}/callback")
+def remove_callback(user_id: str):
+    if not delete_endpoint(user_id):
+        raise HTTPException(404, "No callback registered")
     return {"ok": True}
+
+@app.get("/debug/notify")
+def debug_notify():
+    return NOTIFIER.snapshot()
@@ -0,0 +1,223 @@
+# server/maintenance.py
+"""
+Retention and compaction for the call database.
+
+Terminal tasks (and their summaries, calls and messages) whose updated_at is
+older than RETENTION_DAYS are copied into a cold archive database and removed
+from the live one, ARCHIVE_BATCH tasks per short transaction so webhook and
+FSM writers only ever wait on one batch. Transcript lines that belong to no
+task (Vapi calls, see app/transcripts.py) age out the same way. Afterwards the
+freed pages are returned with incremental vacuum and ANALYZE refreshes the
+planner statistics. A database created before auto_vacuum=incremental was
+set (see apply_migrations) gets one full VACUUM that switches it over.
+
+Archiving deletes from the live DB, so the in-app loop is opt-in: set
+MAINTENANCE_INTERVAL_S (seconds between runs) to turn it on.
+
+    python -m server.maintenance --days 90 --archive archive.db
+    python -m server.maintenance --enable-incremental-vacuum   # one-time full VACUUM
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+from server.storage import DB_FILE
+
+RETENTION_DAYS = float(os.getenv("RETENTION_DAYS", "90"))
+ARCHIVE_DB_FILE = os.getenv("ARCHIVE_DB_FILE", "archive.db")
+ARCHIVE_BATCH = int(os.getenv("ARCHIVE_BATCH", "200"))
+VACUUM_PAGES = int(os.getenv("VACUUM_PAGES", "2000"))
+MAINTENANCE_INTERVAL_S = float(os.getenv("MAINTENANCE_INTERVAL_S", "0"))  # 0 (default): no in-app loop
+
+TERMINAL_STATUSES = ("resolved", "failed", "unresolved", "denied")
+
+# child tables, keyed by the task id column
+_CHILDREN = (("summaries", "task_id"), ("calls", "task_id"), ("messages", "task_id"))
+
+
+def _ts(epoch: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(epoch))
+
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str) -> List[str]:
+    return [r[1] for r in conn.execute(f"pragma {schema}.table_info({table})")]
+
+
+def _ensure_archive_table(conn: sqlite3.Connection, table: str) -> List[str]:
+    """Mirror main.<table> into archive.<table>; returns the columns both have."""
+    if not _columns(conn, "archive", table):
+        (sql,) = conn.execute("select sql from main.sqlite_master where type='table' and name=?", (table,)).fetchone()
+        sql = re.sub(r"(?is)^\s*create\s+table\s+(if\s+not\s+exists\s+)?\S+", f"create table if not exists archive.{table}", sql)
+        conn.execute(sql)
+    main_cols = _columns(conn, "main", table)
+    arch_cols = _columns(conn, "archive", table)
+    for c in main_cols:
+        if c not in arch_cols:  # live table grew a column since the archive was created
+            conn.execute(f"alter table archive.{table} add column {c}")
+    return main_cols
+
+
+def _move(conn: sqlite3.Connection, table: str, cols: List[str], where: str, params: List[Any]) -> int:
+    collist = ",".join(cols)
+    conn.execute(f"insert or replace into archive.{table}({collist}) select {collist} from main.{table} where {where}", params)
+    return conn.execute(f"delete from main.{table} where {where}", params).rowcount
+
+
+def archive_old(
+    conn: sqlite3.Connection,
+    cutoff: str,
+    batch: int = ARCHIVE_BATCH,
+    pause_s: float = 0.05,
+) -> Dict[str, int]:
+    """Move terminal tasks last updated before `cutoff` (and their rows) to the archive."""
+    moved = {"tasks": 0, "summaries": 0, "calls": 0, "messages": 0, "batches": 0}
+    tables = ["tasks"] + [t for t, _ in _CHILDREN]
+    cols = {t: _ensure_archive_table(conn, t) for t in tables}
+    conn.commit()
+    statuses = ",".join("?" * len(TERMINAL_STATUSES))
+
+    while True:
+        ids = [r[0] for r in conn.execute(
+            f"select id from tasks where status in ({statuses}) and updated_at < ? limit ?",
+            (*TERMINAL_STATUSES, cutoff, batch),
+        )]
+        if not ids:
+            break
+        marks = ",".join("?" * len(ids))
+        conn.execute("begin immediate")
+        try:
+            for table, key in _CHILDREN:
+                moved[table] += _move(conn, table, cols[table], f"{key} in ({marks})", ids)
+            moved["tasks"] += _move(conn, "tasks", cols["tasks"], f"id in ({marks})", ids)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        moved["batches"] += 1
+        time.sleep(pause_s)  # let queued writers in between batches
+
+    # transcript lines from calls with no task (Vapi intake), oldest first
+    while True:
+        conn.execute("begin immediate")
+        try:
+            n = _move(conn, "messages", cols["messages"],
+                      "id in (select id from main.messages where task_id is null and ts < ? order by ts limit ?)",
+                      [cutoff, batch])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        moved["messages"] += n
+        if n < batch:
+            break
+        moved["batches"] += 1
+        time.sleep(pause_s)
+    return moved
+
+
+def compact(conn: sqlite3.Connection, pages: int = VACUUM_PAGES) -> Dict[str, Any]:
+    """
+    Return free pages to the OS in small steps (auto_vacuum=incremental). A DB
+    still in another mode is switched over with one full VACUUM (conn must be in
+    autocommit mode), after which every run is incremental.
+    """
+    mode = conn.execute("pragma auto_vacuum").fetchone()[0]
+    free_before = conn.execute("pragma freelist_count").fetchone()[0]
+    if mode != 2:
+        if not free_before:
+            return {"auto_vacuum": mode, "free_pages": 0, "freed_pages": 0}
+        conn.execute("pragma auto_vacuum=incremental")
+        conn.execute("vacuum")
+        free = conn.execute("pragma freelist_count").fetchone()[0]
+        return {"auto_vacuum": conn.execute("pragma auto_vacuum").fetchone()[0], "free_pages": free,
+                "freed_pages": free_before - free, "full_vacuum": True}
+    free = free_before
+    while free > 0:
+        conn.execute(f"pragma incremental_vacuum({pages})").fetchall()
+        left = conn.execute("pragma freelist_count").fetchone()[0]
+        if left >= free:
+            break
+        free = left
+    return {"auto_vacuum": mode, "free_pages": free, "freed_pages": free_before - free}
+
+
+def enable_incremental_vacuum(db_file: str = DB_FILE):
+    """One-time switch to auto_vacuum=incremental (a full VACUUM; locks the DB while it runs)."""
+    conn = sqlite3.connect(db_file)
+    try:
+        conn.execute("pragma auto_vacuum=incremental")
+        conn.execute("vacuum")
+    finally:
+        conn.close()
+
+
+def run_maintenance(
+    db_file: str = DB_FILE,
+    archive_file: str = ARCHIVE_DB_FILE,
+    days: float = RETENTION_DAYS,
+    batch: int = ARCHIVE_BATCH,
+) -> Dict[str, Any]:
+    cutoff = _ts(time.time() - days * 86400)
+    report: Dict[str, Any] = {"cutoff": cutoff, "archive": archive_file, "timings_s": {}}
+    size_before = os.path.getsize(db_file) if os.path.exists(db_file) else 0
+    conn = sqlite3.connect(db_file, isolation_level=None, timeout=30)
+    try:
+        conn.execute("attach database ? as archive", (archive_file,))
+        t = time.perf_counter()
+        report["moved"] = archive_old(conn, cutoff, batch)
+        report["timings_s"]["archive"] = round(time.perf_counter() - t, 3)
+        conn.execute("detach database archive")
+
+        t = time.perf_counter()
+        report["vacuum"] = compact(conn)
+        report["timings_s"]["vacuum"] = round(time.perf_counter() - t, 3)
+
+        t = time.perf_counter()
+        conn.execute("analyze")
+        report["timings_s"]["analyze"] = round(time.perf_counter() - t, 3)
+    finally:
+        conn.close()
+    report["db_bytes"] = {"before": size_before, "after": os.path.getsize(db_file)}
+    report["timings_s"]["total"] = round(sum(report["timings_s"].values()), 3)
+    m = report["moved"]
+    print(f"[maintenance] archived {m['tasks']} tasks, {m['summaries']} summaries, {m['calls']} calls, "
+          f"{m['messages']} messages in {report['timings_s']['total']}s "
+          f"(freed {report['vacuum']['freed_pages']} pages)")
+    return report
+
+
+async def maintenance_loop(interval_s: float = MAINTENANCE_INTERVAL_S, first_delay_s: float = 60.0):
+    """Run maintenance off the event loop every interval_s (started from app startup; opt-in)."""
+    if interval_s <= 0:
+        return
+    await asyncio.sleep(first_delay_s)
+    while True:
+        try:
+            await asyncio.to_thread(run_maintenance)
+        except Exception as e:  # one bad run must not stop retention for good
+            print(f"[maintenance] failed: {type(e).__name__}: {e}")
+        await asyncio.sleep(interval_s)
+
+
+# ----------------- CLI -----------------
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Archive old terminal tasks, vacuum and analyze the call DB")
+    ap.add_argument("--db", default=DB_FILE)
+    ap.add_argument("--archive", default=ARCHIVE_DB_FILE)
+    ap.add_argument("--days", type=float, default=RETENTION_DAYS, help="archive terminal tasks idle this long")
+    ap.add_argument("--batch", type=int, default=ARCHIVE_BATCH, help="tasks per delete transaction")
+    ap.add_argument("--enable-incremental-vacuum", action="store_true",
+                    help="switch the DB to auto_vacuum=incremental first (one full VACUUM)")
+    args = ap.parse_args(argv)
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum(args.db)
+    print(json.dumps(run_maintenance(args.db, args.archive, args.days, args.batch), indent=2))
+
+
+if __name__ == "__main__":
+    main()
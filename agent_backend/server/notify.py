@@ -0,0 +1,249 @@
+# server/notify.py
+"""
+Task notifications: push status changes to the task owner instead of making
+clients poll GET /tasks/{id}.
+
+run_fsm publishes every status change with NOTIFIER.publish(), which only does
+a put_nowait on a bounded queue, so the FSM never waits on delivery (a full
+queue drops the event and counts it). One worker coalesces the changes per
+task over NOTIFY_COALESCE_S (a task going calling → resolved inside the window
+is one event carrying both statuses), then groups what is due by destination
+and hands each destination one batch. Deliveries retry with exponential
+backoff in their own tasks, one in flight per destination so batches arrive
+in order.
+
+Destinations:
+  - the user's webhook from notify_endpoints (PUT /users/{user_id}/callback)
+  - NOTIFY_FILE: NDJSON lines appended locally (tests, log shipping)
+
+Terminal events carry the saved summary, so the callback is the whole answer.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from app import clients
+from server.storage import DB_FILE, get_summary
+
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "1000"))
+NOTIFY_COALESCE_S = float(os.getenv("NOTIFY_COALESCE_S", "2.0"))
+NOTIFY_BATCH_MAX = int(os.getenv("NOTIFY_BATCH_MAX", "50"))
+NOTIFY_RETRIES = int(os.getenv("NOTIFY_RETRIES", "5"))
+NOTIFY_BACKOFF_S = float(os.getenv("NOTIFY_BACKOFF_S", "1.0"))   # doubles per attempt
+NOTIFY_FILE = os.getenv("NOTIFY_FILE", "")
+ENDPOINT_CACHE_S = 60.0
+
+TERMINAL_STATUSES = ("resolved", "failed", "unresolved", "denied", "needs_info")
+
+
+# ----------------- per-user endpoints -----------------
+
+def set_endpoint(user_id: str, url: str, secret: Optional[str] = None, db_file: str = DB_FILE):
+    conn = sqlite3.connect(db_file)
+    conn.execute("""insert into notify_endpoints(user_id,url,secret) values(?,?,?)
+                    on conflict(user_id) do update set url=excluded.url, secret=excluded.secret,
+                    updated_at=CURRENT_TIMESTAMP""", (user_id, url, secret))
+    conn.commit(); conn.close()
+    NOTIFIER.forget_endpoint(user_id)
+
+
+def delete_endpoint(user_id: str, db_file: str = DB_FILE) -> bool:
+    conn = sqlite3.connect(db_file)
+    n = conn.execute("delete from notify_endpoints where user_id=?", (user_id,)).rowcount
+    conn.commit(); conn.close()
+    NOTIFIER.forget_endpoint(user_id)
+    return n > 0
+
+
+def get_endpoint(user_id: str, db_file: str = DB_FILE) -> Optional[Tuple[str, Optional[str]]]:
+    conn = sqlite3.connect(db_file)
+    try:
+        row = conn.execute("select url, secret from notify_endpoints where user_id=?", (user_id,)).fetchone()
+    except sqlite3.OperationalError:
+        row = None  # migration 006 not applied yet
+    conn.close()
+    return (row[0], row[1]) if row else None
+
+
+# ----------------- sinks -----------------
+
+class WebhookSink:
+    def __init__(self, url: str, secret: Optional[str] = None):
+        self.key = "webhook:" + url
+        self.url, self.secret = url, secret
+
+    async def deliver(self, events: List[Dict[str, Any]]):
+        body = json.dumps({"events": events}).encode()
+        headers = {"Content-Type": "application/json"}
+        if self.secret:
+            sig = hmac.new(self.secret.encode(), body, hashlib.sha256).hexdigest()
+            headers["X-Notify-Signature"] = "sha256=" + sig
+        r = await clients.get("ahttp").post(self.url, content=body, headers=headers)
+        r.raise_for_status()
+
+
+class FileSink:
+    def __init__(self, path: str):
+        self.key = "file:" + path
+        self.path = path
+
+    async def deliver(self, events: List[Dict[str, Any]]):
+        lines = "".join(json.dumps(e) + "\n" for e in events)
+
+        def write():
+            with open(self.path, "a") as f:
+                f.write(lines)
+        await asyncio.to_thread(write)
+
+
+# ----------------- notifier -----------------
+
+class Notifier:
+    def __init__(self, maxsize: int = NOTIFY_QUEUE_SIZE, window: float = NOTIFY_COALESCE_S,
+                 file_path: str = NOTIFY_FILE):
+        self.maxsize, self.window, self.file_path = maxsize, window, file_path
+        self.queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # task_id → coalesced event
+        self._outbox: Dict[str, List[Dict[str, Any]]] = {}                 # sink key → waiting events
+        self._sinks: Dict[str, Any] = {}
+        self._sending: Dict[str, asyncio.Task] = {}                        # sink key → delivery task
+        self._endpoints: Dict[str, Tuple[float, Optional[Tuple[str, Optional[str]]]]] = {}
+        self._endpoints_version = 0  # bumped by forget_endpoint; a racing lookup is not cached
+        self.stats = {"published": 0, "dropped": 0, "coalesced": 0, "delivered": 0, "retries": 0, "failed": 0}
+
+    def _start(self):
+        if self.queue is None:
+            self.queue = asyncio.Queue(self.maxsize)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    def publish(self, task_id: str, status: str, user_id: Optional[str] = None, **extra):
+        """Queue a status change (never blocks; call from the event loop)."""
+        self._start()
+        ev = {"task_id": task_id, "status": status, "user_id": user_id, "at": time.time(), **extra}
+        try:
+            self.queue.put_nowait(ev)
+            self.stats["published"] += 1
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            print(f"[notify] queue full, dropped {status} for task {task_id}")
+
+    def forget_endpoint(self, user_id: str):
+        self._endpoints_version += 1
+        self._endpoints.pop(user_id, None)
+
+    # ---- worker ----
+
+    async def _run(self):
+        while True:
+            timeout = None
+            if self._pending:
+                first = next(iter(self._pending.values()))
+                timeout = max(0.0, first["first_at"] + self.window - time.monotonic())
+            try:
+                ev = await asyncio.wait_for(self.queue.get(), timeout)
+                self._coalesce(ev)
+            except asyncio.TimeoutError:
+                pass
+            await self._flush_due()
+
+    def _coalesce(self, ev: Dict[str, Any]):
+        cur = self._pending.get(ev["task_id"])
+        if cur is None:
+            self._pending[ev["task_id"]] = dict(ev, statuses=[ev["status"]], first_at=time.monotonic())
+            return
+        self.stats["coalesced"] += 1
+        statuses = cur["statuses"] + [ev["status"]]
+        cur.update(ev)
+        cur["statuses"] = statuses
+        cur["user_id"] = ev.get("user_id") or cur.get("user_id")
+
+    async def _flush_due(self, force: bool = False):
+        now = time.monotonic()
+        due = [tid for tid, ev in self._pending.items() if force or now - ev["first_at"] >= self.window]
+        for tid in due:
+            ev = self._pending.pop(tid)
+            ev.pop("first_at", None)
+            if ev["status"] in TERMINAL_STATUSES and "summary" not in ev:
+                try:
+                    ev["summary"] = await get_summary(tid) or None
+                except sqlite3.Error:
+                    ev["summary"] = None
+            for sink in await self._destinations(ev.get("user_id")):
+                self._sinks[sink.key] = sink
+                self._outbox.setdefault(sink.key, []).append(ev)
+        for key in list(self._outbox):
+            if self._outbox[key] and key not in self._sending:
+                self._sending[key] = asyncio.create_task(self._drain(key))
+
+    async def _destinations(self, user_id: Optional[str]) -> List[Any]:
+        out: List[Any] = []
+        if self.file_path:
+            out.append(FileSink(self.file_path))
+        if user_id:
+            cached = self._endpoints.get(user_id)
+            if cached is None or time.monotonic() - cached[0] > ENDPOINT_CACHE_S:
+                version = self._endpoints_version
+                cached = (time.monotonic(), await asyncio.to_thread(get_endpoint, user_id))  # sqlite: off the loop
+                if version == self._endpoints_version:
+                    self._endpoints[user_id] = cached
+            if cached[1]:
+                out.append(WebhookSink(*cached[1]))
+        return out
+
+    async def _drain(self, key: str):
+        """Send this destination's waiting events, NOTIFY_BATCH_MAX at a time, until none are left."""
+        try:
+            while self._outbox.get(key):
+                batch = self._outbox[key][:NOTIFY_BATCH_MAX]
+                del self._outbox[key][:len(batch)]
+                await self._deliver(self._sinks[key], batch)
+        finally:
+            self._sending.pop(key, None)
+            if not self._outbox.get(key):
+                self._outbox.pop(key, None)
+
+    async def _deliver(self, sink: Any, batch: List[Dict[str, Any]]):
+        delay = NOTIFY_BACKOFF_S
+        for attempt in range(NOTIFY_RETRIES + 1):
+            try:
+                await sink.deliver(batch)
+                self.stats["delivered"] += len(batch)
+                return
+            except Exception as e:
+                if attempt == NOTIFY_RETRIES:
+                    self.stats["failed"] += len(batch)
+                    print(f"[notify] giving up on {sink.key} ({len(batch)} events): {e}")
+                    return
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+                delay *= 2
+
+    async def close(self, timeout: float = 5.0):
+        """Flush everything queued or pending (shutdown); deliveries get `timeout` seconds."""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        while self.queue and not self.queue.empty():
+            self._coalesce(self.queue.get_nowait())
+        await self._flush_due(force=True)
+        if self._sending:
+            await asyncio.wait(list(self._sending.values()), timeout=timeout)
+        self._worker = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "queued": self.queue.qsize() if self.queue else 0,
+            "pending_tasks": len(self._pending),
+            "waiting": {k: len(v) for k, v in self._outbox.items()},
+        }
+
+
+NOTIFIER = Notifier()
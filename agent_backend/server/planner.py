@@ -0,0 +1,211 @@
+# server/planner.py
+"""
+Local call planner: the same plan shape the RAG service's /plan returns
+(opening, ivr_keywords, negotiation_ladder, confirmation_checklist, ...),
+rendered from per-goal/per-brand templates in data/plan_templates.json.
+
+Templates are compiled once. A text line is a sentence with {fields}; a line
+given as a list is a set of alternatives where the first one whose fields are
+all present wins; a line whose fields are missing is dropped. Rendered plans
+are memoized by (template id, fingerprint of the fields that template uses).
+"""
+import copy
+import hashlib
+import json
+import os
+import string
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Union
+from app.vendor_directory import vendor_key
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+PLAN_TEMPLATES_FILE = os.getenv("PLAN_TEMPLATES_FILE", os.path.join(_DATA_DIR, "plan_templates.json"))
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "1024"))
+
+# What users/apps write → the goal templates are keyed on
+GOAL_ALIASES = {
+    "return": "refund", "retail_return": "refund", "refund": "refund",
+    "exchange": "replacement", "replace": "replacement", "replacement": "replacement",
+    "question": "query", "generic_query": "query", "query": "query",
+}
+
+_FORMATTER = string.Formatter()
+
+
+class _Line:
+    """One sentence: literal/field pieces parsed once, rendered only if every field has a value."""
+
+    def __init__(self, text: str):
+        self.pieces: List[Tuple[str, Optional[str]]] = [
+            (lit, field) for lit, field, _, _ in _FORMATTER.parse(text)
+        ]
+        self.fields = {f for _, f in self.pieces if f}
+
+    def render(self, v: Dict[str, str]) -> Optional[str]:
+        if any(not v.get(f) for f in self.fields):
+            return None
+        return "".join(lit + (v[f] if f else "") for lit, f in self.pieces)
+
+
+class _Choice:
+    def __init__(self, options: List[str]):
+        self.options = [_Line(o) for o in options]
+        self.fields = set().union(*(o.fields for o in self.options))
+
+    def render(self, v: Dict[str, str]) -> Optional[str]:
+        return next((r for r in (o.render(v) for o in self.options) if r), None)
+
+
+def _compile_lines(lines: List[Union[str, List[str]]]) -> List[Union[_Line, _Choice]]:
+    return [_Choice(l) if isinstance(l, list) else _Line(l) for l in lines]
+
+
+class PlanTemplate:
+    def __init__(self, spec: Dict[str, Any]):
+        self.id = spec["id"]
+        self.goal = spec.get("goal", "*")
+        self.brand = vendor_key(spec["brand"]) if spec.get("brand", "*") != "*" else "*"
+        self.opening = _compile_lines(spec.get("opening") or [])
+        self.ladder = _compile_lines(spec.get("negotiation_ladder") or [])
+        self.ivr_keywords = list(spec.get("ivr_keywords") or [])
+        self.checklist = list(spec.get("confirmation_checklist") or [])
+        self.requires = list(spec.get("requires") or [])
+        # only these brief fields can change the rendered plan (the memo key)
+        self.fields = sorted(set(self.requires).union(*(l.fields for l in self.opening + self.ladder)))
+
+    def render(self, v: Dict[str, str]) -> Dict[str, Any]:
+        opening = " ".join(r for r in (l.render(v) for l in self.opening) if r)
+        ladder = [r for r in (l.render(v) for l in self.ladder) if r]
+        return {
+            "opening": opening,
+            "citations": [],
+            "ivr_keywords": list(self.ivr_keywords),
+            "negotiation_ladder": ladder,
+            "confirmation_checklist": list(self.checklist),
+            "risk_flags": [f"missing:{f}" for f in self.requires if not v.get(f)],
+            "template": self.id,
+            "source": "local",
+        }
+
+
+# ----------------- templates (loaded once) -----------------
+
+_TEMPLATES: Optional[Dict[Tuple[str, str], PlanTemplate]] = None
+_LOAD_LOCK = threading.Lock()
+
+
+def load_templates(path: str = PLAN_TEMPLATES_FILE) -> Dict[Tuple[str, str], PlanTemplate]:
+    with open(path) as f:
+        specs = json.load(f)
+    out = {}
+    for spec in specs:
+        t = PlanTemplate(spec)
+        out[(t.goal, t.brand)] = t
+    return out
+
+
+def templates() -> Dict[Tuple[str, str], PlanTemplate]:
+    global _TEMPLATES
+    if _TEMPLATES is None:
+        with _LOAD_LOCK:
+            if _TEMPLATES is None:
+                _TEMPLATES = load_templates()
+    return _TEMPLATES
+
+
+def pick_template(goal: Optional[str], brand: Optional[str]) -> Optional[PlanTemplate]:
+    g = GOAL_ALIASES.get((goal or "").lower().strip(), (goal or "").lower().strip())
+    b = vendor_key(brand) if brand else ""
+    t = templates()
+    for key in ((g, b), (g, "*"), ("*", b), ("*", "*")):
+        if key in t:
+            return t[key]
+    return None
+
+
+# ----------------- brief → template variables -----------------
+
+def _text(v: Any) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, float):
+        return f"{v:.2f}"
+    return str(v).strip()
+
+
+def brief_vars(brief: Dict[str, Any]) -> Dict[str, str]:
+    """Flat {field: text}: top-level brief fields, then identifiers, then auth."""
+    v: Dict[str, str] = {}
+    for k in ("brand", "goal", "reason", "desired_outcome"):
+        v[k] = _text(brief.get(k))
+    v["department"] = _text(brief.get("department_hint"))
+    for k, val in (brief.get("identifiers") or {}).items():
+        v.setdefault(k, _text(val))
+    for k, val in (brief.get("auth") or {}).items():
+        v.setdefault(k, _text(val))
+    if not v.get("amount"):
+        v["amount"] = _text((brief.get("identifiers") or {}).get("bill_amount"))
+    return v
+
+
+def _citations(context: Optional[Dict[str, Any]], limit: int = 3) -> List[Dict[str, str]]:
+    """Cite the retrieved policy chunks (RETRIEVE output) the plan leans on."""
+    out = []
+    for c in ((context or {}).get("selected_chunks") or [])[:limit]:
+        if isinstance(c, dict):
+            out.append({
+                "source": str(c.get("source") or c.get("doc_id") or ""),
+                "title": str(c.get("title") or ""),
+                "snippet": str(c.get("text") or "")[:200],
+            })
+    return out
+
+
+# ----------------- memoized rendering -----------------
+
+_MEMO: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+_MEMO_LOCK = threading.Lock()
+STATS = {"hits": 0, "misses": 0}
+
+
+def fingerprint(t: PlanTemplate, v: Dict[str, str]) -> str:
+    used = {f: v.get(f, "") for f in t.fields}
+    return hashlib.sha1(json.dumps(used, sort_keys=True).encode()).hexdigest()
+
+
+def local_plan(brief: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Render the plan for a brief (None if no template applies)."""
+    t = pick_template(brief.get("goal"), brief.get("brand"))
+    if t is None:
+        return None
+    v = brief_vars(brief)
+    key = (t.id, fingerprint(t, v))
+    with _MEMO_LOCK:
+        plan = _MEMO.get(key)
+        if plan is not None:
+            _MEMO.move_to_end(key)
+            STATS["hits"] += 1
+    if plan is None:
+        plan = t.render(v)
+        with _MEMO_LOCK:
+            STATS["misses"] += 1
+            _MEMO[key] = plan
+            while len(_MEMO) > PLAN_CACHE_SIZE:
+                _MEMO.popitem(last=False)
+    plan = copy.deepcopy(plan)  # callers (run_fsm) own and may mutate their plan
+    plan["citations"] = _citations(context)
+    return plan
+
+
+def enrich(plan: Dict[str, Any], remote: Dict[str, Any]) -> Dict[str, Any]:
+    """Fold a remote /plan answer into the local one: its citations and flags, extra keywords and rungs."""
+    if not remote:
+        return plan
+    out = dict(plan)
+    out["citations"] = (remote.get("citations") or []) + plan.get("citations", [])
+    for k in ("ivr_keywords", "negotiation_ladder", "confirmation_checklist", "risk_flags"):
+        seen = list(plan.get(k) or [])
+        out[k] = seen + [x for x in (remote.get(k) or []) if x not in seen]
+    out["source"] = "local+remote"
+    return out
@@ -1,18 +1,23 @@
 # app/rag_client.py
 import os
-import httpx
+from app.tracing import span, KIND_CLIENT
 
 BASE = os.getenv("RAG_SERVICE_URL", "http://localhost:8001")
 
-async def _post(path: str, payload: dict) -> dict:
-    """POST helper with graceful fallback if Person B's service is down."""
+async def _post(path: str, payload: dict, fallback: bool = True) -> dict:
+    """POST helper with graceful fallback if Person B's service is down ({} if fallback=False)."""
     url = f"{BASE}{path}"
     try:
-        async with httpx.AsyncClient(timeout=5.0) as c:
-            r = await c.post(url, json=payload)
-            r.raise_for_status()
-            return r.json()
+        import httpx  # deferred: only the FSM path talks to the RAG service
+        with span(f"rag POST {path}", KIND_CLIENT, url=url) as sp:
+            async with httpx.AsyncClient(timeout=5.0) as c:
+                r = await c.post(url, json=payload)
+                sp.set(http_status=r.status_code)
+                r.raise_for_status()
+                return r.json()
     except Exception:
+        if not fallback:
+            return {}
         # Fallbacks so your FSM can still run the demo with the TwiML mock.
         if path == "/check_missing":
             return {"status": "ready", "missing_fields": [], "call_reason_summary": "Proceed with call."}
@@ -60,6 +65,6 @@ async def retrieve_context(brief: dict) -> dict:
     """Person B endpoint: return policy context/call_brief."""
     return await _post("/retrieve", {"brief": brief})
 
-async def make_plan(brief: dict, call_brief: dict) -> dict:
+async def make_plan(brief: dict, call_brief: dict, fallback: bool = True) -> dict:
     """Person B endpoint: produce opening line, IVR keywords, ladder, checklist."""
-    return await _post("/plan", {"brief": brief, "call_brief": call_brief})
+    return await _post("/plan", {"brief": brief, "call_brief": call_brief}, fallback)
@@ -0,0 +1,234 @@
+# server/retrieval.py
+"""
+In-process policy retrieval: BM25 (plus optional hashed dense vectors) over
+vendor policy sections from data/policies.json, answering in the same shape as
+rag_client.retrieve_context so it can front or replace the remote /retrieve.
+
+The index is a directory of .npy arrays opened with mmap_mode="r", so loading
+is a few page mappings. Terms are feature-hashed into N_BUCKETS, which means
+there's no vocabulary to load either:
+  ptr.npy     int32[N_BUCKETS+1]  posting range per term bucket (CSR)
+  post.npy    int32[nnz]          chunk ids
+  weight.npy  float32[nnz]        precomputed BM25 term weight for that chunk
+  vendor.npy  int32[n_chunks]     vendor id per chunk (0 = applies to all vendors)
+  dense.npy   float32[n_chunks, DENSE_DIM]  L2-normalised hashed trigram vectors
+  meta.json   chunk text/titles and vendor names
+"""
+import json
+import os
+import re
+import threading
+import zlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from app.vendor_directory import vendor_key
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+POLICY_FILE = os.getenv("POLICY_FILE", os.path.join(_DATA_DIR, "policies.json"))
+POLICY_INDEX_DIR = os.getenv("POLICY_INDEX_DIR", os.path.join(_DATA_DIR, "policy_index"))
+
+N_BUCKETS = 1 << 18
+DENSE_DIM = 256
+K1, B = 1.2, 0.75
+VENDOR_BOOST = 1.5   # chunks from the brief's own vendor outrank generic ones
+DENSE_WEIGHT = 0.3
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOP = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "for", "from", "i", "in", "is", "it",
+    "my", "of", "on", "or", "our", "the", "this", "to", "was", "we", "with", "you", "your",
+}
+
+# Query expansion per goal: what the policy text says when a brief asks for X
+GOAL_TERMS = {
+    "refund": "refund return window original payment method business days label",
+    "return": "return window refund label receipt",
+    "replacement": "replacement defective damaged replace in stock warranty",
+    "query": "customer care case number",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    out = []
+    for w in _WORD.findall((text or "").lower()):
+        if w in _STOP:
+            continue
+        if len(w) > 3 and w.endswith("s") and not w.endswith("ss"):
+            w = w[:-1]  # cheap plural folding: "refunds" → "refund"
+        out.append(w)
+    return out
+
+
+def _bucket(term: str) -> int:
+    return zlib.crc32(term.encode()) % N_BUCKETS
+
+
+def _dense(text: str) -> np.ndarray:
+    v = np.zeros(DENSE_DIM, dtype=np.float32)
+    for w in tokenize(text):
+        padded = f" {w} "
+        for i in range(len(padded) - 2):
+            h = zlib.crc32(padded[i:i + 3].encode())
+            v[h % DENSE_DIM] += 1.0 if (h >> 16) & 1 else -1.0
+    n = np.linalg.norm(v)
+    return v / n if n else v
+
+
+# ----------------- build -----------------
+
+def build_index(docs: List[Dict[str, Any]], out_dir: str) -> None:
+    chunks: List[Dict[str, Any]] = []
+    vendors = ["*"]
+    for d in docs:
+        vkey = "*" if d.get("vendor", "*") == "*" else vendor_key(d["vendor"])
+        if vkey not in vendors:
+            vendors.append(vkey)
+        for i, text in enumerate(d.get("sections") or []):
+            chunks.append({
+                "chunk_id": f"{d['doc_id']}#{i}",
+                "doc_id": d["doc_id"],
+                "title": d.get("title", ""),
+                "source": d.get("url") or d["doc_id"],
+                "vendor": vkey,
+                "requires": d.get("requires") or [],
+                "text": text,
+            })
+    n = len(chunks)
+    toks = [tokenize(c["title"] + " " + c["text"]) for c in chunks]
+    lens = np.array([len(t) for t in toks], dtype=np.float32)
+    avgdl = float(lens.mean()) if n else 1.0
+
+    postings: Dict[int, Dict[int, int]] = {}
+    for ci, ts in enumerate(toks):
+        for t in ts:
+            tf = postings.setdefault(_bucket(t), {})
+            tf[ci] = tf.get(ci, 0) + 1
+
+    ptr = np.zeros(N_BUCKETS + 1, dtype=np.int32)
+    for b, tf in postings.items():
+        ptr[b + 1] = len(tf)
+    np.cumsum(ptr, out=ptr)
+    post = np.zeros(ptr[-1], dtype=np.int32)
+    weight = np.zeros(ptr[-1], dtype=np.float32)
+    for b, tf in postings.items():
+        df = len(tf)
+        idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+        docs_ = np.fromiter(tf.keys(), dtype=np.int32, count=df)
+        f = np.fromiter(tf.values(), dtype=np.float32, count=df)
+        post[ptr[b]:ptr[b + 1]] = docs_
+        weight[ptr[b]:ptr[b + 1]] = idf * f * (K1 + 1) / (f + K1 * (1 - B + B * lens[docs_] / avgdl))
+
+    dense = np.stack([_dense(c["title"] + " " + c["text"]) for c in chunks]) if n else np.zeros((0, DENSE_DIM), np.float32)
+    vendor = np.array([vendors.index(c["vendor"]) for c in chunks], dtype=np.int32)
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name, arr in (("ptr", ptr), ("post", post), ("weight", weight), ("vendor", vendor), ("dense", dense)):
+        np.save(os.path.join(out_dir, name + ".npy"), arr)
+    with open(os.path.join(out_dir, "meta.json.tmp"), "w") as f:
+        json.dump({"chunks": chunks, "vendors": vendors, "avgdl": avgdl}, f)
+    os.replace(os.path.join(out_dir, "meta.json.tmp"), os.path.join(out_dir, "meta.json"))
+
+
+# ----------------- query -----------------
+
+class PolicyIndex:
+    def __init__(self, index_dir: str):
+        def load(name):
+            # plain ndarray view over the mapping: np.memmap slicing carries per-call overhead
+            return np.asarray(np.load(os.path.join(index_dir, name + ".npy"), mmap_mode="r"))
+        self.ptr, self.post, self.weight = load("ptr"), load("post"), load("weight")
+        self.vendor, self.dense = load("vendor"), load("dense")
+        with open(os.path.join(index_dir, "meta.json")) as f:
+            meta = json.load(f)
+        self.chunks: List[Dict[str, Any]] = meta["chunks"]
+        self.vendor_ids = {v: i for i, v in enumerate(meta["vendors"])}
+        self._generic = self.vendor == 0
+        self._vid: Dict[str, Optional[int]] = {}  # raw brand → vendor id (directory lookups are slow-ish)
+
+    def _vendor_id(self, vendor: Optional[str]) -> Optional[int]:
+        if not vendor:
+            return None
+        if vendor not in self._vid:
+            self._vid[vendor] = self.vendor_ids.get(vendor_key(vendor))
+        return self._vid[vendor]
+
+    def search(self, query: str, vendor: Optional[str] = None, k: int = 4, dense: bool = False) -> List[Dict[str, Any]]:
+        n = len(self.chunks)
+        if not n:
+            return []
+        scores = np.zeros(n, dtype=np.float32)
+        for b in {_bucket(t) for t in tokenize(query)}:
+            lo, hi = self.ptr[b], self.ptr[b + 1]
+            if hi > lo:
+                scores[self.post[lo:hi]] += self.weight[lo:hi]  # chunk ids are unique per bucket
+        if dense:
+            top = scores.max()
+            scores += DENSE_WEIGHT * (top if top > 0 else 1.0) * (self.dense @ _dense(query))
+        vid = self._vendor_id(vendor)
+        if vid is not None:
+            own = self.vendor == vid
+            scores[own] *= VENDOR_BOOST
+            scores[~(own | self._generic)] = 0.0
+        else:
+            scores[~self._generic] = 0.0  # never cite another retailer's policy
+        k = min(k, n)
+        idx = np.argpartition(-scores, k - 1)[:k]
+        idx = idx[np.argsort(-scores[idx])]
+        return [dict(self.chunks[i], score=round(float(scores[i]), 4)) for i in idx if scores[i] > 0]
+
+
+_INDEX: Optional[PolicyIndex] = None
+_INDEX_LOCK = threading.Lock()
+
+
+def policy_index(src: str = POLICY_FILE, index_dir: str = POLICY_INDEX_DIR) -> Optional[PolicyIndex]:
+    """Open (building first if policies.json is newer than the index) the shared index."""
+    global _INDEX
+    if _INDEX is not None:
+        return _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is not None:
+            return _INDEX
+        meta = os.path.join(index_dir, "meta.json")
+        if os.path.exists(src) and (not os.path.exists(meta) or os.path.getmtime(meta) < os.path.getmtime(src)):
+            with open(src) as f:
+                build_index(json.load(f), index_dir)
+        if not os.path.exists(meta):
+            print(f"[retrieval] no policy corpus at {src}")
+            return None
+        _INDEX = PolicyIndex(index_dir)
+        return _INDEX
+
+
+def brief_query(brief: Dict[str, Any]) -> str:
+    goal = (brief.get("goal") or "").lower()
+    parts = [goal, GOAL_TERMS.get(goal, ""), brief.get("reason") or "", brief.get("department_hint") or "",
+             brief.get("desired_outcome") or ""]
+    return " ".join(p for p in parts if p)
+
+
+def local_retrieve(brief: Dict[str, Any], k: int = 4, dense: bool = False) -> Optional[Dict[str, Any]]:
+    """retrieve_context()-shaped answer from the local index (None if there's no index)."""
+    idx = policy_index()
+    if idx is None:
+        return None
+    chunks = idx.search(brief_query(brief), vendor=brief.get("brand"), k=k, dense=dense)
+    required = list((brief.get("identifiers") or {}).keys())
+    for c in chunks:
+        required += [r for r in c.get("requires") or [] if r not in required]
+    return {
+        "status": "ok",
+        "selected_chunks": chunks,
+        "call_brief": {
+            "key_points": [c["text"] for c in chunks],
+            "required_identifiers": required,
+            "agents_notes": "Policy: " + "; ".join(dict.fromkeys(c["title"] for c in chunks)) if chunks else "",
+        },
+        "source": "local",
+    }
+
+
+def has_vendor_policy(ctx: Dict[str, Any]) -> bool:
+    """True if the answer cites the brief's own vendor, not just the generic docs."""
+    return any(c.get("vendor") not in (None, "*") for c in ctx.get("selected_chunks") or [])
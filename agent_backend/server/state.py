@@ -14,3 +14,4 @@ class Ctx:
     plan: Dict[str,Any] = field(default_factory=dict)
     call_sid: str = ""
     outcome: Dict[str,Any] = field(default_factory=lambda: {"status":"pending"})
+    summary: Any = None  # server.summarize.RunningSummary, fed while the call is live
@@ -1,13 +1,37 @@
-import sqlite3, uuid, json
+import sqlite3, uuid, json, os, glob, base64
+from app.tracing import traced
 
 DB_FILE = "dev.db"
+MIGRATIONS_DIR = "migrations"
 
-async def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    with open("migrations/001_init.sql") as f:
-        conn.executescript(f.read())
+# Explicit projections (no select *): adding a column never changes what callers get
+TASK_COLUMNS = ("id","user_id","brand","department_hint","goal","reason",
+                "identifiers","constraints","auth","evidence","status","created_at","updated_at")
+TASK_JSON_COLUMNS = ("identifiers","constraints","auth","evidence")
+SUMMARY_COLUMNS = ("task_id","ticket_id","resolution","amount","eta","citations","notes","created_at")
+
+def apply_migrations(db_file: str = DB_FILE, migrations_dir: str = MIGRATIONS_DIR):
+    """Run every migrations/NNN_*.sql not yet recorded in schema_migrations, in order."""
+    conn = sqlite3.connect(db_file)
+    if not conn.execute("select 1 from sqlite_master limit 1").fetchone():
+        # new DB: only settable before the first table; lets maintenance compact incrementally
+        conn.execute("pragma auto_vacuum=incremental")
+    conn.execute("create table if not exists schema_migrations (name text primary key, applied_at text default CURRENT_TIMESTAMP)")
+    done = {r[0] for r in conn.execute("select name from schema_migrations")}
+    for path in sorted(glob.glob(os.path.join(migrations_dir, "*.sql"))):
+        name = os.path.basename(path)
+        if name in done:
+            continue
+        with open(path) as f:
+            conn.executescript(f.read())
+        conn.execute("insert into schema_migrations(name) values(?)", (name,))
+        conn.commit()
     conn.close()
 
+async def init_db():
+    apply_migrations()
+
+@traced("db.insert tasks")
 async def create_task(task):
     tid = str(uuid.uuid4())
     conn = sqlite3.connect(DB_FILE); cur = conn.cursor()
@@ -20,18 +44,20 @@ async def create_task(task):
 
 async def load_task(task_id):
     conn = sqlite3.connect(DB_FILE); cur = conn.cursor()
-    row = cur.execute("select * from tasks where id=?", (task_id,)).fetchone()
-    cols=[c[0] for c in cur.description]; conn.close()
-    d=dict(zip(cols,row))
-    for k in ["identifiers","constraints","auth","evidence"]:
+    row = cur.execute(f"select {','.join(TASK_COLUMNS)} from tasks where id=?", (task_id,)).fetchone()
+    conn.close()
+    d=dict(zip(TASK_COLUMNS,row))
+    for k in TASK_JSON_COLUMNS:
         d[k]=json.loads(d[k]) if d[k] else {}
     return d
 
+@traced("db.update tasks.status")
 async def set_task_status(task_id, status):
     conn = sqlite3.connect(DB_FILE); cur = conn.cursor()
     cur.execute("update tasks set status=?, updated_at=CURRENT_TIMESTAMP where id=?", (status, task_id))
     conn.commit(); conn.close()
 
+@traced("db.upsert summaries")
 async def save_summary(task_id, summary):
     conn = sqlite3.connect(DB_FILE); cur = conn.cursor()
     cur.execute("""insert or replace into summaries(task_id,ticket_id,resolution,amount,eta,citations,notes)
@@ -43,17 +69,87 @@ async def save_summary(task_id, summary):
 
 async def get_task(task_id):
     conn = sqlite3.connect(DB_FILE); cur = conn.cursor()
-    row = cur.execute("select * from tasks where id=?", (task_id,)).fetchone()
+    row = cur.execute(f"select {','.join(TASK_COLUMNS)} from tasks where id=?", (task_id,)).fetchone()
+    conn.close()
     if not row: return None
-    cols=[c[0] for c in cur.description]; conn.close()
-    return dict(zip(cols,row))
+    return dict(zip(TASK_COLUMNS,row))
 
 async def get_summary(task_id):
     conn = sqlite3.connect(DB_FILE); cur = conn.cursor()
-    row = cur.execute("select * from summaries where task_id=?", (task_id,)).fetchone()
+    row = cur.execute(f"select {','.join(SUMMARY_COLUMNS)} from summaries where task_id=?", (task_id,)).fetchone()
+    conn.close()
     if not row: return {}
-    cols=[c[0] for c in cur.description]; conn.close()
-    d=dict(zip(cols,row))
+    d=dict(zip(SUMMARY_COLUMNS,row))
     d["citations"]=json.loads(d["citations"]) if d["citations"] else []
     d["notes"]=json.loads(d["notes"]) if d["notes"] else []
     return d
+
+# ---- Listing (dashboards): index-backed filters + keyset pagination ----
+
+# Columns a listing can return; JSON ones are only read (and parsed) when asked for
+LIST_TASK_FIELDS = ("id","user_id","brand","department_hint","goal","reason","status","created_at","updated_at")
+LIST_SUMMARY_FIELDS = ("ticket_id","resolution","amount","eta")
+LIST_DEFAULT_FIELDS = ("id","user_id","brand","goal","status","created_at","updated_at") + LIST_SUMMARY_FIELDS
+
+def _encode_cursor(created_at, task_id):
+    return base64.urlsafe_b64encode(json.dumps([created_at, task_id]).encode()).decode()
+
+def _decode_cursor(cursor):
+    created_at, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return str(created_at), str(task_id)
+
+async def list_tasks(user_id=None, status=None, brand=None, created_from=None, created_to=None,
+                     cursor=None, limit=50, fields=None, db_file=None):
+    """
+    Newest-first tasks left-joined with their summaries. Each filter is an equality
+    prefix on one of the (x, created_at, id) indexes from migration 004; `status`
+    may be a list. Pages continue from `cursor` (keyset on (created_at, id)), so
+    page 100 costs what page 1 does. `fields` picks the projection (default
+    LIST_DEFAULT_FIELDS; identifiers/constraints/auth/evidence are opt-in).
+    """
+    limit = max(1, min(int(limit), 500))
+    allowed = LIST_TASK_FIELDS + TASK_JSON_COLUMNS + LIST_SUMMARY_FIELDS
+    fields = [f for f in (fields or LIST_DEFAULT_FIELDS) if f in allowed]
+    for key in ("id","created_at"):  # needed for the cursor
+        if key not in fields:
+            fields.append(key)
+    cols = [f"s.{f}" if f in LIST_SUMMARY_FIELDS else f"t.{f}" for f in fields]
+    join = " left join summaries s on s.task_id = t.id" if any(f in LIST_SUMMARY_FIELDS for f in fields) else ""
+
+    where, params = [], []
+    if user_id:
+        where.append("t.user_id = ?"); params.append(user_id)
+    if brand:
+        where.append("t.brand = ?"); params.append(brand)
+    if status:
+        statuses = [status] if isinstance(status, str) else list(status)
+        where.append(f"t.status in ({','.join('?' * len(statuses))})"); params.extend(statuses)
+    if created_from:
+        where.append("t.created_at >= ?"); params.append(created_from)
+    if created_to:
+        where.append("t.created_at < ?"); params.append(created_to)
+    if cursor:
+        where.append("(t.created_at, t.id) < (?, ?)"); params.extend(_decode_cursor(cursor))
+    sql = f"select {','.join(cols)} from tasks t{join}"
+    if where:
+        sql += " where " + " and ".join(where)
+    sql += " order by t.created_at desc, t.id desc limit ?"
+    params.append(limit + 1)
+
+    conn = sqlite3.connect(db_file or DB_FILE)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    more = len(rows) > limit
+    items = []
+    for row in rows[:limit]:
+        d = dict(zip(fields, row))
+        for k in TASK_JSON_COLUMNS:
+            if k in d:
+                d[k] = json.loads(d[k]) if d[k] else {}
+        items.append(d)
+    return {
+        "items": items,
+        "next_cursor": _encode_cursor(items[-1]["created_at"], items[-1]["id"]) if more else None,
+    }
@@ -1,9 +1,233 @@
+# server/summarize.py
+"""
+Running call summary: transcript turns are fed in as they arrive and matched
+against the plan's confirmation_checklist with precompiled patterns, so the
+structured outcome is complete the moment the call ends (no post-call LLM pass).
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+DEFAULT_CHECKLIST = [
+    "ticket_id", "refund_amount", "refund_method", "SLA_date",
+    "rep_name_or_id", "confirmation_email",
+]
+
+# Turns spoken by the vendor's side (Vapi "user" is the callee; Twilio inbound_track is the far end)
+REP_ROLES = {"user", "rep", "inbound_track"}
+
+_MONEY = r"\$\s?(\d{1,3}(?:,\d{3})*(?:\.\d{1,2})?|\d+(?:\.\d{1,2})?)"
+_DAYS = r"(?:mon|tues|wednes|thurs|fri|satur|sun)day"
+_MONTHS = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+
+# item → patterns; group 1 (and 2.. where noted) carry the value
+PATTERNS: Dict[str, List[Pattern]] = {
+    "ticket_id": [
+        re.compile(r"\b(?:ticket|case|reference|confirmation|claim|incident|rma)\s*(?:number|no\.?|#|id)?"
+                   r"\s*(?:is|will be|:)?\s*#?\s*((?=[a-z-]*\d)[a-z0-9][a-z0-9-]{3,})\b", re.I),
+    ],
+    "refund_amount": [
+        re.compile(r"\brefund(?:ed)?\b[^.$]{0,40}?" + _MONEY, re.I),
+        re.compile(_MONEY + r"[^.]{0,40}?\brefund", re.I),
+        re.compile(r"\brefund(?:ed)?\b[^.\d]{0,40}?(\d+(?:\.\d{1,2})?)\s+dollars", re.I),
+    ],
+    "refund_method": [
+        re.compile(r"\b(original (?:payment(?: method)?|card|form of payment)|(?:credit|debit) card"
+                   r"|gift card|store credit|paypal|bank account)\b", re.I),
+    ],
+    "SLA_date": [
+        re.compile(r"\b(?:within|in|takes?|allow)\s+((?:\d+|one|two|three|five|seven|ten)"
+                   r"(?:\s*(?:-|to)\s*\d+)?\s+(?:business\s+|working\s+)?(?:days?|weeks?|hours?))\b", re.I),
+        re.compile(r"\bby\s+((?:this |next )?" + _DAYS + r"|" + _MONTHS + r"\s+\d{1,2}(?:st|nd|rd|th)?"
+                   r"|\d{1,2}/\d{1,2}(?:/\d{2,4})?)\b", re.I),
+    ],
+    "rep_name_or_id": [
+        re.compile(r"(?i:\bmy name is|\bthis is|\byou(?:'re| are) speaking (?:with|to))\s+([A-Z][a-z]+)\b"),
+        re.compile(r"\b([A-Z][a-z]+) speaking\b"),
+        re.compile(r"\b(?:agent|employee|operator|rep(?:resentative)?)\s+(?:id|number|no\.?)\s*(?:is\s*)?#?\s*(\w*\d\w*)", re.I),
+    ],
+    "confirmation_email": [
+        re.compile(r"\b([\w.+-]+@[\w-]+(?:\.[\w-]+)+)\b"),
+        # spoken: "jane dot doe at gmail dot com"
+        re.compile(r"\b((?:[\w+-]+\s+dot\s+)*[\w.+-]+)\s+at\s+([\w-]+)\s+dot\s+(com|net|org|edu|co)\b", re.I),
+    ],
+}
+
+# Refund items a later denial by the rep takes back
+_REFUND_ITEMS = ("refund_amount", "refund_method")
+# Words that follow "this is" but aren't names
+_NOT_NAMES = {"The", "Your", "It", "That", "What", "A", "An", "Customer", "Regarding"}
+
+_DENIED = re.compile(
+    r"\b(?:not eligible|unable to (?:refund|return|replace|process)|can(?:no|')t (?:refund|return|replace|process)"
+    r"|(?:refund|return|request) (?:is|was|has been) (?:denied|declined|rejected))\b",
+    re.I,
+)
+
+
+def _value(item: str, m: "re.Match") -> Any:
+    if item == "confirmation_email" and m.lastindex and m.lastindex >= 3:
+        local = re.sub(r"\s+dot\s+", ".", m.group(1), flags=re.I)
+        return f"{local}@{m.group(2)}.{m.group(3)}".lower()
+    v = m.group(1).strip()
+    if item == "ticket_id":
+        return v.upper()
+    if item == "refund_amount":
+        return float(v.replace(",", ""))
+    if item == "refund_method":
+        return v.lower()
+    if item == "rep_name_or_id" and v in _NOT_NAMES:
+        return None
+    return v
+
+
+class RunningSummary:
+    """
+    Structured outcome built turn by turn from the rep's side only: our own
+    speech (assistant / outbound_track, both_tracks on Twilio) asks for things,
+    it never confirms them. The first value the rep states for an item wins,
+    except that a denial takes back the refund amount/method stated before it.
+    """
+
+    def __init__(self, checklist: Optional[List[str]] = None):
+        self.checklist = list(checklist or DEFAULT_CHECKLIST)
+        self.found: Dict[str, Any] = {}
+        self.evidence: Dict[str, str] = {}
+        self.denied: Optional[str] = None
+        self.turns = 0
+        self.ended = False
+        self._patterns: List[Tuple[str, List[Pattern]]] = [
+            (item, PATTERNS[item]) for item in self.checklist if item in PATTERNS
+        ]
+
+    def feed(self, role: str, text: str) -> Dict[str, Any]:
+        """Match one transcript turn; returns the items it newly confirmed."""
+        text = (text or "").strip()
+        if not text:
+            return {}
+        self.turns += 1
+        if (role or "").lower() not in REP_ROLES:
+            return {}
+        new: Dict[str, Any] = {}
+        denial = _DENIED.search(text)
+        if denial:
+            self.denied = text
+            for item in _REFUND_ITEMS:
+                self.found.pop(item, None)
+                self.evidence.pop(item, None)
+        for item, patterns in self._patterns:
+            if item in self.found or (denial and item in _REFUND_ITEMS):
+                continue
+            for p in patterns:
+                m = p.search(text)
+                value = _value(item, m) if m else None
+                if value is not None:
+                    self.found[item] = new[item] = value
+                    self.evidence[item] = text
+                    break
+        if self.denied and not denial and "refund_amount" in new:
+            self.denied = None  # the rep came back with a refund after all
+        return new
+
+    def missing(self) -> List[str]:
+        return [i for i in self.checklist if i not in self.found]
+
+    @property
+    def complete(self) -> bool:
+        return all(i in self.found for i, _ in self._patterns)
+
+    def status(self) -> str:
+        if self.denied:
+            return "denied"
+        if self.found.get("ticket_id") or self.found.get("refund_amount"):
+            return "resolved"
+        return "unresolved" if self.ended else "pending"
+
+    def resolution(self) -> str:
+        f = self.found
+        if self.denied:
+            return f"Denied: {self.denied}"
+        if f.get("refund_amount") is not None or f.get("refund_method"):
+            amount = f" of ${f['refund_amount']:.2f}" if f.get("refund_amount") is not None else ""
+            method = f" to {f['refund_method']}" if f.get("refund_method") else ""
+            return f"Refund{amount}{method}"
+        if f.get("ticket_id"):
+            return f"Case {f['ticket_id']} opened"
+        return "No resolution confirmed on the call"
+
+    def outcome(self) -> Dict[str, Any]:
+        """Same keys run_fsm has always kept in ctx.outcome, plus the raw checklist."""
+        f = self.found
+        return {
+            "status": self.status(),
+            "ticket": f.get("ticket_id"),
+            "amount": f.get("refund_amount"),
+            "eta": f.get("SLA_date"),
+            "refund_method": f.get("refund_method"),
+            "rep": f.get("rep_name_or_id"),
+            "email": f.get("confirmation_email"),
+            "resolution": self.resolution(),
+            "checklist": dict(f),
+            "missing": self.missing(),
+        }
+
+
+class SummaryRegistry:
+    """Running summaries by call id (Vapi call id or Twilio CallSid)."""
+
+    def __init__(self, max_calls: int = 1000):
+        self._calls: "OrderedDict[str, RunningSummary]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_calls = max_calls
+
+    def open(self, call_id: str, checklist: Optional[List[str]] = None) -> RunningSummary:
+        with self._lock:
+            rs = self._calls.get(call_id)
+            if rs is None:
+                rs = self._calls[call_id] = RunningSummary(checklist)
+                while len(self._calls) > self.max_calls:
+                    self._calls.popitem(last=False)  # calls whose end we never heard about
+            return rs
+
+    def get(self, call_id: Optional[str]) -> Optional[RunningSummary]:
+        return self._calls.get(call_id or "")
+
+    def feed(self, call_id: Optional[str], role: str, text: str) -> Optional[RunningSummary]:
+        if not call_id:
+            return None
+        rs = self.open(call_id)
+        with self._lock:
+            rs.feed(role, text)
+        return rs
+
+    def end(self, call_id: Optional[str]) -> Optional[RunningSummary]:
+        """Mark the call over and stop tracking it; the summary is final."""
+        with self._lock:
+            rs = self._calls.pop(call_id or "", None)
+        if rs:
+            rs.ended = True
+        return rs
+
+
+SUMMARIES = SummaryRegistry()
+
+
 def build_summary_object(ctx):
+    rs: Optional[RunningSummary] = getattr(ctx, "summary", None)
+    out = rs.outcome() if rs else ctx.outcome
+    notes = []
+    if out.get("rep"):
+        notes.append(f"Rep: {out['rep']}")
+    if out.get("email"):
+        notes.append(f"Confirmation sent to {out['email']}")
+    if out.get("missing"):
+        notes.append("Not confirmed on the call: " + ", ".join(out["missing"]))
     return {
-        "ticket_id": ctx.outcome.get("ticket"),
-        "resolution": "Full refund to original payment",
-        "amount": ctx.outcome.get("amount"),
-        "eta": ctx.outcome.get("eta"),
+        "ticket_id": out.get("ticket"),
+        "resolution": out.get("resolution"),
+        "amount": out.get("amount"),
+        "eta": out.get("eta"),
         "citations": ctx.plan.get("citations", []),
-        "notes": ["Prepaid label emailed"]
+        "notes": notes,
     }
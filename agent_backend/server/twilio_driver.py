@@ -1,5 +1,15 @@
 import os
-from twilio.rest import Client
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Optional
+from xml.sax.saxutils import escape
+from app import clients
+from app.number_pool import NumberPool
+from app.ratelimit import RateLimiter
+
+if TYPE_CHECKING:
+    from twilio.rest import Client  # imported lazily at runtime (optional dependency)
 
 def _must(name: str) -> str:
     v = os.getenv(name)
@@ -7,26 +17,100 @@ def _must(name: str) -> str:
         raise RuntimeError(f"Missing env var: {name}")
     return v
 
+# ---- One REST client per account (each Client keeps its own HTTP session) ----
+_CLIENTS: Dict[str, "Client"] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+def get_client(account_sid: Optional[str] = None, auth_token: Optional[str] = None) -> "Client":
+    if not account_sid and not auth_token:
+        return clients.get("twilio")  # the env account, built on first use
+    from twilio.rest import Client
+    account_sid = account_sid or _must("TWILIO_ACCOUNT_SID")
+    auth_token = auth_token or _must("TWILIO_AUTH_TOKEN")
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(account_sid)
+        if client is None or client.password != auth_token:
+            client = Client(account_sid, auth_token)
+            _CLIENTS[account_sid] = client
+        return client
+
+class Dialer:
+    """
+    Places Twilio calls without blocking the event loop: the REST calls run on a
+    small thread pool and call creation is paced to the account's calls-per-second.
+    """
+
+    def __init__(self, cps: float = 1.0, workers: int = 8):
+        self.limiter = RateLimiter(cps)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="twilio")
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, lambda: fn(*args, **kwargs))
+
+    async def dial(self, to: str, from_: str, url: str) -> str:
+        await self.limiter.acquire()
+        call = await self._run(get_client().calls.create, to=to, from_=from_, url=url)
+        return call.sid
+
+    async def update(self, call_sid: str, twiml: str):
+        await self._run(get_client().calls(call_sid).update, twiml=twiml)
+
+# Twilio's default outbound limit is 1 call/sec per account; raise TWILIO_CPS if yours is higher.
+DIALER = Dialer(
+    cps=float(os.getenv("TWILIO_CPS", "1")),
+    workers=int(os.getenv("TWILIO_DIAL_WORKERS", "8")),
+)
+
+# ---- Caller-ID pool: TWILIO_NUMBER_POOL="+1555...[:max_concurrent[:calls_per_minute]],..." ----
+_NUMBER_POOL: Optional[NumberPool] = None
+
+def number_pool() -> NumberPool:
+    global _NUMBER_POOL
+    if _NUMBER_POOL is None:
+        _NUMBER_POOL = NumberPool.from_spec(
+            os.getenv("TWILIO_NUMBER_POOL", ""), os.getenv("TWILIO_FROM_NUMBER", ""), name="twilio",
+        )
+    return _NUMBER_POOL
+
+def release_number(call_sid: str) -> bool:
+    return number_pool().release_call(call_sid)
+
 async def dial_support(brief) -> str:
     """
     Places the outbound call using TwiML Bin (demo mode).
     Reads env at call time so changing .env works after a restart.
+    The caller ID is leased from the number pool; release_number() returns it.
     """
-    account_sid = _must("TWILIO_ACCOUNT_SID")
-    auth_token  = _must("TWILIO_AUTH_TOKEN")
-    from_num    = _must("TWILIO_FROM_NUMBER")
-    to_num      = os.getenv("TEST_TO_NUMBER", from_num)   # demo: call your phone
     twiml_url   = _must("TWIML_URL")
+    wait_s      = float(os.getenv("NUMBER_POOL_WAIT_S", "20"))
+    lease       = await asyncio.to_thread(number_pool().acquire, wait_s)
+    from_num    = lease.number
+    to_num      = os.getenv("TEST_TO_NUMBER", from_num)   # demo: call your phone
 
     print(f"[dial_support] to={to_num} from_={from_num} url={twiml_url}")
-    client = Client(account_sid, auth_token)
-    call = client.calls.create(to=to_num, from_=from_num, url=twiml_url)
-    print(f"[dial_support] call.sid={call.sid}")
-    return call.sid
+    try:
+        sid = await DIALER.dial(to_num, from_num, twiml_url)
+    except Exception:
+        number_pool().release(lease)
+        raise
+    number_pool().bind(lease, sid)
+    print(f"[dial_support] call.sid={sid}")
+    return sid
 
-async def play_script(call_sid: str, text: str):
+async def play_script(call_sid: str, text: str, transcribe: bool = False):
     """
-    No-op for demo because TwiML Bin is static.
-    When you move to dynamic speech/Media Streams, implement TTS/DTMF here.
+    Speak `text` on the live call by swapping in fresh TwiML, then hold the
+    line open (TWILIO_HOLD_SECONDS) so the next step can speak again.
+    With transcribe=True (and TWILIO_TRANSCRIPTION_URL set) Twilio also starts
+    real-time transcription, posting turns to our /twilio/transcription.
     """
-    return
+    if not call_sid or not text:
+        return
+    hold = int(os.getenv("TWILIO_HOLD_SECONDS", "60"))
+    start = ""
+    callback = os.getenv("TWILIO_TRANSCRIPTION_URL", "")
+    if transcribe and callback:
+        start = f'<Start><Transcription track="both_tracks" statusCallbackUrl="{escape(callback)}"/></Start>'
+    twiml = f'<Response>{start}<Say>{escape(text)}</Say><Pause length="{hold}"/></Response>'
+    await DIALER.update(call_sid, twiml)
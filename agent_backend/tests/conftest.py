@@ -0,0 +1,17 @@
+# tests/conftest.py
+# Run from agent_backend/ (python -m pytest tests); make `app` / `server` importable either way.
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    """A scratch copy of the schema (every migration applied); never the real dev.db."""
+    from server.storage import apply_migrations
+    path = str(tmp_path / "test.db")
+    apply_migrations(path, os.path.join(ROOT, "migrations"))
+    return path
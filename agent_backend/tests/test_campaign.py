@@ -0,0 +1,111 @@
+# tests/test_campaign.py
+import asyncio
+import os
+import time
+from app import campaign
+from app.campaign import Campaign, CampaignRegistry
+
+
+def test_event_log_is_capped_and_follow_reports_the_gap(monkeypatch):
+    monkeypatch.setattr(campaign, "CAMPAIGN_EVENT_LOG", 3)
+
+    async def go():
+        camp = Campaign(concurrency=1)
+        camp.uploaded = True
+        for row in range(1, 6):
+            camp.rows = row
+            camp._emit(row, "invalid", error="x")
+        out = [ev async for ev in camp.follow(0)]
+        for w in camp._workers:
+            w.cancel()
+        return camp, out
+
+    camp, out = asyncio.run(go())
+    assert len(camp.events) == 3
+    assert out[0] == {"type": "gap", "after": 0, "skipped": 2}
+    assert [ev["seq"] for ev in out[1:4]] == [3, 4, 5]
+    assert out[-1]["type"] == "done"
+    assert camp.finished_at is not None
+
+
+def test_ready_queue_is_bounded_by_workers():
+    async def go():
+        camp = Campaign(concurrency=3)
+        for w in camp._workers:
+            w.cancel()
+        return camp._ready.maxsize
+
+    assert asyncio.run(go()) == 6
+
+
+def test_registry_expires_finished_campaigns():
+    async def go():
+        reg = CampaignRegistry(ttl_s=60)
+        old, live = reg.create(), reg.create()
+        old.finished_at = time.time() - 61
+        reg.create()
+        for c in list(reg._campaigns.values()):
+            for w in c._workers:
+                w.cancel()
+        return reg, old, live
+
+    reg, old, live = asyncio.run(go())
+    assert reg.get(old.id) is None
+    assert reg.get(live.id) is live
+
+
+def test_cancel_stops_dialing_queued_rows(monkeypatch):
+    dialed = []
+
+    def fake_call(to_number, variables):
+        time.sleep(0.05)
+        dialed.append(variables["metadata"]["row"])
+        return f"call-{len(dialed)}"
+
+    monkeypatch.setattr(campaign, "start_vendor_call", fake_call)
+    monkeypatch.setattr(campaign, "prepare_row", lambda raw: (dict(raw), []))
+
+    async def go():
+        camp = Campaign(concurrency=1, cps=1000)
+
+        async def upload():
+            for i in range(20):
+                yield b'{"vendor_name": "Walmart", "target_number": "+15550000000"}\n'
+
+        ingest = asyncio.create_task(camp.ingest(upload(), "ndjson"))
+        while not camp.calls:
+            await asyncio.sleep(0.01)
+        await camp.cancel()
+        await asyncio.wait_for(ingest, 1)
+        return camp
+
+    camp = asyncio.run(go())
+    assert camp.cancelled and camp.uploaded
+    assert len(dialed) < 5
+    assert set(camp.calls.values()) == set(dialed)
+    assert camp.counts["cancelled"] + camp.counts["calling"] == camp.rows
+
+
+def test_spooled_upload_is_ingested_in_the_background(monkeypatch):
+    monkeypatch.setattr(campaign, "start_vendor_call", lambda to_number, variables: f"call-{variables['metadata']['row']}")
+    monkeypatch.setattr(campaign, "prepare_row", lambda raw: (dict(raw), []))
+
+    async def go():
+        async def upload():
+            yield b'{"vendor_name": "Walmart", "target_number": "+15550000000"}\n' * 2
+            yield b"not json\n"
+
+        path = await campaign.spool(upload())
+        camp = Campaign(concurrency=1, cps=1000)
+        camp.start(path, "ndjson")
+        assert not camp.uploaded  # the caller already has the id; rows are still coming
+        await asyncio.wait_for(camp._ingest, 1)
+        while camp.counts.get("calling", 0) < 2:
+            await asyncio.sleep(0.01)
+        await camp.cancel()
+        return camp, path
+
+    camp, path = asyncio.run(go())
+    assert camp.rows == 3 and camp.counts["invalid"] == 1
+    assert set(camp.calls) == {"call-1", "call-2"}
+    assert not os.path.exists(path)
@@ -0,0 +1,64 @@
+# tests/test_capture.py
+import pytest
+
+from app.capture import redact, redact_text
+from app.llm import extract_fields
+from app.wizard import apply_goal_intent, missing_fields
+
+UTTERANCES = [
+    "I want to return my order from Walmart, the blender is broken",
+    "Return my AirPods to Walmart, order id WM-55821, call me at +1 202 555 0143",
+    "Amazon sent the wrong item, order #112-7765432, reach me at +1 415 555 0100",
+    "Enterprise rental issue, windshield cracked, contract ENT-99031",
+    "Refund to card 4111 1111 1111 1111 please, my email is jane.doe@gmail.com",
+    "Book the Hilton in Boston for 2 nights, case number ZX9911",
+    "What time does Home Depot close today?",
+]
+
+
+def _intake(utterance: str):
+    d = extract_fields(utterance)
+    apply_goal_intent(d)
+    return d, d.get("intent"), sorted(missing_fields(d, d.get("intent")))
+
+
+def test_redaction_masks_identifiers():
+    out = redact_text("card 4111111111111111, order id WM-55821, ticket # 88123, call +1 202 555 0143")
+    for secret in ("4111111111111111", "WM-55821", "88123", "202 555 0143"):
+        assert secret not in out
+
+
+@pytest.mark.parametrize("text, secret", [
+    ("call me at (415) 555-1234", "555-1234"),
+    ("our toll-free line is 1-800-555-1234", "555-1234"),
+])
+def test_redaction_masks_us_phone_formats(text, secret):
+    out = redact_text(text)
+    assert secret not in out and "1-+" not in out
+    assert "+1555" in out
+    assert redact_text(out) == out
+
+
+def test_same_number_same_token_in_any_format():
+    tokens = {redact_text(t) for t in ("(415) 555-1234", "+1 415 555 1234", "1-415-555-1234", "415.555.1234")}
+    assert len(tokens) == 1
+
+
+def test_redaction_keeps_ordinary_words():
+    assert redact_text("return my order from Walmart") == "return my order from Walmart"
+    assert redact_text("the reference desk") == "the reference desk"
+
+
+@pytest.mark.parametrize("utterance", UTTERANCES)
+def test_redaction_is_idempotent(utterance):
+    once = redact_text(utterance)
+    assert redact_text(once) == once
+
+
+@pytest.mark.parametrize("utterance", UTTERANCES)
+def test_redacted_utterance_takes_the_same_intake_path(utterance):
+    fields, intent, missing = _intake(utterance)
+    r_fields, r_intent, r_missing = _intake(redact_text(utterance))
+    assert (r_intent, r_missing) == (intent, missing)
+    assert sorted(r_fields) == sorted(fields)
+    assert redact(fields) == r_fields  # same values, as tokens
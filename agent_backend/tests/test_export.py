@@ -0,0 +1,27 @@
+# tests/test_export.py
+import sqlite3
+import time
+from server.export import format_mark, iter_rows
+
+
+def _task(conn, tid, updated_at):
+    conn.execute("insert into tasks(id, brand, status, updated_at) values(?, 'Walmart', 'done', ?)", (tid, updated_at))
+
+
+def test_current_second_is_left_for_the_next_run(db_file, monkeypatch):
+    conn = sqlite3.connect(db_file)
+    _task(conn, "b", "2026-10-19 12:00:00")
+    _task(conn, "c", "2026-10-19 12:00:05")
+    conn.commit()
+    now = time.strptime("2026-10-19 12:00:05", "%Y-%m-%d %H:%M:%S")
+    monkeypatch.setattr("server.export.time.gmtime", lambda *a: now)
+
+    first = list(iter_rows(db_file=db_file))  # no mark: the first run is guarded too
+    assert [r["id"] for r in first] == ["b"]
+
+    _task(conn, "a", "2026-10-19 12:00:05")  # late sibling that sorts before "c"
+    conn.commit()
+    later = time.strptime("2026-10-19 12:00:06", "%Y-%m-%d %H:%M:%S")
+    monkeypatch.setattr("server.export.time.gmtime", lambda *a: later)
+    second = list(iter_rows(since_updated=format_mark(first[-1]), db_file=db_file))
+    assert [r["id"] for r in second] == ["a", "c"]
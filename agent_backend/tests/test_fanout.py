@@ -0,0 +1,75 @@
+# tests/test_fanout.py
+import asyncio
+import time
+import pytest
+from app import fanout
+from app.fanout import FanoutRegistry
+from app.vapi_events import parse_event
+
+BRIEF = {"intent": "hotel_booking", "city": "Boston", "stay_start": "2026-11-01", "stay_end": "2026-11-03",
+         "user_phone": "+14155550100", "vendors": ["Hilton", "Marriott", "Hyatt"]}
+
+
+@pytest.fixture
+def dialer(monkeypatch):
+    hung_up = []
+
+    async def fake_hangup_many(call_ids):
+        ids = list(call_ids)
+        hung_up.extend(ids)
+        return {c: True for c in ids}
+
+    monkeypatch.setattr(fanout, "resolve_target_number", lambda d: "+15550000000")
+    monkeypatch.setattr(fanout, "build_call_vars", lambda d: {"hotel_name": d.get("hotel_name")})
+    monkeypatch.setattr(fanout, "start_vendor_call",
+                        lambda to, v: f"call-{v['metadata']['vendor_name']}-{v['metadata']['fanout_id'][:8]}")
+    monkeypatch.setattr(fanout, "hangup_many", fake_hangup_many)
+    return hung_up
+
+
+def _end_of_call(call_id, summary):
+    return parse_event({"message": {"type": "end-of-call-report", "call": {"id": call_id}, "summary": summary}})
+
+
+def test_end_of_call_reports_aggregate_into_a_comparison(dialer):
+    reg, outbox = FanoutRegistry(), []
+    group = reg.start("s1", outbox, BRIEF)
+    hilton, marriott, hyatt = [l.call_id for l in group.legs]
+    assert hilton.startswith("call-Hilton") and hyatt.startswith("call-Hyatt")
+
+    reg.record_result(_end_of_call(hilton, "Quoted $289 per night."))
+    reg.record_result(_end_of_call(marriott, "Best rate is $245."))
+    assert not group.reported and group.settled_at is None
+    reg.record_result(_end_of_call(hyatt, "No rooms available."))
+
+    comparison = outbox[-1]
+    assert comparison["type"] == "quote_comparison" and comparison["reason"] == "complete"
+    assert comparison["best"]["vendor_name"] == "Marriott" and comparison["best"]["price"] == 245.0
+    assert [q["vendor_name"] for q in comparison["quotes"]] == ["Marriott", "Hilton", "Hyatt"]
+    assert group.settled_at is not None
+
+
+def test_pick_hangs_up_the_other_legs(dialer):
+    reg, outbox = FanoutRegistry(), []
+    group = reg.start("s1", outbox, BRIEF)
+    hilton, marriott, hyatt = [l.call_id for l in group.legs]
+    cancelled = asyncio.run(reg.pick(group, hyatt))
+    assert cancelled == dialer == [hilton, marriott]
+    assert {l.vendor_name: l.status for l in group.legs} == {
+        "Hilton": "cancelled", "Marriott": "cancelled", "Hyatt": "calling"}
+    assert outbox[-1]["type"] == "fanout_picked"
+    with pytest.raises(KeyError):
+        asyncio.run(reg.pick(group, "call-unknown"))
+
+
+def test_settled_groups_expire(dialer):
+    reg = FanoutRegistry(ttl_s=60)
+    old = reg.start("s1", [], BRIEF)
+    live = reg.start("s2", [], BRIEF)
+    for leg in old.legs:
+        reg.record_result(_end_of_call(leg.call_id, "No rooms."))
+    old.settled_at = time.time() - 61
+    assert reg.for_session("s1") is None
+    assert reg.for_call(old.legs[0].call_id) is None
+    assert reg.for_call(live.legs[0].call_id) is live
+    assert reg.for_session("s2") is live and len(reg) == 1
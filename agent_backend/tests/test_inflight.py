@@ -0,0 +1,42 @@
+# tests/test_inflight.py
+from app.inflight import call_fingerprint
+from app.models import SessionState
+from app.sessions import SessionStore
+
+BASE = {"intent": "generic_query", "vendor_name": "Walmart", "user_phone": "+14155550100"}
+
+
+def test_same_request_same_fingerprint():
+    a = dict(BASE, question="Do you price match?")
+    b = dict(BASE, question="  do you price-match? ")
+    assert call_fingerprint(a) == call_fingerprint(b)
+
+
+def test_intent_subject_fields_split_fingerprints():
+    pairs = [
+        (dict(BASE, question="Do you price match?"), dict(BASE, question="When do you open?")),
+        (dict(BASE, intent="hotel_booking", hotel_name="Hilton", stay_start="2026-11-01"),
+         dict(BASE, intent="hotel_booking", hotel_name="Hilton", stay_start="2026-11-08")),
+        (dict(BASE, intent="service_booking", service_type="oil change"),
+         dict(BASE, intent="service_booking", service_type="tire rotation")),
+        (dict(BASE, intent="retail_return", order_id="WM-1", item="blender"),
+         dict(BASE, intent="retail_return", order_id="WM-1", item="toaster")),
+    ]
+    for a, b in pairs:
+        assert call_fingerprint(a) != call_fingerprint(b), (a, b)
+
+
+def test_hotels_without_vendor_do_not_collapse():
+    a = {"intent": "hotel_booking", "hotel_name": "Hilton Union Square", "user_phone": "+14155550100"}
+    b = dict(a, hotel_name="Marriott Marquis")
+    assert call_fingerprint(a) != call_fingerprint(b)
+
+
+def test_every_session_on_a_call_is_found():
+    store = SessionStore()
+    sid_a, a = store.create(lambda: SessionState(data={}, ask_counts={}))
+    sid_b, b = store.create(lambda: SessionState(data={}, ask_counts={}))
+    store.create(lambda: SessionState(data={}, ask_counts={}))
+    a.call_id = b.call_id = "call-1"
+    assert [sid for sid, _ in store.find_all_by_call("call-1")] == [sid_a, sid_b]
+    assert store.find_all_by_call(None) == []
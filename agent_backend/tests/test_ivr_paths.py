@@ -0,0 +1,51 @@
+# tests/test_ivr_paths.py
+import sqlite3
+import threading
+from pathlib import Path
+from app.ivr_paths import record, ranked_paths
+
+SCHEMA = Path(__file__).resolve().parents[1] / "migrations" / "002_ivr_paths.sql"
+
+
+def test_concurrent_records_are_not_lost(tmp_path):
+    db = str(tmp_path / "ivr.db")
+    conn = sqlite3.connect(db)
+    conn.executescript(SCHEMA.read_text())
+    conn.close()
+
+    def worker():
+        for _ in range(10):
+            record("walmart", "returns", "1w3", "", True, 30.0, db_file=db)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    (path,) = ranked_paths("walmart", "returns", db_file=db)
+    assert round(path["attempts"]) == 40
+    assert round(path["successes"]) == 40
+
+
+def test_best_path_is_cached_until_a_write(tmp_path, monkeypatch):
+    from app import ivr_paths
+
+    db = str(tmp_path / "ivr.db")
+    conn = sqlite3.connect(db)
+    conn.executescript(SCHEMA.read_text())
+    conn.close()
+    reads = []
+
+    def counted(vendor, department, db_file=db):
+        reads.append(vendor)
+        return ranked_paths(vendor, department, db_file=db)
+
+    monkeypatch.setattr(ivr_paths, "ranked_paths", counted)
+    assert ivr_paths.best_path("target", "returns") is None
+    assert ivr_paths.best_path("target", "returns") is None
+    assert len(reads) == 1
+
+    record("target", "returns", "2", "", True, 12.0, db_file=db)  # what the writer thread runs
+    assert ivr_paths.best_path("target", "returns") == {"dtmf": "2"}
+    assert len(reads) == 2
@@ -0,0 +1,52 @@
+# tests/test_maintenance.py
+import asyncio
+import sqlite3
+import pytest
+from server import maintenance
+from server.maintenance import compact, maintenance_loop
+
+
+def _fill_and_free(conn):
+    conn.execute("create table if not exists junk (v text)")
+    conn.executemany("insert into junk values (?)", [("x" * 2000,) for _ in range(500)])
+    conn.execute("delete from junk")
+
+
+def test_new_databases_are_created_incremental(db_file):
+    conn = sqlite3.connect(db_file)
+    assert conn.execute("pragma auto_vacuum").fetchone()[0] == 2
+    _fill_and_free(conn)
+    conn.commit()
+    out = compact(conn)
+    assert out["freed_pages"] > 0 and out["free_pages"] == 0
+
+
+def test_legacy_database_gets_one_full_vacuum(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "old.db"), isolation_level=None)
+    _fill_and_free(conn)
+    assert conn.execute("pragma auto_vacuum").fetchone()[0] == 0
+    out = compact(conn)
+    assert out["full_vacuum"] and out["freed_pages"] > 0
+    assert conn.execute("pragma auto_vacuum").fetchone()[0] == 2
+    _fill_and_free(conn)
+    assert "full_vacuum" not in compact(conn)  # incremental from now on
+
+
+def test_loop_survives_any_error(monkeypatch):
+    runs = []
+
+    def flaky():
+        runs.append(1)
+        raise RuntimeError("disk on fire")
+
+    monkeypatch.setattr(maintenance, "run_maintenance", flaky)
+
+    async def go():
+        task = asyncio.create_task(maintenance_loop(interval_s=0.01, first_delay_s=0))
+        while len(runs) < 3:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(asyncio.wait_for(go(), 5))
@@ -0,0 +1,43 @@
+# tests/test_monitor.py
+import asyncio
+from pathlib import Path
+from app import monitor_replay
+from app.monitor import CallMonitor
+
+RECORDING = Path(__file__).resolve().parents[1] / "data" / "recordings" / "sample_call.jsonl"
+
+
+def test_replayed_call_forwards_final_transcript_lines():
+    async def go():
+        server = await monitor_replay.serve(str(RECORDING), port=0, speed=100)
+        port = server.sockets[0].getsockname()[1]
+        lines = []
+        mon = CallMonitor("call-1", f"ws://127.0.0.1:{port}", lines.append)
+        try:
+            await asyncio.wait_for(mon.run(), 10)
+        finally:
+            server.close()
+            await server.wait_closed()
+        return mon, lines
+
+    mon, lines = asyncio.run(go())
+    assert mon.error is None
+    assert mon.lines == 7
+    assert [l["role"] for l in lines] == ["user", "assistant", "user", "assistant", "user", "assistant", "user"]
+    assert lines[0]["text"] == "Thank you for calling Walmart. For returns, press 1."
+    assert lines[-1]["text"] == "Your ticket number is WM-48213."
+    assert all(l["type"] == "transcript" and l["call_id"] == "call-1" for l in lines)
+    assert mon.audio_frames > 0
+
+
+def test_consume_skips_frames_that_are_not_objects():
+    async def go():
+        lines = []
+        mon = CallMonitor("call-1", "ws://unused", lines.append)
+        for ev in ([1, 2], "text", 3, {"type": None},
+                   {"type": "transcript", "role": "user", "transcript": "hello"}, None):
+            mon.queue.put_nowait(ev)
+        await mon._consume()
+        return lines
+
+    assert [l["text"] for l in asyncio.run(go())] == ["hello"]
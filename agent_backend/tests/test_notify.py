@@ -0,0 +1,27 @@
+# tests/test_notify.py
+import asyncio
+import threading
+from server import notify
+from server.notify import Notifier
+
+
+def test_endpoint_lookup_runs_off_the_loop_and_is_cached(monkeypatch):
+    calls = []
+
+    def get_endpoint(user_id):
+        calls.append(threading.current_thread() is threading.main_thread())
+        return ("https://example.com/hook", "s3cret")
+
+    monkeypatch.setattr(notify, "get_endpoint", get_endpoint)
+
+    async def go():
+        n = Notifier(file_path="")
+        first = await n._destinations("u1")
+        await n._destinations("u1")
+        n.forget_endpoint("u1")
+        await n._destinations("u1")
+        return first
+
+    sinks = asyncio.run(go())
+    assert [s.key for s in sinks] == [notify.WebhookSink("https://example.com/hook", "s3cret").key]
+    assert calls == [False, False]  # never on the event loop thread; cached between forgets
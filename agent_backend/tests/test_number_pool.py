@@ -0,0 +1,15 @@
+# tests/test_number_pool.py
+import pytest
+from app.number_pool import parse_pool_spec
+
+
+def test_parse_pool_spec_defaults():
+    a, b = parse_pool_spec("pn-a, pn-b:3:20")
+    assert (a.id, a.max_concurrent, a.per_minute) == ("pn-a", 1, 0)
+    assert (b.id, b.max_concurrent, b.per_minute) == ("pn-b", 3, 20)
+
+
+@pytest.mark.parametrize("spec", ["pn-a:0", "pn-a:-1", "pn-a:2:-5", "pn-a:two", "pn-a:1:1.5"])
+def test_parse_pool_spec_rejects_bad_limits(spec):
+    with pytest.raises(ValueError, match="pn-a"):
+        parse_pool_spec(spec)
@@ -0,0 +1,37 @@
+# tests/test_profiler.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app.profiler import Profiler
+
+
+@pytest.mark.parametrize("seconds, interval", [(float("nan"), 0.005), (float("inf"), 0.005), (0.2, float("nan"))])
+def test_non_finite_durations_are_rejected(seconds, interval):
+    prof = Profiler()
+    with pytest.raises(ValueError):
+        prof.run(seconds, interval)
+    assert not prof.running
+
+
+def get(ev: threading.Event):
+    """An app function named like a queue's get, blocked on I/O-like waiting."""
+    ev.wait()
+
+
+def test_blocked_request_threads_are_sampled_idle_workers_are_not():
+    ev = threading.Event()
+    blocked = threading.Thread(target=get, args=(ev,), name="request")
+    blocked.start()
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="idle-pool")
+    pool.submit(lambda: None).result()  # leaves one worker parked in _worker
+    try:
+        result = Profiler().run(0.2, 0.005)
+    finally:
+        ev.set()
+        blocked.join()
+        pool.shutdown()
+    stacks = result["collapsed"].splitlines()
+    assert any(s.startswith("request;") and "get (test_profiler.py" in s for s in stacks)
+    assert not any(s.startswith("idle-pool") for s in stacks)
+    assert result["idle_dropped"] > 0
@@ -0,0 +1,30 @@
+# tests/test_sessions.py
+import sys
+import pytest
+from bench.session_stress import run
+
+
+@pytest.fixture
+def fast_switching():
+    old = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads as often as possible to provoke races
+    yield
+    sys.setswitchinterval(old)
+
+
+def test_outbox_drain_under_concurrency_loses_and_duplicates_nothing(fast_switching):
+    out = run(sessions=4, producers=6, pollers=3, events=400, drain=lambda s: s.outbox.drain())
+    assert out["received"] == out["sent"] == 2400
+    assert out["lost"] == 0 and out["duplicated"] == 0
+
+
+def test_outbox_cursor_reads_under_concurrency(fast_switching):
+    cursors = {}
+
+    def read_after(sess):
+        page = sess.outbox.read(after=cursors.get(id(sess), 0))
+        cursors[id(sess)] = page["next_after"]
+        return page["events"]
+
+    out = run(sessions=4, producers=6, pollers=1, events=400, drain=read_after)
+    assert out["lost"] == 0 and out["duplicated"] == 0
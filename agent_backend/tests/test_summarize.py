@@ -0,0 +1,32 @@
+# tests/test_summarize.py
+from server.summarize import RunningSummary
+
+
+def test_assistant_refund_ask_then_rep_denial_is_denied():
+    rs = RunningSummary()
+    rs.feed("assistant", "I'd like to request a refund of $89.99 to the original payment method.")
+    rs.feed("user", "I'm sorry, that order is not eligible for a refund.")
+    rs.ended = True
+    out = rs.outcome()
+    assert out["status"] == "denied"
+    assert out["amount"] is None and out["refund_method"] is None
+    assert out["resolution"].startswith("Denied:")
+
+
+def test_twilio_outbound_track_is_ignored():
+    rs = RunningSummary()
+    rs.feed("outbound_track", "Could you refund $89.99 to the original payment method? Case number AB1234.")
+    assert rs.found == {}
+    rs.feed("inbound_track", "Sure, I've refunded $40.00 to your credit card, case number ZX9911.")
+    assert rs.found["refund_amount"] == 40.0
+    assert rs.found["refund_method"] == "credit card"
+    assert rs.found["ticket_id"] == "ZX9911"
+    assert rs.status() == "resolved"
+
+
+def test_rep_refund_after_denial_resolves():
+    rs = RunningSummary()
+    rs.feed("user", "That item is not eligible for a refund.")
+    rs.feed("user", "Actually, I can refund $20.00 as store credit.")
+    assert rs.status() == "resolved"
+    assert rs.outcome()["resolution"] == "Refund of $20.00 to store credit"
@@ -0,0 +1,50 @@
+# tests/test_tracing.py
+import asyncio
+import json
+from app import tracing
+from app.tracing import JsonlExporter, continue_trace, start_trace
+from server import fsm
+
+PARENT = "00-" + "ab" * 16 + "-" + "cd" * 8 + "-01"
+
+
+def _capture_fsm(monkeypatch):
+    seen = {}
+
+    async def fake_run(task_id):
+        seen["span"] = tracing.current()
+
+    monkeypatch.setattr(fsm, "_run_fsm", fake_run)
+    return seen
+
+
+def test_fsm_joins_the_callers_trace(monkeypatch):
+    seen = _capture_fsm(monkeypatch)
+
+    async def go():
+        with start_trace("POST /tasks") as root:
+            await asyncio.create_task(fsm.run_fsm("t1"))
+        return root
+
+    root = asyncio.run(go())
+    assert seen["span"].name == "fsm.run"
+    assert (seen["span"].trace_id, seen["span"].parent_id) == (root.trace_id, root.span_id)
+
+
+def test_fsm_continues_a_propagated_traceparent(monkeypatch):
+    seen = _capture_fsm(monkeypatch)
+    asyncio.run(fsm.run_fsm("t1", traceparent=PARENT))
+    assert seen["span"].trace_id == "ab" * 16 and seen["span"].parent_id == "cd" * 8
+
+
+def test_exporter_rotates_past_max_bytes(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exp = JsonlExporter(str(path), max_bytes=200)
+    for i in range(6):
+        with continue_trace(PARENT, f"step-{i}") as sp:
+            pass
+        exp.add(sp)
+        exp.flush()
+    assert (tmp_path / "traces.jsonl.1").exists()
+    assert path.stat().st_size < 1000
+    assert all(json.loads(line)["name"].startswith("step-") for line in path.read_text().splitlines())
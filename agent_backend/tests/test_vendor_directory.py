@@ -0,0 +1,55 @@
+# tests/test_vendor_directory.py
+import json
+import os
+from app import vendor_directory
+from app.vendor_directory import VendorDirectory, build_index, compile_index
+
+VENDORS = [
+    {"name": "Walmart", "aliases": ["Wal-Mart", "Walmart Supercenter"], "number": "+18009256278"},
+    {"name": "Best Buy", "aliases": ["BestBuy"], "number": "+18882378289"},
+    {"name": "Best Western", "number": "+18007802378"},
+]
+
+
+def _dir(tmp_path) -> VendorDirectory:
+    idx = str(tmp_path / "vendors.idx")
+    build_index(VENDORS, idx)
+    return VendorDirectory(idx)
+
+
+def test_ambiguous_prefix_does_not_resolve(tmp_path):
+    d = _dir(tmp_path)
+    assert d.resolve("best") is None
+    assert {m.name for m in d.search("best")} == {"Best Buy", "Best Western"}
+
+
+def test_unique_prefix_and_exact_resolve(tmp_path):
+    d = _dir(tmp_path)
+    assert d.resolve("best b")[0].name == "Best Buy"
+    assert d.resolve("Walmart Supercenter")[0].name == "Walmart"
+    assert d.resolve("wal")[0].name == "Walmart"
+
+
+def test_short_prefix_does_not_resolve(tmp_path):
+    assert _dir(tmp_path).resolve("W") is None
+
+
+def test_read_only_data_dir_compiles_into_temp(tmp_path, monkeypatch):
+    data, tmp = tmp_path / "data", tmp_path / "tmp"
+    data.mkdir(), tmp.mkdir()
+    src = data / "vendors.json"
+    src.write_text(json.dumps(VENDORS))
+    real_build = vendor_directory.build_index
+
+    def build(vendors, out_path):
+        if out_path.startswith(str(data)):
+            raise PermissionError(13, "Read-only file system", out_path)
+        real_build(vendors, out_path)
+
+    monkeypatch.delenv("VENDOR_INDEX_FILE", raising=False)
+    monkeypatch.setattr(vendor_directory, "build_index", build)
+    monkeypatch.setattr(vendor_directory.tempfile, "gettempdir", lambda: str(tmp))
+    idx = compile_index(str(src))
+    assert os.path.dirname(idx) == str(tmp) and not (data / "vendors.idx").exists()
+    assert VendorDirectory(idx).resolve("walmart")[0].name == "Walmart"
+    assert compile_index(str(src)) == idx  # reused, not rebuilt